@@ -1,16 +1,17 @@
 # builtin imports
 import logging
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Iterable, List, Optional, Tuple
 
 # third-party imports
 from sqlalchemy import create_engine
 from sqlalchemy.orm import scoped_session, sessionmaker
 
 # local imports
+from .leads import lead_id_from_url
 from settings import DATABASE_URI, LEADS_PAGE
-from web.models import BotSettings, Lead
-from web.utils import get_bot_settings
+from web.models import BotSettings, FilterRules, Lead, LeadEvent
+from web.utils import get_bot_settings, get_filter_rules
 
 
 # Globally accessible Session
@@ -30,6 +31,29 @@ class DatabaseBridge(object):
     def get_settings(self) -> BotSettings:
         return get_bot_settings(session=Session)
 
+    def get_filter_rules(self) -> Optional[FilterRules]:
+        """
+        Current filter rules. Rules are refreshed from database
+        so changes made on settings page are seen.
+        """
+
+        try:
+
+            rules = get_filter_rules(session=Session)
+
+            if rules is not None:
+                Session.refresh(rules)
+
+            return rules
+
+        except Exception as e:
+
+            logging.exception(e, exc_info=True)
+
+            Session.rollback()
+
+            return None
+
     def update_settings(self, settings: BotSettings) -> BotSettings:
         """
         Update settings' money_left with provided value
@@ -76,7 +100,7 @@ class DatabaseBridge(object):
     def save_lead(self, lead_url: str) -> Optional[Lead]:
         """
         Save lead to Database and
-        Append it's URL and created time to worker's shared list
+        Append it's URL and created time to worker's purchases ring
 
         Parameters
         ----------
@@ -93,11 +117,20 @@ class DatabaseBridge(object):
         try:
             # we receive purchased lead's url
             # i.e. https://my.cian.ru/leads/1504220/
-            lead_id = lead_url.split('/')[-2]
+            lead_id = lead_id_from_url(lead_url)
+
+            if lead_id is None:
+                raise ValueError(f"Can't get lead id from {lead_url}")
+
+            if Session.query(Lead).get(lead_id) is not None:
+
+                logging.warning(f"Lead {lead_id} is already saved")
+
+                return None
 
             logging.info(f"Creating lead {lead_id}")
 
-            lead = Lead(id=int(lead_id))
+            lead = Lead(id=lead_id)
             Session.add(lead)
             Session.commit()
 
@@ -111,6 +144,65 @@ class DatabaseBridge(object):
 
         lead_link = LEADS_PAGE + f'/{lead.id}/'
 
-        self.worker.purchased_leads.append([lead_link, lead.created_on])
+        self.worker.purchased_leads.append(lead_link, lead.created_on)
 
         return lead
+
+    def save_events(self, events: Iterable[Tuple[str, str]]) -> None:
+        """
+        Save lead events to history.
+
+        Parameters
+        ----------
+        events : Iterable[Tuple[str, str]]
+            Pairs of event kind and lead fingerprint
+
+        """
+
+        try:
+
+            Session.add_all([LeadEvent(kind=kind, fingerprint=fingerprint) for kind, fingerprint in events])
+            Session.commit()
+
+        except Exception as e:
+
+            logging.exception(e, exc_info=True)
+
+            Session.rollback()
+
+    def get_events(self, days: int) -> List[Tuple[datetime, str]]:
+        """
+        Lead events' timestamps and kinds for the last days.
+        """
+
+        try:
+
+            return Session.query(LeadEvent.created_on, LeadEvent.kind).filter(
+                LeadEvent.created_on >= datetime.now() - timedelta(days=days)).all()
+
+        except Exception as e:
+
+            logging.exception(e, exc_info=True)
+
+            Session.rollback()
+
+            return []
+
+    def get_event_history(self, days: int) -> List[Tuple[datetime, str, str]]:
+        """
+        Lead events' timestamps, kinds and fingerprints for the last days.
+        Used to replay history in simulator.
+        """
+
+        try:
+
+            return Session.query(LeadEvent.created_on, LeadEvent.kind, LeadEvent.fingerprint).filter(
+                LeadEvent.created_on >= datetime.now() - timedelta(days=days)).all()
+
+        except Exception as e:
+
+            logging.exception(e, exc_info=True)
+
+            Session.rollback()
+
+            return []
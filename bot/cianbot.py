@@ -1,11 +1,12 @@
 # built-in libraries
 import os
-import json  # save ignored leads
 import logging
 import os
 import pickle
 import time
-from typing import Generator, List, Optional, Union, Any
+from collections import Counter
+from urllib.parse import urlparse
+from typing import Any, Callable, Counter as CounterType, Dict, Generator, List, Optional, Set, Tuple, Union
 
 # third-party libraries
 from selenium.common import exceptions
@@ -14,17 +15,44 @@ from selenium.webdriver.common.action_chains import ActionChains
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.support.expected_conditions import visibility_of_element_located as elem_visible
-from selenium.webdriver.support.expected_conditions import presence_of_all_elements_located as elems_located
-from selenium.webdriver.support.expected_conditions import element_to_be_clickable as elem_clickable
+from selenium.webdriver.support.expected_conditions import presence_of_element_located as elem_located
+from selenium.webdriver.support.expected_conditions import staleness_of
 from selenium.webdriver.support.ui import WebDriverWait
 
 # local libraries
+from .filters import ACCEPT, REJECT, FilterStateCache, LeadFilter
+from .leads import LeadCard, lead_id_from_url
+from .pacing import parse_price
+from .priority import LeadScorer
+from .push import PushChannel
+from .reconnect import Reconnector
+from .scheduler import LOST, PURCHASED, SEEN
+from .session import SessionTracker
 from .singleton import MetaSingleton
+from .tabs import TabPool
+from .sources import LeadSource, make_lead_source
+from .store import IgnoredLeadsStore
+from .waits import (WaitStats, any_of, elements_count_above, network_idle, track_requests,
+                    text_in_element)
 
 from typehints import Cookies, WebElement
 
 
-from settings import LOGIN_PAGE, LEADS_PAGE, REGIONS, CIAN_PHONE
+from settings import (LOGIN_PAGE, LEADS_PAGE, LEAD_SOURCE, LEADS_API_URL, PUSH_CHANNEL, CIAN_PHONE, IGNORED_LEADS_TTL,
+                      SESSION_TRUST_PERIOD, WAIT_TIMEOUTS, DETAIL_TABS, DETAIL_TAB_MAX_USES,
+                      RECONNECT_BASE_DELAY, RECONNECT_MAX_DELAY, RECONNECT_MAX_OUTAGE)
+
+
+# Leads page controls shown to logged in users only
+LEADS_PAGE_MARKERS = '//*[@data-name="SubmitContainer" or @data-name="MoreFiltersBtn" or @data-name="LeadsCardsWrapper"]'
+
+# Resolves as soon as the site responds, no matter what
+REACHABILITY_SCRIPT = """
+const done = arguments[arguments.length - 1];
+fetch(arguments[0], {method: 'HEAD', mode: 'no-cors', cache: 'no-store', credentials: 'include'})
+    .then(() => done(true))
+    .catch(() => done(false));
+"""
 
 
 class SeleniumOperator(object):
@@ -36,6 +64,12 @@ class SeleniumOperator(object):
 
     driver: chrome.webdriver.WebDriver = None
 
+    wait_stats: WaitStats = None
+
+    _tabs: TabPool = None
+
+    session: SessionTracker = None
+
     @property
     def current_url(self) -> str:
         return self.driver.current_url
@@ -43,6 +77,27 @@ class SeleniumOperator(object):
     def wait(self, timeout: int, *args: Any, **kw: Any) -> WebDriverWait:
         return WebDriverWait(self.driver, timeout, *args, **kw)
 
+    def wait_until(self, stage: str, condition: Any, timeout: Optional[float] = None) -> Any:
+        """
+        Wait for condition with the stage's deadline from WAIT_TIMEOUTS
+        and record how long it took to wait_stats.
+        TimeoutException is propagated to the caller.
+        """
+
+        timeout = timeout if timeout is not None else WAIT_TIMEOUTS[stage]
+
+        started = time.monotonic()
+        timed_out = False
+
+        try:
+            return self.wait(timeout, poll_frequency=0.1).until(condition)
+        except exceptions.TimeoutException:
+            timed_out = True
+            raise
+        finally:
+            if self.wait_stats is not None:
+                self.wait_stats.record(stage, time.monotonic() - started, timed_out)
+
     def chain(self, *args: Any, **kw: Any) -> ActionChains:
         return ActionChains(self.driver, *args, **kw)
 
@@ -56,6 +111,22 @@ class SeleniumOperator(object):
 
         if self.driver != driver:
             self.driver = driver
+            self._tabs = None
+
+            if self.session is not None:
+                # New browser has its own session
+                self.session.invalidate()
+
+    @property
+    def tabs(self) -> TabPool:
+        """
+        Pool of lead tabs for current driver created on first use.
+        """
+
+        if self._tabs is None:
+            self._tabs = TabPool(self.driver, DETAIL_TABS, DETAIL_TAB_MAX_USES)
+
+        return self._tabs
 
     def _enter_input(self, elem: Union[WebElement, str], value: str) -> None:
 
@@ -135,39 +206,108 @@ class CianBot(SeleniumOperator, metaclass=MetaSingleton):
     CianBot made for automate buying leads
     """
 
-    ignore_leads: List[str] = None
+    ignore_leads: IgnoredLeadsStore = None
+
+    lead_filter: LeadFilter = None
+
+    lead_scorer: LeadScorer = None
+
+    lead_source: LeadSource = None
+
+    filters_state: FilterStateCache = None
+
+    reconnector: Reconnector = None
+
+    # Whether worker asked the bot to stop or quit
+    stop_requested: Optional[Callable[[], bool]] = None
+
+    filter_stats: Dict[str, int] = None
+
+    # Lead events not yet saved to history: (kind, fingerprint)
+    events: List[Tuple[str, str]] = None
+
+    # Price paid for purchased lead by its url
+    lead_prices: Dict[str, int] = None
+
+    # Fingerprints of cards on the leads page at the previous refresh
+    # and number of cards new since then. Cards without id may share
+    # fingerprint, so fingerprints are counted
+    page_cards: CounterType[str] = None
+    card_delta: int = 0
+
+    # Leads not purchased because budget didn't allow it yet
+    deferred_leads: Set[str] = None
+
+    # Cards which aren't new but must be examined again at the next refresh
+    retry_leads: CounterType[str] = None
+
+    # Leads rejected by filter rules, examined again when rules change
+    rejected_leads: Set[str] = None
+
+    # Leads list was changed by the page itself since the last refresh
+    pushed: bool = False
 
     def __init__(self) -> None:
 
+        self.wait_stats = WaitStats()
+        self.events = []
+        self.lead_prices = {}
+        self.page_cards = Counter()
+        self.deferred_leads = set()
+        self.retry_leads = Counter()
+        self.rejected_leads = set()
+        self.lead_filter = LeadFilter()
+        self.lead_scorer = LeadScorer()
+        self.session = SessionTracker(SESSION_TRUST_PERIOD)
+        self.reconnector = Reconnector(RECONNECT_BASE_DELAY, RECONNECT_MAX_DELAY, max_outage=RECONNECT_MAX_OUTAGE)
+        self.lead_source = make_lead_source(self, LEAD_SOURCE)
+
         self.load_ignore_leads()
 
     def load_ignore_leads(self) -> None:
         """
-        Load ignored leads' dates from json.
+        Load ignored leads from journal.
         """
 
-        logging.info("Loading ignored leads ...")
+        self.ignore_leads = IgnoredLeadsStore(os.environ['IGN_LEADS_PATH'], IGNORED_LEADS_TTL)
+        self.ignore_leads.load()
 
-        if os.stat(os.environ['IGN_LEADS_PATH']).st_size > 0:
+    def save_ignore_leads(self) -> None:
+        """
+        Every ignored lead is already journaled on add.
+        Only compact the journal and close it.
+        """
 
-            try:
-                with open(os.environ['IGN_LEADS_PATH'], 'r') as f:
-                    self.ignore_leads = json.loads(f.read())
-                return
+        logging.info(f"Store {len(self.ignore_leads)} ignored leads")
 
-            except Exception as e:
-                logging.exception(e, exc_info=True)
+        self.ignore_leads.compact()
+        self.ignore_leads.close()
 
-        # If file is empty or
-        # Exception raised set to an empty list
-        self.ignore_leads = []
+    def set_rules(self, config: dict) -> None:
+        """
+        Rebuild lead filter from new rules.
+        Leads page filters are set again on the next set_filters()
+        since filters config changes with included regions.
+        """
 
-    def save_ignore_leads(self) -> None:
+        self.lead_filter = LeadFilter.from_config(config)
+        self.lead_scorer = LeadScorer(regions=self.lead_filter.regions, object_types=self.lead_filter.object_types)
 
-        logging.info(f"Store {len(self.ignore_leads)} ignored leads")
+        # Cards on the page are examined again with new rules,
+        # but they aren't new arrivals
+        self.retry_leads = Counter(self.page_cards)
+        self.rejected_leads = set()
 
-        with open(os.environ['IGN_LEADS_PATH'], 'w') as f:
-            f.write(json.dumps(self.ignore_leads))
+        logging.info(f"Filter rules are updated: {self.lead_filter.config}")
+
+    def pop_events(self) -> List[Tuple[str, str]]:
+        """
+        Return lead events collected since last call.
+        """
+
+        events, self.events = self.events, []
+
+        return events
 
     def is_connection_lost(self) -> bool:
 
@@ -177,9 +317,32 @@ class CianBot(SeleniumOperator, metaclass=MetaSingleton):
         except exceptions.NoSuchElementException:
             return False
 
+    def is_on_page(self, url: str) -> bool:
+        """
+        Check that opened page is the given one and not a redirect target.
+        """
+
+        def page(address: str) -> Tuple[str, str]:
+
+            parts = urlparse(address)
+            hostname = parts.hostname or ''
+
+            # Site is served from www subdomain
+            if hostname.startswith('www.'):
+                hostname = hostname[len('www.'):]
+
+            return hostname, parts.path.rstrip('/')
+
+        return page(url) == page(self.current_url)
+
     def is_logged_in(self, trg_url: Optional[str] = None) -> bool:
         """
-        Check that login button is presented on login page
+        Check that user is logged in.
+
+        Session is trusted without any check if it was checked recently
+        and its cookies are still here. Opened leads page with its filters
+        is a proof of login. Otherwise trg_url is loaded and checked
+        for login button, pages user was redirected to prove nothing.
 
         Returns
         -------
@@ -190,13 +353,39 @@ class CianBot(SeleniumOperator, metaclass=MetaSingleton):
 
         trg_url = trg_url or LOGIN_PAGE
 
-        try:
+        if self.session.is_trusted(self.driver.get_cookies()):
+            return True
+
+        self.tabs.switch_main()
+
+        # Leads page is shown to logged in users only
+        if self.is_on_page(LEADS_PAGE) and self.driver.find_elements_by_xpath(LEADS_PAGE_MARKERS):
+
+            self.session.mark_valid(self.driver.get_cookies())
+            return True
+
+        if not self.is_on_page(trg_url):
             self.driver.get(trg_url)
-            self.driver.find_element_by_id('login-btn')
+
+        if not self.is_on_page(trg_url):
+
+            # Captcha or error page
+            logging.warning(f"Can't check login, {trg_url} redirected to {self.current_url}")
+
+            self.session.invalidate()
             return False
+
+        try:
+            self.driver.find_element_by_id('login-btn')
+
         except exceptions.NoSuchElementException:
+
+            self.session.mark_valid(self.driver.get_cookies())
             return True
 
+        self.session.invalidate()
+        return False
+
     def login(self, trg_url: Optional[str] = None) -> bool:
         """
         Fill username and password with values from environment.
@@ -249,16 +438,97 @@ class CianBot(SeleniumOperator, metaclass=MetaSingleton):
 
         input_code.send_keys(code)
 
+    def filters_config(self) -> dict:
+        """
+        Everything _apply_filters() depends on.
+        Cached filters state is valid only for the same config.
+        """
+
+        return {
+            'page': LEADS_PAGE,
+            'hide_agents': True,
+            'lead_type': 'sell',
+            'regions': self.lead_filter.regions,
+            'object_types': self.page_object_types(),
+        }
+
+    def page_object_types(self) -> List[str]:
+        """
+        Object types chosen in leads page filter.
+        Only flat option is known, it's the first option of the drop-down.
+        Other types are filtered on cards and lead pages.
+        """
+
+        object_types = self.lead_filter.site_object_types
+
+        if object_types == ['flat']:
+            return object_types
+
+        if object_types:
+            logging.info(f"Leads page has no known option for {object_types}, any object is shown")
+
+        return []
+
     def set_filters(self) -> None:
         """
-        Filtering leads on leads_url
+        Open leads page with filters applied.
+        Filters are set through UI only if there is no cached
+        filtered view or it stopped working.
         """
 
         if not self.is_logged_in(LEADS_PAGE):
             self.login(LEADS_PAGE)
 
+        config = self.filters_config()
+
+        if self.filters_state is None or self.filters_state.key != FilterStateCache.config_key(config):
+            self.filters_state = FilterStateCache(os.environ['FILTERS_STATE_PATH'], config)
+
+        if self.filters_state.url:
+
+            if self.current_url != self.filters_state.url:
+                self.driver.get(self.filters_state.url)
+
+            if self.is_filtered_view():
+                logging.info("Cached filters state is used")
+                return
+
+            self.filters_state.invalidate()
+
         self.driver.get(LEADS_PAGE)
 
+        self._apply_filters()
+
+        # Apply filters and remember resulting url
+        self.submit_filters()
+
+        if self.current_url.rstrip('/') != LEADS_PAGE.rstrip('/') and self.is_filtered_view():
+            self.filters_state.save(self.current_url)
+        else:
+            logging.warning("Filters state isn't stored in url. It can't be cached.")
+
+    def is_filtered_view(self) -> bool:
+        """
+        Check that opened page is a working leads page.
+        """
+
+        if not self.current_url.startswith(LEADS_PAGE):
+            return False
+
+        try:
+            # Own stage: the check had no fixed sleep to compare with
+            self.wait_until('filtered_view', elem_located((By.XPATH, '//button[@data-name="SubmitContainer"]')),
+                            WAIT_TIMEOUTS['leads'])
+        except exceptions.TimeoutException:
+            return False
+
+        return True
+
+    def _apply_filters(self) -> None:
+        """
+        Set filters through leads page UI
+        """
+
         # Check the box "Скрыть заявки от агентов"
         self.driver.find_element_by_xpath(
             ".//*[contains(text(), 'Скрыть заявки от агентов')]").click()
@@ -282,25 +552,34 @@ class CianBot(SeleniumOperator, metaclass=MetaSingleton):
 
         region_input = self.driver.find_element_by_id('geo-suggest-input')
 
-        for region in REGIONS:
+        selected_regions_xpath = "//*[contains(@class, 'tag_content')]"
+
+        for region in self.lead_filter.regions:
+
+            selected_regions = len(self.driver.find_elements_by_xpath(selected_regions_xpath))
 
             region_input.send_keys(region)
 
-            # wait for render the region autocomplete suggestions drop-down list
-            region_suggestions = self.wait(5).until(elem_visible(
-                (By.XPATH, "//*[contains(@class, 'group-container')]")))
+            # Wait for the autocomplete drop-down. It was awaited before
+            # the fixed sleep too, so it isn't counted in the region stage.
+            self.wait_until('region_suggestions', elem_visible(
+                (By.XPATH, "//*[contains(@class, 'group-container')]")), WAIT_TIMEOUTS['region'])
 
-            time.sleep(0.3)
+            # Wait until suggestions are rendered for the region we've just typed
+            suggestion = self.wait_until('region', text_in_element(
+                "//*[contains(@class, 'group-container')]//*[contains(@class, 'item-selected')]", region))
 
             # Select first suggestion
-            region_suggestions.find_element_by_xpath(
-                "//*[contains(@class, 'item-selected')]").click()
+            suggestion.click()
 
             # Wait until it'll be added to choosen region list
-            self.wait(5).until(elem_visible(
-                (By.XPATH, "//*[contains(@class, 'tag_content')]")))
+            self.wait_until('region_added', elements_count_above(selected_regions_xpath, selected_regions),
+                            WAIT_TIMEOUTS['region'])
 
-        # set object type
+        # Set flat type, any object is left for other types
+
+        if not self.page_object_types():
+            return
 
         object_type_dropdown = self.driver.find_element_by_xpath(
             "//div[@role='button' and @aria-haspopup='listbox' and .//*[text()='Любой объект']]"
@@ -313,11 +592,105 @@ class CianBot(SeleniumOperator, metaclass=MetaSingleton):
         self.driver.find_element_by_xpath("//div[@role='option']").click()
 
     def refresh_leads(self) -> None:
+        """
+        Re-render leads list with applied filters.
+        If connection is lost, wait with backoff until the site
+        is reachable and restore filtered leads page.
+        """
 
-        self.switch(0)
+        self.submit_filters()
+
+        if self.is_connection_lost():
+            self.reconnector.recover(probe=self.is_reachable, restore=self.restore_leads_page,
+                                     stopped=self.stop_requested)
+
+    def watch_leads(self) -> None:
+        """
+        Observe leads list for changes made by the page itself.
+        Called right after list snapshot, so observer queue is cleared
+        of changes made by our own refresh.
+        """
 
-        submit_button = self.driver.find_element_by_xpath(
-            '//button[@data-name="SubmitContainer"]')
+        if PUSH_CHANNEL:
+            PushChannel(self.driver, LEADS_API_URL).install()
+
+    def wait_for_push(self, timeout: float) -> Optional[List[Dict[str, Any]]]:
+        """
+        Block until leads list is changed by the page or timeout is over.
+        Returns None if push channel isn't available and caller should sleep.
+        """
+
+        if not PUSH_CHANNEL:
+            return None
+
+        # Leads page is observed in the main tab only
+        self.tabs.switch_main()
+
+        if not self.current_url.startswith(LEADS_PAGE):
+            return None
+
+        events = PushChannel(self.driver, LEADS_API_URL).wait(timeout)
+
+        if events:
+            logging.info(f"Leads list is changed by page: {events}")
+
+        self.pushed = bool(events)
+
+        return events
+
+    def is_reachable(self) -> bool:
+        """
+        Lightweight reachability probe without page reload.
+        """
+
+        try:
+            self.driver.set_script_timeout(WAIT_TIMEOUTS['refresh'])
+            return bool(self.driver.execute_async_script(REACHABILITY_SCRIPT, LEADS_PAGE))
+
+        except exceptions.WebDriverException as e:
+            logging.warning(f"Reachability probe failed: {e}")
+            return False
+
+    def restore_leads_page(self) -> bool:
+        """
+        Reload leads page after connection loss and submit filters.
+        Returns whether leads list is shown without errors.
+        """
+
+        self.tabs.switch_main()
+        self.driver.refresh()
+
+        self.set_filters()
+        self.submit_filters()
+
+        return not self.is_connection_lost()
+
+    def submit_filters(self) -> None:
+
+        self.tabs.switch_main()
+
+        try:
+            submit_button = self.driver.find_element_by_xpath(
+                '//button[@data-name="SubmitContainer"]')
+
+        except exceptions.NoSuchElementException:
+
+            if self.filters_state is None or not self.filters_state.url:
+                raise
+
+            # Cached filtered view stopped working
+            self.filters_state.invalidate()
+            self.set_filters()
+
+            submit_button = self.driver.find_element_by_xpath(
+                '//button[@data-name="SubmitContainer"]')
+
+        # Any card rendered before submit becomes stale
+        # as soon as the list is re-rendered
+        rendered_cards = self.driver.find_elements_by_xpath('//div[@data-name="LeadsCardsWrapper"]')
+
+        # List request started by submit is awaited by network_idle
+        track_requests(self.driver)
 
         # selenium.common.exceptions.ElementClickInterceptedException
         # Click on submit button
@@ -327,116 +700,298 @@ class CianBot(SeleniumOperator, metaclass=MetaSingleton):
         except exceptions.ElementClickInterceptedException:
             self.driver.execute_script("arguments[0].click();", submit_button)
 
-        time.sleep(1)
+        # React may reuse card nodes, then nothing becomes stale
+        # and the list is considered updated once network is idle
+        conditions = [staleness_of(rendered_cards[0])] if rendered_cards else []
 
-        if self.is_connection_lost():
-            logging.info("Connection lost. Sleeping")
-            time.sleep(120)
-            self.set_filters()
-            self.refresh_leads()
+        try:
+            self.wait_until('refresh', any_of(
+                *conditions,
+                network_idle(),
+                elem_located((By.XPATH, "//*[@data-name='ErrorPanelComponent']")),
+            ))
+        except exceptions.TimeoutException:
+            logging.warning("Leads list wasn't re-rendered after submit")
+
+    def iter_leads(self, approve: Optional[Callable[[LeadCard], bool]] = None) -> Generator[str, bool, None]:
+        """
+        Yield urls of purchased leads.
 
-    def iter_leads(self) -> Generator[str, bool, None]:
+        Cards passed card filter are ranked by score and opened
+        in parallel: lead pages are loaded in pooled tabs in the background
+        while previous lead is evaluated. Leads are evaluated
+        and purchased one by one.
 
-        self.refresh_leads()
+        Parameters
+        ----------
+        approve : Optional[Callable[[LeadCard], bool]]
+            Budget check called right before purchase.
+            Lead isn't purchased if it returns False.
 
-        # Iterate through lead cards
-        # Implicitly wait for leads to load
-        time.sleep(2)
+        """
 
-        try:
-            self.wait(5).until(elems_located((By.XPATH, '//*[@data-name="LeadsCardsWrapper"]')))
+        cards = self.lead_source.fetch()
 
-            leads: List[WebElement] = self.driver.find_elements_by_xpath('//div[@data-name="LeadsCardsWrapper"]')
+        self.watch_leads()
 
-        except exceptions.TimeoutException:
+        # Only cards which weren't on the page at the previous refresh are examined
+        # and counted as arrivals. Unfinished cards are examined again.
+        # Cards sharing fingerprint above their previous number are new.
+        page_cards = Counter(card.fingerprint for card in cards)
+
+        new_left = page_cards - self.page_cards
+        retry_left = self.retry_leads & page_cards
+
+        self.page_cards = page_cards
+        self.card_delta = sum(new_left.values())
+        self.retry_leads = Counter()
+
+        # Indexes of new cards, newest cards are on top
+        new_cards: Set[int] = set()
+
+        examined = []
+
+        for card in cards:
+
+            if new_left[card.fingerprint] > 0:
+                new_left[card.fingerprint] -= 1
+                new_cards.add(card.index)
+            elif retry_left[card.fingerprint] > 0:
+                retry_left[card.fingerprint] -= 1
+            else:
+                continue
+
+            examined.append(card)
+
+        if not examined:
 
             logging.warning("No new leads found")
 
             yield 'no-new-leads'
             return False
 
-        for lead in leads:
+        cards = examined
 
-            try:
+        self.filter_stats = {'cards': len(cards), 'ignored': 0, 'rejected_on_card': 0, 'opened': 0}
+
+        candidates: List[LeadCard] = []
+
+        for card in cards:
+
+            if card.fingerprint in self.ignore_leads or card.fingerprint in self.rejected_leads:
+
+                logging.warning(f"Lead {card.fingerprint} ({card.created}) was ignored")
+
+                self.filter_stats['ignored'] += 1
+
+                continue
+
+            verdict, failed_check = self.lead_filter.check_card(card)
+
+            if verdict == REJECT:
+
+                logging.warning(f"Lead {card.fingerprint} rejected on card by {failed_check}")
+
+                self.reject_lead(card, failed_check)
+                self.filter_stats['rejected_on_card'] += 1
+
+                continue
 
-                # Open tab with leads list
-                self.switch(0)
+            candidates.append(card)
 
-                lead_url = self.open_lead(lead)
+            if card.index in new_cards:
+                self.events.append((SEEN, card.fingerprint))
 
-                if lead_url == 'ignore-lead':
-                    # Lead was cached and not opened
+        self.filter_stats['opened'] = len(candidates)
+
+        # The most valuable leads are opened and purchased first
+        candidates = self.lead_scorer.rank(candidates)
+
+        logging.info(f"Card filter saved {self.filter_stats['rejected_on_card']} tab opens: {self.filter_stats}")
+
+        # Card index -> tab handle where lead page is loading
+        prefetched: Dict[int, str] = {}
+
+        # Cards which must be examined again at the next refresh
+        unfinished = Counter(card.fingerprint for card in candidates)
+
+        try:
+
+            for position, card in enumerate(candidates):
+
+                handle = prefetched.pop(card.index, None)
+
+                # Budget is checked by card price before lead page is loaded,
+                # deferred lead is examined again at the next refresh
+                if approve is not None and not approve(card):
+
+                    logging.warning(f"Lead {card.fingerprint} is not approved to purchase")
+
+                    if handle is not None:
+                        self.tabs.release(handle)
 
                     continue
 
-                logging.warning(f"Purchased {lead_url}")
+                try:
 
-                self.driver.close()
+                    # Start loading next leads before evaluating current one
+                    self.prefetch_leads(candidates[position + 1:], prefetched, approve)
 
-                if lead_url is not None:
+                    # Open tab with leads list
+                    self.tabs.switch_main()
 
-                    yield lead_url
+                    try:
+                        lead_url = self.open_lead(card, handle, approve)
+                    finally:
+                        # Give lead tab back to the pool
+                        self.tabs.release(handle)
 
-            except exceptions.StaleElementReferenceException:
+                    if card.fingerprint not in self.deferred_leads:
+                        unfinished[card.fingerprint] -= 1
 
-                yield 'no-new-leads'
-                return False
+                    logging.warning(f"Purchased {lead_url}")
 
-            except Exception as e:
-                logging.exception(e, exc_info=True)
+                    if lead_url is not None:
+
+                        # Purchased lead must not be opened again
+                        self.ignore_lead(card)
+
+                        self.events.append((PURCHASED, card.fingerprint))
+
+                        yield lead_url
+
+                except exceptions.StaleElementReferenceException:
 
-    def open_lead(self, lead: WebElement) -> Optional[str]:
+                    yield 'no-new-leads'
+                    return False
 
-        # Move to current lead
-        self.chain().move_to_element(lead).perform()
+                except Exception as e:
+                    logging.exception(e, exc_info=True)
 
-        lead_creation_time = lead.find_element_by_xpath(".//*[@data-name='SecondInfo']").find_element_by_xpath(".//span").text
+        finally:
 
-        if lead_creation_time in self.ignore_leads:
+            for handle in prefetched.values():
+                self.tabs.release(handle)
 
-            logging.warning(f"Lead {lead_creation_time} was ignored")
+            self.retry_leads += unfinished
+            self.deferred_leads.clear()
 
-            return 'ignore-lead'
+    def reject_lead(self, card: LeadCard, check: str) -> None:
+        """
+        Don't examine lead again. Leads rejected by filter rules
+        are kept until rules change, others are ignored for TTL.
+        """
+
+        if check not in ('region', 'type', 'age'):
+            self.ignore_lead(card)
+        elif card.identifiable:
+            self.rejected_leads.add(card.fingerprint)
+
+    def ignore_lead(self, card: LeadCard) -> None:
+        """
+        Don't examine lead again for TTL.
+        Card which can't be told from others isn't stored,
+        it would hide every card like it. It's not examined again
+        while it stays on the page anyway.
+        """
+
+        if card.identifiable:
+            self.ignore_leads.add(card.fingerprint)
+        else:
+            logging.debug(f"Lead {card.fingerprint} has no id to be ignored by")
+
+    def prefetch_leads(self, cards: List[LeadCard], prefetched: Dict[int, str],
+                       approve: Optional[Callable[[LeadCard], bool]] = None) -> None:
+        """
+        Start loading pages of leads with known id in free pooled tabs.
+        Leads budget doesn't allow yet aren't loaded.
+        """
+
+        for card in cards:
+
+            if len(prefetched) >= self.tabs.size:
+                break
 
-        # Open new tab with lead information
+            if card.lead_id is None or card.index in prefetched:
+                continue
 
-        open_lead = lead.find_element_by_xpath(
-            './/button[@data-name="OpenLead"]')
+            if approve is not None and not approve(card):
+                continue
+
+            prefetched[card.index] = self.tabs.prefetch(self.lead_page(card))
+
+    def close_modal(self) -> None:
+        """
+        Close buy lead modal, so the tab goes back to the pool clean.
+        """
 
         try:
+            ActionChains(self.driver).send_keys(Keys.ESCAPE).perform()
+        except exceptions.WebDriverException as e:
+            logging.warning(f"Can't close buy lead modal: {e}")
 
-            self.wait(10).until(elem_clickable((By.XPATH, '//button[@data-name="OpenLead"]')))
-            open_lead.click()
+    @staticmethod
+    def lead_page(card: LeadCard) -> str:
+        return LEADS_PAGE + f'/{card.lead_id}/'
 
-        except exceptions.ElementClickInterceptedException as e:
+    def open_lead(self, card: LeadCard, handle: Optional[str] = None,
+                  approve: Optional[Callable[[LeadCard], bool]] = None) -> Optional[str]:
 
-            logging.exception(e, exc_info=True)
-            self.driver.execute_script("arguments[0].click();", open_lead)
+        # Lead page may be already loading in a pooled tab.
+        # Otherwise open it in a pooled tab if lead id is known
+        # or with OpenLead button, which opens a new window.
+
+        if handle is not None:
+
+            self.tabs.switch_to(handle)
+
+            # Reused tab may still show another lead
+            self.wait_until('lead', lambda driver: (
+                lead_id_from_url(driver.current_url) == card.lead_id
+                and driver.execute_script("return document.readyState") != 'loading'))
+
+        elif card.lead_id is not None:
+
+            self.tabs.acquire()
+            self.driver.get(self.lead_page(card))
+
+        else:
+
+            try:
+                card.button.click()
+
+            except exceptions.ElementClickInterceptedException as e:
+
+                logging.exception(e, exc_info=True)
+                self.driver.execute_script("arguments[0].click();", card.button)
 
-        self.switch(-1)
+            self.tabs.adopt()
 
         # Check that nobody already bought it
-        lead_price = self.driver.find_element_by_xpath(
-            "//h3[contains(@class, 'header_text')]")
+        lead_price = self.wait_until('lead', elem_located(
+            (By.XPATH, "//h3[contains(@class, 'header_text')]")))
 
-        if lead_price.text.startswith('100'):
+        if self.lead_filter.check_sold(lead_price.text) == REJECT:
 
             # Lead already in proccess
             logging.debug("Lead is already purchased by someone")
 
-            self.ignore_leads.append(lead_creation_time)
+            self.ignore_lead(card)
+
+            self.events.append((LOST, card.fingerprint))
 
             return None
 
         lead_locations = self.driver.find_element_by_xpath("//*[@data-mark='location']").find_elements_by_xpath(".//*")
 
-        lead_location = " ".join([location.text for location in lead_locations])
+        # Address parts are separate elements
+        lead_location = ", ".join([location.text for location in lead_locations if location.text])
 
-        if not any(region in lead_location for region in REGIONS):
+        if self.lead_filter.check_region(lead_location) != ACCEPT:
 
             logging.warning(f"Location {lead_location} is not what I want...")
 
-            self.ignore_leads.append(lead_creation_time)
+            self.reject_lead(card, 'region')
 
             return None
 
@@ -446,10 +1001,12 @@ class CianBot(SeleniumOperator, metaclass=MetaSingleton):
 
             lead_type = self.driver.find_element_by_xpath("//*[@data-mark='demand_message-info_title']").text
 
-            if not all(x in lead_type.lower() for x in ('продать', 'квартиру')):
+            if self.lead_filter.check_type(lead_type) != ACCEPT:
 
                 logging.warning(f"Lead {self.current_url} has improper type")
 
+                self.reject_lead(card, 'type')
+
                 return None
 
         except Exception as e:
@@ -467,9 +1024,43 @@ class CianBot(SeleniumOperator, metaclass=MetaSingleton):
         buy_lead_btn = self.driver.find_element_by_xpath(
             "//button[contains(text(), 'Оплатить ')]")
 
+        # Actual price is on the pay button, i.e. 'Оплатить 300 ₽'
+        price = parse_price(buy_lead_btn.text) or parse_price(card.price)
+
+        if price is not None:
+
+            card = card._replace(price=str(price))
+
+            if self.lead_filter.check_price(card.price) == REJECT:
+
+                logging.warning(f"Lead {self.current_url} costs {price} ₽, it's too much")
+
+                self.ignore_lead(card)
+                self.close_modal()
+
+                return None
+
+        # Actual price may be higher than the price on card
+        if approve is not None and not approve(card):
+
+            logging.warning(f"Lead {self.current_url} is not approved to purchase")
+
+            self.deferred_leads.add(card.fingerprint)
+            self.close_modal()
+
+            return None
+
         buy_lead_btn.click()
 
-        time.sleep(1)
+        # Payment is done when the modal with pay button is gone
+        try:
+            self.wait_until('purchase', staleness_of(buy_lead_btn))
+        except exceptions.TimeoutException:
+            logging.warning("Payment modal is still opened")
+
         logging.warning(f"Buy lead {self.current_url}")
 
+        if price is not None:
+            self.lead_prices[self.current_url] = price
+
         return self.current_url
@@ -0,0 +1,26 @@
+# builtin imports
+import time
+from datetime import datetime
+
+
+class SystemClock(object):
+    """
+    Wall clock the worker, poll scheduler and budget pacer take time from.
+    Offline simulator replays history with a virtual clock instead.
+    """
+
+    @staticmethod
+    def now() -> datetime:
+        return datetime.now()
+
+    @staticmethod
+    def time() -> float:
+        return time.time()
+
+    @staticmethod
+    def monotonic() -> float:
+        return time.monotonic()
+
+    @staticmethod
+    def sleep(seconds: float) -> None:
+        time.sleep(seconds)
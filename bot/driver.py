@@ -0,0 +1,204 @@
+# builtin imports
+import argparse
+import logging
+import os
+import platform
+from typing import Any, Callable, Dict, List, Optional
+
+# third-party imports
+import selenium.webdriver
+
+# local imports
+from settings import BLOCKED_URL_PATTERNS, DRIVER_UNIX_PATH, DRIVER_WIN_PATH
+
+
+# Driver profiles
+FULL_PROFILE = 'full'
+LEAN_PROFILE = 'lean'
+
+PAGE_TIMINGS_SCRIPT = """
+const timing = performance.timing;
+return {
+    dom_ready: timing.domContentLoadedEventEnd - timing.navigationStart,
+    load: timing.loadEventEnd > 0 ? timing.loadEventEnd - timing.navigationStart : null,
+    resources: performance.getEntriesByType('resource').length,
+};
+"""
+
+
+def configure_options(chrome_options: Any, profile: str) -> Any:
+    """
+    Tune chrome options for given profile.
+
+    Lean profile runs headless, doesn't load images
+    and returns from page load as soon as DOM is ready.
+    Readiness of page elements is checked explicitly by the bot.
+    """
+
+    if profile != LEAN_PROFILE:
+        chrome_options.add_argument("start-maximized")
+        return chrome_options
+
+    chrome_options.headless = True
+    chrome_options.add_argument("--window-size=1920,1080")
+    chrome_options.add_argument("--blink-settings=imagesEnabled=false")
+    chrome_options.add_argument("--disable-extensions")
+    chrome_options.add_experimental_option('prefs', {
+        'profile.managed_default_content_settings.images': 2,
+    })
+    chrome_options.set_capability('pageLoadStrategy', 'eager')
+
+    return chrome_options
+
+
+def apply_profile(driver: Any, profile: str, blocked_urls: Optional[List[str]] = None) -> None:
+    """
+    Block heavy and third-party resources by url pattern through DevTools.
+    """
+
+    if profile != LEAN_PROFILE:
+        return
+
+    blocked_urls = BLOCKED_URL_PATTERNS if blocked_urls is None else blocked_urls
+
+    try:
+        driver.execute_cdp_cmd('Network.enable', {})
+        driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': blocked_urls})
+
+    except Exception as e:
+        logging.exception(e, exc_info=True)
+
+
+def page_timings(driver: Any) -> Dict[str, Optional[int]]:
+    """
+    Load timings of the current page in milliseconds.
+    """
+
+    try:
+        return driver.execute_script(PAGE_TIMINGS_SCRIPT)
+    except Exception as e:
+        logging.warning(f"Can't get page timings: {e}")
+        return {}
+
+
+def _parents() -> Dict[int, int]:
+    """
+    Map of every running process to its parent.
+    """
+
+    parents = {}
+
+    for entry in os.listdir('/proc'):
+
+        if not entry.isdigit():
+            continue
+
+        try:
+            with open(f'/proc/{entry}/stat', 'r') as f:
+                # Process name may contain spaces, ppid goes after it
+                parents[int(entry)] = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+
+    return parents
+
+
+def _rss(pid: int) -> int:
+
+    try:
+        with open(f'/proc/{pid}/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+
+    return 0
+
+
+def browser_rss(driver: Any) -> Optional[int]:
+    """
+    Resident memory in bytes of chromedriver and every browser process.
+    Available on Linux only.
+    """
+
+    if not os.path.isdir('/proc'):
+        return None
+
+    try:
+        root = driver.service.process.pid
+    except AttributeError:
+        return None
+
+    parents = _parents()
+
+    total = 0
+    pids = [root]
+
+    while pids:
+        pid = pids.pop()
+        total += _rss(pid)
+        pids.extend(child for child, parent in parents.items() if parent == pid)
+
+    return total
+
+
+def log_driver_stats(driver: Any, profile: str) -> None:
+
+    if driver is None:
+        # Nothing to measure without a browser, i.e. in simulator
+        return
+
+    rss = browser_rss(driver)
+    rss = f"{rss / 2 ** 20:.0f} MB" if rss is not None else "unknown"
+
+    logging.info(f"Driver profile {profile}: page timings {page_timings(driver)}, browser RSS {rss}")
+
+
+def compare_profiles(url: str, launch: Callable[[str], Any]) -> Dict[str, Dict[str, Any]]:
+    """
+    Load page in a fresh browser of every profile
+    and measure its load timings and browser RSS.
+    """
+
+    results = {}
+
+    for profile in (FULL_PROFILE, LEAN_PROFILE):
+
+        driver = launch(profile)
+
+        try:
+            apply_profile(driver, profile)
+            driver.get(url)
+
+            results[profile] = dict(page_timings(driver), rss=browser_rss(driver))
+
+        finally:
+            driver.quit()
+
+    return results
+
+
+def launch_chrome(profile: str) -> Any:
+
+    chrome_options = configure_options(selenium.webdriver.ChromeOptions(), profile)
+
+    executable_path = DRIVER_UNIX_PATH if platform.system() == 'Linux' else DRIVER_WIN_PATH
+
+    return selenium.webdriver.Chrome(executable_path=executable_path, options=chrome_options)
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description="Compare page load timings and browser RSS of driver profiles.")
+
+    parser.add_argument('url', type=str, help='Page to load, i.e. leads page.')
+
+    cmd_args = parser.parse_args()
+
+    for name, result in compare_profiles(cmd_args.url, launch_chrome).items():
+
+        rss = f"{result['rss'] / 2 ** 20:.0f} MB" if result.get('rss') is not None else "unknown"
+
+        print(f"{name}: dom_ready {result.get('dom_ready')} ms, load {result.get('load')} ms, "
+              f"resources {result.get('resources')}, browser RSS {rss}")
@@ -0,0 +1,341 @@
+# builtin imports
+import hashlib
+import json
+import logging
+import re
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Pattern, Tuple
+
+# local imports
+from .gazetteer import Gazetteer, get_gazetteer, place_key
+from .leads import LeadCard
+from .pacing import parse_price
+from .priority import card_age
+from .waits import normalize_text
+
+from settings import MAX_LEAD_PRICE, OBJECT_TYPES, REGIONS
+
+
+# Filter verdicts
+ACCEPT = 'accept'
+REJECT = 'reject'
+UNKNOWN = 'unknown'
+
+Verdict = Tuple[str, Optional[str]]
+
+# Object types of leads page filter by word stem of lead type
+SITE_OBJECT_TYPES: Dict[str, str] = {
+    'flat': 'квартир',
+    'room': 'комнат',
+    'house': 'дом',
+    'land': 'участ',
+    'commercial': 'коммерч',
+}
+
+
+class LeadFilter(object):
+    """
+    Two-tier lead evaluator compiled from filter rules.
+
+    check_card() runs on card snapshot data before any tab is opened.
+    Card is rejected if any of known fields doesn't fit
+    and is ambiguous if some fields are missing on the card.
+    The opened lead page is checked field by field.
+
+    Region and type rules are compiled into single regular expressions
+    over normalized text once, so a new filter is built on rules change.
+    Locations found in gazetteer are matched by the place and its parents.
+    Regular expressions are used for unknown places
+    and for regions of rules which aren't in gazetteer.
+
+    Parameters
+    ----------
+    regions : Iterable[str]
+        Location must contain one of the regions
+    exclude_regions : Iterable[str]
+        Location must contain none of these
+    object_types : Iterable[str]
+        Lead type must contain every word of one of these phrases
+    max_age : Optional[float]
+        Max lead age in seconds
+    center : Optional[str]
+        Place within radius from which is accepted as well
+    radius : Optional[float]
+        Radius in kilometers
+    max_price : Optional[int]
+        Max lead price in roubles
+    gazetteer : Optional[Gazetteer]
+        Places index, shared one is used by default
+    """
+
+    def __init__(self, regions: Iterable[str] = REGIONS, exclude_regions: Iterable[str] = (),
+                 object_types: Iterable[str] = OBJECT_TYPES, max_age: Optional[float] = None,
+                 center: Optional[str] = None, radius: Optional[float] = None,
+                 max_price: Optional[int] = MAX_LEAD_PRICE or None,
+                 gazetteer: Optional[Gazetteer] = None) -> None:
+
+        self.regions = list(regions)
+        self.exclude_regions = list(exclude_regions)
+        self.object_types = list(object_types)
+        self.max_age = max_age
+        self.center = center
+        self.radius = radius
+        self.max_price = max_price
+
+        self.gazetteer = gazetteer or get_gazetteer()
+
+        known = self.gazetteer.index if self.gazetteer is not None else {}
+
+        self._include_keys = frozenset(key for key in map(place_key, self.regions) if key in known)
+        self._exclude_keys = frozenset(key for key in map(place_key, self.exclude_regions) if key in known)
+
+        self._center = None
+
+        if self.gazetteer is not None and center and radius:
+
+            self._center = self.gazetteer.resolve(center)
+
+            if self._center is None:
+                logging.warning(f"Radius center {center} isn't found in gazetteer")
+
+        self._include = self._compile_any(self.regions)
+        self._exclude = self._compile_any(self.exclude_regions)
+
+        # Regions gazetteer doesn't know are matched by text even in known places
+        self._include_unknown = self._compile_any(region for region in self.regions
+                                                  if place_key(region) not in known)
+        self._exclude_unknown = self._compile_any(region for region in self.exclude_regions
+                                                  if place_key(region) not in known)
+
+        # Every word of a phrase in any order
+        self._types = re.compile('|'.join(
+            ''.join(f'(?=.*{re.escape(word)})' for word in normalize_text(phrase).split())
+            for phrase in self.object_types if phrase.strip()
+        ) or '(?!)', re.DOTALL)
+
+    @staticmethod
+    def _compile_any(phrases: Iterable[str]) -> Pattern:
+
+        # Longer alternatives go first so they win over their prefixes
+        phrases = sorted({normalize_text(phrase.strip()) for phrase in phrases if phrase.strip()}, key=len, reverse=True)
+
+        return re.compile('|'.join(map(re.escape, phrases)) or '(?!)')
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> 'LeadFilter':
+        return cls(
+            regions=config.get('regions') or REGIONS,
+            exclude_regions=config.get('exclude_regions') or (),
+            object_types=config.get('object_types') or OBJECT_TYPES,
+            max_age=config.get('max_age') or None,
+            center=config.get('center') or None,
+            radius=config.get('radius') or None,
+        )
+
+    @property
+    def config(self) -> Dict[str, Any]:
+        return {
+            'regions': self.regions,
+            'exclude_regions': self.exclude_regions,
+            'object_types': self.object_types,
+            'max_age': self.max_age,
+            'center': self.center,
+            'radius': self.radius,
+        }
+
+    @property
+    def site_object_types(self) -> List[str]:
+        """
+        Object types to choose in leads page filter.
+        Empty if any object type rule has no site type,
+        then leads page shows any object.
+        """
+
+        site_types = set()
+
+        for phrase in self.object_types:
+
+            words = normalize_text(phrase).split()
+
+            matched = {site_type for site_type, stem in SITE_OBJECT_TYPES.items()
+                       if any(word.startswith(stem) for word in words)}
+
+            if not matched:
+                return []
+
+            site_types |= matched
+
+        return sorted(site_types)
+
+    def check_price(self, price: str) -> str:
+
+        value = parse_price(price)
+
+        if value is None:
+            return UNKNOWN
+
+        if self.max_price is not None and value > self.max_price:
+            return REJECT
+
+        return ACCEPT
+
+    @staticmethod
+    def check_sold(header: str) -> str:
+        """
+        Header of the lead page starts with '100' if lead is already purchased by someone.
+        """
+
+        if not header:
+            return UNKNOWN
+
+        if header.strip().startswith('100'):
+            return REJECT
+
+        return ACCEPT
+
+    def check_region(self, location: str) -> str:
+
+        if not location:
+            return UNKNOWN
+
+        place = self.gazetteer.resolve(location) if self.gazetteer is not None else None
+
+        location = normalize_text(location)
+
+        if place is not None:
+            return self._check_place(place, location)
+
+        if self._exclude.search(location):
+            return REJECT
+
+        if self._include.search(location):
+            return ACCEPT
+
+        return REJECT
+
+    def _check_place(self, place: int, location: str) -> str:
+
+        keys = self.gazetteer.lineage_keys(place)
+
+        if keys & self._exclude_keys or self._exclude_unknown.search(location):
+            return REJECT
+
+        if keys & self._include_keys or self._include_unknown.search(location):
+            return ACCEPT
+
+        if self._center is not None:
+
+            distance = self.gazetteer.distance(self._center, place)
+
+            if distance is not None and distance <= self.radius:
+                return ACCEPT
+
+        return REJECT
+
+    def check_type(self, lead_type: str) -> str:
+
+        if not lead_type:
+            return UNKNOWN
+
+        if self._types.match(normalize_text(lead_type)):
+            return ACCEPT
+
+        return REJECT
+
+    def check_age(self, created: str, now: Optional[datetime] = None) -> str:
+
+        if self.max_age is None:
+            return ACCEPT
+
+        age = card_age(created, now)
+
+        if age is None:
+            return UNKNOWN
+
+        if age > self.max_age:
+            return REJECT
+
+        return ACCEPT
+
+    def _combine(self, checks: Iterable[Tuple[str, str]]) -> Verdict:
+
+        verdict = ACCEPT
+
+        for name, result in checks:
+
+            if result == REJECT:
+                return REJECT, name
+
+            if result == UNKNOWN:
+                verdict = UNKNOWN
+
+        return verdict, None
+
+    def check_card(self, card: LeadCard) -> Verdict:
+        """
+        Returns verdict and name of the failed check if rejected.
+        """
+
+        return self._combine((
+            ('price', self.check_price(card.price)),
+            ('region', self.check_region(card.location)),
+            ('type', self.check_type(card.type)),
+            ('age', self.check_age(card.created)),
+        ))
+
+
+class FilterStateCache(object):
+    """
+    Leads page url with applied filters stored on disk.
+
+    The key is a hash of filter config, so cached url is dropped
+    as soon as filter config changes.
+    """
+
+    def __init__(self, path: str, config: Any) -> None:
+
+        self.path = path
+        self.key = self.config_key(config)
+        self.url: Optional[str] = None
+
+        self.load()
+
+    @staticmethod
+    def config_key(config: Any) -> str:
+        return hashlib.sha1(json.dumps(config, ensure_ascii=False, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def load(self) -> None:
+
+        try:
+            with open(self.path, 'r') as f:
+                state = json.load(f)
+
+        except FileNotFoundError:
+            return
+
+        except Exception as e:
+            logging.exception(e, exc_info=True)
+            return
+
+        if state.get('key') == self.key:
+            self.url = state.get('url')
+
+    def save(self, url: str) -> None:
+
+        self.url = url
+
+        with open(self.path, 'w') as f:
+            json.dump({'key': self.key, 'url': url}, f)
+
+    def invalidate(self) -> None:
+
+        logging.info("Cached filters state is dropped")
+
+        self.url = None
+
+        try:
+            with open(self.path, 'w') as f:
+                json.dump({}, f)
+
+        except Exception as e:
+            logging.exception(e, exc_info=True)
@@ -0,0 +1,296 @@
+# builtin imports
+import csv
+import logging
+import math
+import os
+import pickle
+import re
+from collections import OrderedDict
+from typing import Dict, FrozenSet, List, NamedTuple, Optional, Tuple
+
+# local imports
+from .waits import normalize_text
+
+from settings import GAZETTEER_PATH
+
+
+INDEX_VERSION = 1
+
+# Longest place name in words
+MAX_NAME_WORDS = 5
+
+# Resolved locations kept in memory
+RESOLVE_CACHE_SIZE = 4096
+
+# Settlement and district type words, ignored in names and locations
+PLACE_TYPE_WORDS = frozenset((
+    'г', 'город', 'го', 'г.о', 'городской', 'округ', 'пос', 'поселок', 'п', 'пгт', 'рп',
+    'мкр', 'микрорайон', 'р-н', 'район', 'д', 'деревня', 'с', 'село', 'обл', 'область',
+    'дом', 'корп', 'к', 'стр', 'кв',
+))
+
+# Street type words: the next word is a street name, not a place
+STREET_WORDS = frozenset((
+    'ул', 'улица', 'пр', 'пр-т', 'пр-кт', 'проспект', 'ш', 'шоссе', 'пер', 'переулок',
+    'б-р', 'бульвар', 'наб', 'набережная', 'проезд', 'пл', 'площадь', 'туп', 'тупик',
+    'аллея', 'линия', 'просек', 'тракт',
+))
+
+TOKEN_RE = re.compile(r'[\w-]+(?:\.\w+)*')
+
+
+class Place(NamedTuple):
+
+    name: str
+    parent: int
+    lat: Optional[float] = None
+    lon: Optional[float] = None
+
+
+def tokens(text: str) -> List[str]:
+    return [token.strip('-') for token in TOKEN_RE.findall(normalize_text(text)) if token.strip('-')]
+
+
+def place_key(text: str) -> str:
+    """
+    Comparable form of a place name: normalized words without type words.
+    """
+
+    return ' '.join(token for token in tokens(text) if token not in PLACE_TYPE_WORDS)
+
+
+class Gazetteer(object):
+    """
+    Local index of places: settlements, districts and their parent regions.
+
+    Built once from bundled TSV file (name, parent, aliases, lat, lon)
+    into a pickled index, which is rebuilt only when TSV file changes.
+    Location strings are resolved with dictionary lookups of word n-grams,
+    so streets named after towns and substrings of other words don't match.
+    """
+
+    def __init__(self, places: List[Place], index: Dict[str, List[int]], keys: List[FrozenSet[str]]) -> None:
+
+        self.places = places
+        self.index = index
+        self.keys = keys
+
+        # Least recently resolved locations are dropped first
+        self._cache: 'OrderedDict[str, Optional[int]]' = OrderedDict()
+
+    @classmethod
+    def build(cls, tsv_path: str) -> 'Gazetteer':
+
+        places: List[Place] = []
+        aliases: List[List[str]] = []
+        parents: List[str] = []
+
+        with open(tsv_path, 'r', encoding='utf-8', newline='') as f:
+
+            for row in csv.reader(f, delimiter='\t'):
+
+                if not row or row[0].startswith('#'):
+                    continue
+
+                row += [''] * (5 - len(row))
+
+                name, parent, names, lat, lon = (field.strip() for field in row[:5])
+
+                places.append(Place(name, -1, float(lat) if lat else None, float(lon) if lon else None))
+                aliases.append([name] + [alias for alias in names.split(',') if alias.strip()])
+                parents.append(parent)
+
+        positions = {place.name: position for position, place in enumerate(places)}
+
+        index: Dict[str, List[int]] = {}
+        keys: List[FrozenSet[str]] = []
+
+        for position, (place, parent) in enumerate(zip(places, parents)):
+
+            if parent:
+                places[position] = place._replace(parent=positions[parent])
+
+            place_keys = frozenset(filter(None, map(place_key, aliases[position])))
+
+            keys.append(place_keys)
+
+            for key in place_keys:
+                index.setdefault(key, []).append(position)
+
+        return cls(places, index, keys)
+
+    @classmethod
+    def load(cls, tsv_path: str, index_path: Optional[str] = None) -> 'Gazetteer':
+        """
+        Load pickled index if it's fresh, otherwise build and store it.
+        """
+
+        if index_path and os.path.exists(index_path) \
+                and os.path.getmtime(index_path) >= os.path.getmtime(tsv_path):
+
+            try:
+
+                with open(index_path, 'rb') as f:
+                    version, places, index, keys = pickle.load(f)
+
+                if version == INDEX_VERSION:
+                    return cls([Place(*place) for place in places], index, keys)
+
+            except Exception as e:
+                logging.exception(e, exc_info=True)
+
+        gazetteer = cls.build(tsv_path)
+
+        if index_path:
+
+            try:
+                with open(index_path, 'wb') as f:
+                    pickle.dump((INDEX_VERSION, [tuple(place) for place in gazetteer.places],
+                                 gazetteer.index, gazetteer.keys), f, protocol=pickle.HIGHEST_PROTOCOL)
+            except OSError as e:
+                logging.warning(f"Can't store gazetteer index: {e}")
+
+        return gazetteer
+
+    def lineage(self, position: int) -> List[int]:
+        """
+        Place and all its parents, the place first.
+        """
+
+        chain = []
+
+        while position != -1:
+            chain.append(position)
+            position = self.places[position].parent
+
+        return chain
+
+    def _matches(self, location: str) -> List[List[int]]:
+        """
+        Candidate places for every place name found in location.
+        """
+
+        matches = []
+
+        for part in re.split(r'[,;\n]', location):
+
+            words = tokens(part)
+
+            whole = self.index.get(place_key(part))
+
+            if whole:
+                matches.append(whole)
+                continue
+
+            # Drop type words and names of streets
+            kept = []
+            skip_next = False
+
+            for word in words:
+
+                if word in STREET_WORDS:
+                    skip_next = True
+                    continue
+
+                if skip_next:
+                    skip_next = False
+                    continue
+
+                if word not in PLACE_TYPE_WORDS:
+                    kept.append(word)
+
+            start = 0
+
+            while start < len(kept):
+
+                for size in range(min(MAX_NAME_WORDS, len(kept) - start), 0, -1):
+
+                    candidates = self.index.get(' '.join(kept[start:start + size]))
+
+                    if candidates:
+                        matches.append(candidates)
+                        start += size
+                        break
+                else:
+                    start += 1
+
+        return matches
+
+    def resolve(self, location: str) -> Optional[int]:
+        """
+        The most specific place mentioned in location.
+        Ambiguous names are resolved by other places in the same location.
+        """
+
+        if location in self._cache:
+            self._cache.move_to_end(location)
+            return self._cache[location]
+
+        matches = self._matches(location)
+
+        best: Optional[int] = None
+        best_score: Tuple[int, int] = (-1, -1)
+
+        for candidates in matches:
+
+            for candidate in candidates:
+
+                lineage = set(self.lineage(candidate))
+
+                support = sum(1 for other in matches if other is not candidates and lineage.intersection(other))
+
+                score = (support, len(lineage))
+
+                if score > best_score:
+                    best, best_score = candidate, score
+
+        self._cache[location] = best
+
+        if len(self._cache) > RESOLVE_CACHE_SIZE:
+            self._cache.popitem(last=False)
+
+        return best
+
+    def lineage_keys(self, position: int) -> FrozenSet[str]:
+        """
+        Names and aliases of place and all its parents.
+        """
+
+        return frozenset().union(*(self.keys[parent] for parent in self.lineage(position)))
+
+    def distance(self, first: int, second: int) -> Optional[float]:
+        """
+        Great-circle distance between places in kilometers.
+        """
+
+        a, b = self.places[first], self.places[second]
+
+        if None in (a.lat, a.lon, b.lat, b.lon):
+            return None
+
+        lat1, lon1, lat2, lon2 = map(math.radians, (a.lat, a.lon, b.lat, b.lon))
+
+        h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+
+        return 2 * 6371 * math.asin(math.sqrt(h))
+
+
+_gazetteer: Optional[Gazetteer] = None
+
+
+def get_gazetteer() -> Optional[Gazetteer]:
+    """
+    Shared gazetteer loaded from bundled places file.
+    None if it can't be loaded.
+    """
+
+    global _gazetteer
+
+    if _gazetteer is None:
+
+        try:
+            _gazetteer = Gazetteer.load(str(GAZETTEER_PATH), os.environ.get('GAZETTEER_INDEX_PATH'))
+        except Exception as e:
+            logging.exception(e, exc_info=True)
+
+    return _gazetteer
@@ -0,0 +1,193 @@
+# builtin imports
+import hashlib
+import logging
+import re
+from typing import Any, List, NamedTuple, Optional
+
+# local imports
+from typehints import WebElement
+
+
+# Clock time on a card, i.e. '10:15' or 'вчера, 10:15'
+CLOCK_RE = re.compile(r'\d{1,2}:\d{2}')
+
+# Relative card times, i.e. 'только что', '5 минут назад'
+RELATIVE_TIME_RE = re.compile(r'назад|только что|сейчас', re.IGNORECASE)
+
+
+# Collect every lead card on the leads page in a single WebDriver call.
+# Element handles returned from the script are converted
+# to WebElement by selenium. Only markup known from lead pages is read,
+# fields missing on the card stay empty and are checked on the lead page.
+# Card price has no known markup. If lead id isn't found, OpenLead target
+# or element id is kept to tell the card from others.
+LEAD_CARDS_SCRIPT = """
+const text = (root, selectors) => {
+    for (const selector of selectors) {
+        const elem = root.querySelector(selector);
+        if (elem && elem.innerText) {
+            return elem.innerText.trim();
+        }
+    }
+    return '';
+};
+
+const leadId = (card, button) => {
+    const link = card.querySelector('a[href*="/leads/"]');
+    const href = link ? link.getAttribute('href') : '';
+    const match = href.match(/\\/leads\\/(\\d+)/);
+    if (match) {
+        return parseInt(match[1]);
+    }
+    for (const elem of [card, button]) {
+        if (!elem) {
+            continue;
+        }
+        for (const attr of ['data-lead-id', 'data-id', 'data-leadid']) {
+            const value = elem.getAttribute(attr);
+            if (value && /^\\d+$/.test(value)) {
+                return parseInt(value);
+            }
+        }
+        // OpenLead target may be stored as a link
+        for (const attr of ['href', 'formaction', 'data-href']) {
+            const target = (elem.getAttribute(attr) || '').match(/\\/leads\\/(\\d+)/);
+            if (target) {
+                return parseInt(target[1]);
+            }
+        }
+    }
+    return null;
+};
+
+const target = (card, button) => {
+    for (const elem of [button, card.querySelector('a[href]'), card]) {
+        if (!elem) {
+            continue;
+        }
+        for (const attr of ['href', 'formaction', 'data-href', 'id']) {
+            const value = elem.getAttribute(attr);
+            if (value && value !== '#') {
+                return value;
+            }
+        }
+    }
+    return '';
+};
+
+return Array.from(document.querySelectorAll('div[data-name="LeadsCardsWrapper"]')).map((card, index) => {
+    const button = card.querySelector('button[data-name="OpenLead"]');
+    return {
+        index: index,
+        created: text(card, ['[data-name="SecondInfo"] span']),
+        lead_id: leadId(card, button),
+        location: text(card, ['[data-mark="location"]']),
+        type: text(card, ['[data-mark="demand_message-info_title"]']),
+        target: target(card, button),
+        button: button,
+        element: card,
+    };
+});
+"""
+
+
+class LeadCard(NamedTuple):
+    """
+    In-memory snapshot of a single lead card from the leads page.
+    """
+
+    index: int
+    created: str
+    lead_id: Optional[int] = None
+    location: str = ''
+    type: str = ''
+    price: str = ''
+    # OpenLead target or element id of a card without lead id
+    target: str = ''
+    button: Optional[WebElement] = None
+    element: Optional[WebElement] = None
+
+    @property
+    def fingerprint(self) -> str:
+        """
+        Stable key to decide whether the lead was seen before.
+        """
+
+        return lead_fingerprint(self.lead_id, self.target, stable_created(self.created), self.location, self.type)
+
+    @property
+    def identifiable(self) -> bool:
+        """
+        Whether fingerprint tells the card from any other card.
+        Fingerprint of a card with neither lead id nor target
+        may be shared by other cards, i.e. by every card posted 'только что'.
+        """
+
+        return self.lead_id is not None or bool(self.target)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'LeadCard':
+        return cls(**{field: data.get(field) for field in cls._fields if field in data})
+
+
+def lead_id_from_url(url: Any) -> Optional[int]:
+    """
+    Extract lead id from lead url, i.e. https://my.cian.ru/leads/1504220/
+    """
+
+    match = re.search(r'/leads/(\d+)', str(url))
+
+    return int(match.group(1)) if match else None
+
+
+def stable_created(created: Optional[str]) -> str:
+    """
+    Part of card creation time which doesn't change between refreshes.
+    Clock time is kept without day words, which change at midnight.
+    Relative times are dropped.
+    """
+
+    if not created:
+        return ''
+
+    match = CLOCK_RE.search(created)
+
+    if match:
+        return match.group()
+
+    if RELATIVE_TIME_RE.search(created):
+        return ''
+
+    return created
+
+
+def lead_fingerprint(lead_id: Optional[int], *fields: Optional[str]) -> str:
+    """
+    Lead id based key if id is known.
+    Otherwise composite hash of the card fields.
+    """
+
+    if lead_id is not None:
+        return f"id:{lead_id}"
+
+    composite = '\x1f'.join(' '.join((field or '').split()) for field in fields)
+
+    return "card:" + hashlib.sha1(composite.encode('utf-8')).hexdigest()[:20]
+
+
+def parse_cards(raw_cards: Optional[List[Any]]) -> List[LeadCard]:
+    """
+    Convert execute_script result into LeadCard list.
+    Malformed entries are logged and skipped.
+    """
+
+    cards = []
+
+    for raw_card in raw_cards or []:
+
+        try:
+            cards.append(LeadCard.from_dict(raw_card))
+        except Exception as e:
+            logging.exception(e, exc_info=True)
+
+    return cards
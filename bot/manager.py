@@ -54,7 +54,7 @@ class CianBotManager(metaclass=MetaSingleton):
     def quit(self) -> None:
 
         if not self.is_quited():
-            self._worker.signal_quit = 1
+            self._worker.signal_quit.value = 1
             logging.info("Bot closed.")
 
     def is_running(self) -> bool:
@@ -73,39 +73,66 @@ class CianBotManager(metaclass=MetaSingleton):
         return {'phone_code': self._worker.signal_phone_code.value}
 
     def get_status(self) -> str:
+        return self._status(self._worker.status.read())
 
-        if self.is_launching():
+    @staticmethod
+    def _status(status: dict) -> str:
+
+        if status['launch']:
             return 'launching'
-        elif self.is_running():
+        elif status['run']:
             return 'running'
-        elif self._worker.exc_on_exit.value != "":
+        elif status['error'] != "":
             return 'quited_with_error'
-        elif self.is_quited():
+        elif status['quit']:
             return 'quited'
         else:
             return 'stopped'
 
-    def get_new_leads(self) -> List[Tuple[str, datetime]]:
+    def get_state(self) -> dict:
+        """
+        Everything client polls for, read from worker's status in one copy.
         """
-        Pop all new leads from worker's list
 
-        Returns
-        -------
-        List[str]
-            List with new Leads
+        status = self._worker.status.read()
+
+        return {
+            'status': self._status(status),
+            'info': status['info'],
+            'money_left': status['money_left'],
+            'error': status['error'],
+            'phone_code': status['phone_code'],
+        }
+
+    def get_state_version(self) -> int:
+        """
+        Changes whenever worker's status is written,
+        so clients read the state only after it's changed.
+        """
+
+        return self._worker.status.version
 
+    def get_new_leads(self, since: int) -> Tuple[List[Tuple[str, datetime]], int]:
         """
+        Leads purchased after given sequence number.
+        Leads aren't removed, so every client gets them.
 
-        if len(self._worker.purchased_leads) != 0:
+        Parameters
+        ----------
+        since : int
+            Sequence number of the last purchase client has seen
 
-            leads = list(self._worker.purchased_leads)
+        Returns
+        -------
+        Tuple[List[Tuple[str, datetime]], int]
+            New leads with purchase time and the last sequence number
 
-            # Reset list
-            self._worker.purchased_leads[:] = []
+        """
 
-            return leads
+        return self._worker.purchased_leads.since(since)
 
-        return []
+    def get_last_purchase(self) -> int:
+        return self._worker.purchased_leads.last
 
     def get_money_left(self) -> int:
         return self._worker.money_left.value
@@ -0,0 +1,107 @@
+# builtin imports
+import logging
+import re
+from datetime import datetime
+from typing import Callable, Iterable, List, Optional, Tuple
+
+# local imports
+from .scheduler import SEEN
+
+PRICE_RE = re.compile(r'\d[\d\s  ]*')
+
+
+def parse_price(text: str) -> Optional[int]:
+    """
+    Price in roubles from text like 'Оплатить 1 200 ₽'.
+    """
+
+    if not text:
+        return None
+
+    match = PRICE_RE.search(text)
+
+    if match is None:
+        return None
+
+    return int(re.sub(r'\D', '', match.group()))
+
+
+class BudgetPacer(object):
+    """
+    Spread day money limit along the day.
+
+    By the end of every hour bot may spend a share of day limit
+    equal to the share of leads arriving until that hour by history,
+    plus some slack. Purchases over the allowance are deferred:
+    lead isn't ignored, so it's evaluated again on the next poll.
+
+    Until history is fitted, only money left is checked.
+    """
+
+    def __init__(self, slack: float = 0.1, clock: Callable[[], datetime] = datetime.now) -> None:
+
+        self.slack = slack
+        self.clock = clock
+
+        # Share of day's leads arrived until the end of every hour
+        self.cumulative: Optional[List[float]] = None
+
+    def fit(self, events: Iterable[Tuple[datetime, str]]) -> None:
+        """
+        Learn arrival distribution along the day from history of lead events.
+        """
+
+        arrivals = [0] * 24
+
+        for created_on, kind in events:
+            if kind == SEEN:
+                arrivals[created_on.hour] += 1
+
+        total = sum(arrivals)
+
+        if not total:
+            self.cumulative = None
+            return
+
+        self.cumulative = []
+
+        running = 0
+
+        for count in arrivals:
+            running += count
+            self.cumulative.append(running / total)
+
+        logging.info(f"Budget share by hour: {[round(share, 2) for share in self.cumulative]}")
+
+    def allowance(self, day_limit: int, now: Optional[datetime] = None) -> float:
+        """
+        Money which may be spent since the start of the day.
+        """
+
+        if self.cumulative is None:
+            return day_limit
+
+        now = now or self.clock()
+
+        return day_limit * min(1.0, self.cumulative[now.hour] + self.slack)
+
+    def approve(self, price: int, money_left: int, day_limit: int, now: Optional[datetime] = None) -> bool:
+        """
+        Whether lead with given price may be purchased now.
+        """
+
+        if price > money_left:
+            return False
+
+        if self.cumulative is None:
+            return True
+
+        spent = day_limit - money_left
+
+        if spent + price > self.allowance(day_limit, now):
+
+            logging.info(f"Purchase for {price} is deferred: {spent} of {day_limit} is already spent")
+
+            return False
+
+        return True
@@ -0,0 +1,140 @@
+# builtin imports
+import math
+import re
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+# local imports
+from .leads import LeadCard
+from .pacing import parse_price
+from .waits import normalize_text
+
+from settings import OBJECT_TYPES, REGIONS
+
+
+# Score weights of every card feature, each feature is within [0, 1]
+SCORE_WEIGHTS: Dict[str, float] = {
+    'freshness': 4.0,
+    'region': 2.0,
+    'type': 1.0,
+    'price': 1.0,
+}
+
+# Unknown feature gets average score
+NEUTRAL = 0.5
+
+
+def card_age(created: str, now: Optional[datetime] = None) -> Optional[float]:
+    """
+    Age of the lead in seconds from card's creation text:
+    'только что', '5 минут назад', '2 часа назад', '10:15', 'вчера, 10:15'.
+    """
+
+    if not created:
+        return None
+
+    now = now or datetime.now()
+
+    created = normalize_text(created)
+
+    if 'только что' in created:
+        return 0.0
+
+    match = re.search(r'(\d+)\s*(мин|час|сек)', created)
+
+    if match:
+        amount, unit = int(match.group(1)), match.group(2)
+        return amount * {'сек': 1, 'мин': 60, 'час': 3600}[unit]
+
+    match = re.search(r'(\d{1,2}):(\d{2})', created)
+
+    if match is None:
+        return None
+
+    moment = now.replace(hour=int(match.group(1)), minute=int(match.group(2)), second=0, microsecond=0)
+
+    if 'вчера' in created or moment > now:
+        moment -= timedelta(days=1)
+
+    return (now - moment).total_seconds()
+
+
+class LeadScorer(object):
+    """
+    Rank candidate cards before any tab is opened, so under
+    contention and limited budget the most valuable leads go first.
+
+    Score is a weighted sum of freshness (fresh leads are sniped first),
+    region priority by REGIONS order, match with configured object types
+    and price (cheaper lead leaves money for more leads).
+    """
+
+    def __init__(self, regions: Iterable[str] = REGIONS, weights: Optional[Dict[str, float]] = None,
+                 half_life: float = 600, object_types: Iterable[str] = OBJECT_TYPES) -> None:
+
+        self.regions = [normalize_text(region) for region in regions]
+        self.object_types = [normalize_text(phrase).split() for phrase in object_types if phrase.strip()]
+        self.weights = weights or SCORE_WEIGHTS
+        self.half_life = half_life
+
+    def freshness(self, card: LeadCard, now: Optional[datetime] = None) -> float:
+
+        age = card_age(card.created, now)
+
+        if age is None:
+            return NEUTRAL
+
+        return math.pow(0.5, age / self.half_life)
+
+    def region(self, card: LeadCard) -> float:
+
+        if not card.location:
+            return NEUTRAL
+
+        location = normalize_text(card.location)
+
+        for position, region in enumerate(self.regions):
+            if region in location:
+                return 1 - position / len(self.regions)
+
+        return 0.0
+
+    def type(self, card: LeadCard) -> float:
+        """
+        Share of words of the best matching object type found in lead type.
+        """
+
+        if not card.type or not self.object_types:
+            return NEUTRAL
+
+        lead_type = normalize_text(card.type)
+
+        return max(sum(word in lead_type for word in words) / len(words) for words in self.object_types)
+
+    @staticmethod
+    def price(card: LeadCard, prices: List[int]) -> float:
+
+        price = parse_price(card.price)
+
+        if price is None or not prices or max(prices) == min(prices):
+            return NEUTRAL
+
+        return (max(prices) - price) / (max(prices) - min(prices))
+
+    def rank(self, cards: List[LeadCard], now: Optional[datetime] = None) -> List[LeadCard]:
+        """
+        Cards sorted by score, the best first.
+        Cards with equal score keep their page order.
+        """
+
+        now = now or datetime.now()
+
+        prices = [price for price in map(parse_price, (card.price for card in cards)) if price is not None]
+
+        def score(card: LeadCard) -> float:
+            return (self.weights['freshness'] * self.freshness(card, now)
+                    + self.weights['region'] * self.region(card)
+                    + self.weights['type'] * self.type(card)
+                    + self.weights['price'] * self.price(card, prices))
+
+        return sorted(cards, key=score, reverse=True)
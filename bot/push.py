@@ -0,0 +1,157 @@
+# builtin imports
+import logging
+from typing import Any, Dict, List, Optional
+
+# third-party imports
+from selenium.common import exceptions
+
+
+# Observe leads list in the page and queue new lead cards
+# and leads list responses. Installed once per page load.
+INSTALL_SCRIPT = """
+const apiPattern = arguments[0];
+
+if (window.__cianBotPush) {
+    window.__cianBotPush.queue.length = 0;
+    return false;
+}
+
+const push = window.__cianBotPush = {queue: [], waiter: null};
+
+const notify = (event) => {
+    if (push.queue.length >= 100) {
+        push.queue.shift();
+    }
+    push.queue.push(Object.assign({time: Date.now()}, event));
+    if (push.waiter) {
+        push.waiter();
+    }
+};
+
+const selector = 'div[data-name="LeadsCardsWrapper"]';
+
+new MutationObserver((mutations) => {
+    let cards = 0;
+    for (const mutation of mutations) {
+        for (const node of mutation.addedNodes) {
+            if (node.nodeType !== Node.ELEMENT_NODE) {
+                continue;
+            }
+            if (node.matches(selector)) {
+                cards += 1;
+            } else {
+                cards += node.querySelectorAll(selector).length;
+            }
+        }
+    }
+    if (cards) {
+        notify({kind: 'cards', count: cards});
+    }
+}).observe(document.body, {childList: true, subtree: true});
+
+if (apiPattern) {
+
+    const open = XMLHttpRequest.prototype.open;
+    XMLHttpRequest.prototype.open = function (method, url) {
+        if (String(url).includes(apiPattern)) {
+            this.addEventListener('load', () => notify({kind: 'response', status: this.status}));
+        }
+        return open.apply(this, arguments);
+    };
+
+    const fetch = window.fetch;
+    window.fetch = function (resource) {
+        const result = fetch.apply(this, arguments);
+        const url = resource && resource.url ? resource.url : String(resource);
+        if (url.includes(apiPattern)) {
+            result.then((response) => notify({kind: 'response', status: response.status}), () => null);
+        }
+        return result;
+    };
+}
+
+return true;
+"""
+
+# Block until something is queued or timeout is over.
+# Returns null if observer isn't installed in the page.
+WAIT_SCRIPT = """
+const [timeout, done] = [arguments[0], arguments[arguments.length - 1]];
+const push = window.__cianBotPush;
+
+if (!push) {
+    done(null);
+    return;
+}
+
+const drain = () => {
+    clearTimeout(timer);
+    push.waiter = null;
+    done(push.queue.splice(0));
+};
+
+const timer = setTimeout(drain, timeout);
+
+if (push.queue.length) {
+    drain();
+} else {
+    push.waiter = drain;
+}
+"""
+
+
+class PushChannel(object):
+    """
+    Page-side queue of leads list changes.
+
+    New lead cards rendered by the page itself and responses
+    of leads endpoint are queued by injected observer. Worker blocks
+    on the queue instead of sleeping, so new leads are seen within
+    the page's own refresh cadence.
+    """
+
+    def __init__(self, driver: Any, api_pattern: str = '') -> None:
+
+        self.driver = driver
+        self.api_pattern = api_pattern
+
+    def install(self) -> bool:
+        """
+        Inject observer if it isn't in the page yet and clear its queue.
+        Returns False if it can't be injected.
+        """
+
+        try:
+
+            if self.driver.execute_script(INSTALL_SCRIPT, self.api_pattern):
+                logging.info("Leads push channel is installed")
+
+            return True
+
+        except exceptions.WebDriverException as e:
+
+            logging.warning(f"Can't install leads push channel: {e}")
+
+            return False
+
+    def wait(self, timeout: float) -> Optional[List[Dict[str, Any]]]:
+        """
+        Queued events or an empty list if nothing happened within timeout.
+        None if observer isn't installed, i.e. page was reloaded.
+        """
+
+        try:
+
+            self.driver.set_script_timeout(timeout + 5)
+
+            return self.driver.execute_async_script(WAIT_SCRIPT, int(timeout * 1000))
+
+        except exceptions.TimeoutException:
+
+            return []
+
+        except exceptions.WebDriverException as e:
+
+            logging.warning(f"Leads push channel is broken: {e}")
+
+            return None
@@ -0,0 +1,164 @@
+# builtin imports
+import logging
+import random
+from typing import Callable, Dict, Optional
+
+# local imports
+from .clock import SystemClock
+
+
+class Reconnector(object):
+    """
+    Reconnect state machine with jittered exponential backoff.
+
+    online -> offline: connection loss is detected, recover() is called
+    offline -> recovering: reachability probe passed
+    recovering -> online: page is restored
+    recovering -> offline: page restore failed, keep backing off
+
+    Outage durations and recovery counts are kept as metrics.
+
+    Backoff delay is slept in short steps, so recovery is stopped
+    as soon as the bot is asked to stop.
+    """
+
+    ONLINE = 'online'
+    OFFLINE = 'offline'
+    RECOVERING = 'recovering'
+
+    def __init__(self, base_delay: float = 1.0, max_delay: float = 120.0,
+                 factor: float = 2.0, max_outage: Optional[float] = None, step: float = 1.0,
+                 clock: Optional[SystemClock] = None) -> None:
+
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.factor = factor
+        self.max_outage = max_outage
+        self.step = step
+        self.clock = clock or SystemClock()
+
+        self.state = self.ONLINE
+
+        self.outages = 0
+        self.failed_attempts = 0
+        self.total_outage = 0.0
+        self.longest_outage = 0.0
+        self.last_outage = 0.0
+        self.last_recovered_at: Optional[float] = None
+
+    def delay(self, attempt: int) -> float:
+        """
+        Backoff delay for given attempt number with jitter
+        within the upper half of exponential delay.
+        """
+
+        delay = min(self.max_delay, self.base_delay * self.factor ** attempt)
+
+        return delay * random.uniform(0.5, 1.0)
+
+    def sleep(self, delay: float, stopped: Optional[Callable[[], bool]] = None) -> None:
+        """
+        Sleep for delay in steps checking whether recovery should be stopped.
+        """
+
+        while delay > 0:
+
+            if stopped is not None and stopped():
+                raise ConnectionAbortedError("Reconnect is stopped")
+
+            step = min(self.step, delay)
+
+            self.clock.sleep(step)
+
+            delay -= step
+
+    def recover(self, probe: Callable[[], bool], restore: Callable[[], bool],
+                stopped: Optional[Callable[[], bool]] = None) -> None:
+        """
+        Block until connection is restored.
+
+        Parameters
+        ----------
+        probe : Callable[[], bool]
+            Lightweight reachability check
+        restore : Callable[[], bool]
+            Heavy page restore, called only after probe passed
+        stopped : Optional[Callable[[], bool]]
+            Whether the bot is asked to stop or quit
+
+        Raises
+        ------
+        ConnectionError
+            If outage lasts longer than max_outage
+        ConnectionAbortedError
+            If the bot is asked to stop during outage
+
+        """
+
+        started = self.clock.monotonic()
+
+        self.state = self.OFFLINE
+        self.outages += 1
+
+        attempt = 0
+
+        try:
+
+            while True:
+
+                duration = self.clock.monotonic() - started
+
+                if self.max_outage is not None and duration > self.max_outage:
+                    raise ConnectionError(f"Connection is lost for {duration:.0f}s")
+
+                delay = self.delay(attempt)
+
+                logging.info(f"Connection lost. Retry #{attempt + 1} in {delay:.1f}s")
+
+                self.sleep(delay, stopped)
+
+                attempt += 1
+
+                if not probe():
+                    self.failed_attempts += 1
+                    continue
+
+                self.state = self.RECOVERING
+
+                try:
+                    restored = restore()
+                except Exception as e:
+                    logging.exception(e, exc_info=True)
+                    restored = False
+
+                if restored:
+                    break
+
+                self.failed_attempts += 1
+                self.state = self.OFFLINE
+
+        finally:
+
+            self.last_outage = self.clock.monotonic() - started
+            self.total_outage += self.last_outage
+            self.longest_outage = max(self.longest_outage, self.last_outage)
+
+            # Outage is over either way: connection is restored
+            # or recovery is given up and the bot is restarted or stopped
+            self.state = self.ONLINE
+
+        self.last_recovered_at = self.clock.time()
+
+        logging.info(f"Connection restored after {self.last_outage:.1f}s and {attempt} attempts")
+
+    def metrics(self) -> Dict[str, float]:
+
+        return {
+            'state': self.state,
+            'outages': self.outages,
+            'failed_attempts': self.failed_attempts,
+            'total_outage': round(self.total_outage, 1),
+            'longest_outage': round(self.longest_outage, 1),
+            'last_outage': round(self.last_outage, 1),
+            'last_recovered_at': self.last_recovered_at,
+        }
@@ -0,0 +1,208 @@
+# builtin imports
+import logging
+import math
+import random
+from datetime import datetime
+from typing import Callable, Iterable, List, Optional, Tuple
+
+# Lead event kinds recorded to history
+SEEN = 'seen'
+PURCHASED = 'purchased'
+LOST = 'lost'
+
+Event = Tuple[datetime, str]
+
+
+class PollScheduler(object):
+    """
+    Choose sleep interval between leads page polls
+    from per-hour lead arrival and loss rates.
+
+    Mean time to detect a lead is about half of poll interval,
+    so with a fixed number of polls per day the total detection delay
+    is the lowest when polls per hour are proportional to
+    the square root of hour's weight. Hour's weight is its arrival
+    rate, increased by the share of leads lost to competitors.
+
+    Until history is fitted, legacy random intervals are used.
+
+    Polls removed or added by clamping intervals to min and max interval
+    are redistributed between other hours, so the daily budget is spent.
+
+    Leads often come in bursts, so after a refresh with new cards
+    interval is shortened by burst factor. Every poll is counted against
+    the hour's allowance, so after bursts the rest of the hour is polled
+    more rarely.
+
+    Non-adaptive scheduler is never fitted and doesn't react to new cards,
+    it keeps legacy random intervals.
+    """
+
+    def __init__(self, daily_budget: int, min_interval: float, max_interval: float,
+                 jitter: float = 0.2, burst_factor: float = 0.5, adaptive: bool = True,
+                 clock: Callable[[], datetime] = datetime.now, rng: Optional[random.Random] = None) -> None:
+
+        self.daily_budget = daily_budget
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.jitter = jitter
+        self.burst_factor = burst_factor
+        self.adaptive = adaptive
+
+        self.clock = clock
+        self.random = rng or random.Random()
+
+        self.arrivals: Optional[List[float]] = None
+        self.losses: Optional[List[float]] = None
+        self.intervals: Optional[List[float]] = None
+
+        self.fitted_at: Optional[datetime] = None
+
+        # Polls made since the start of the current hour
+        self.hour_start: Optional[datetime] = None
+        self.hour_polls = 0
+
+    def fit(self, events: Iterable[Event], now: Optional[datetime] = None) -> None:
+        """
+        Learn per-hour arrival and loss rates from history of lead events.
+        """
+
+        now = now or self.clock()
+
+        arrivals = [0.0] * 24
+        losses = [0.0] * 24
+
+        first: Optional[datetime] = None
+
+        for created_on, kind in events:
+
+            first = created_on if first is None else min(first, created_on)
+
+            if kind == SEEN:
+                arrivals[created_on.hour] += 1
+            elif kind == LOST:
+                losses[created_on.hour] += 1
+
+        self.fitted_at = now
+
+        if first is None or not sum(arrivals):
+            logging.info("No leads history yet. Poll intervals are random.")
+            self.arrivals = self.losses = self.intervals = None
+            return
+
+        days = max(1.0, (now - first).total_seconds() / 86400)
+
+        self.arrivals = [count / days for count in arrivals]
+        self.losses = [count / days for count in losses]
+
+        self.intervals = self._allocate()
+
+        logging.info(f"Poll intervals by hour: {[round(interval) for interval in self.intervals]}")
+
+    def _allocate(self) -> List[float]:
+
+        # Hours without any leads in history still get some polls
+        prior = 0.1 * sum(self.arrivals) / 24 + 1e-6
+
+        weights = []
+
+        for arrivals, losses in zip(self.arrivals, self.losses):
+
+            loss_share = losses / arrivals if arrivals else 0.0
+
+            weights.append(math.sqrt((arrivals + prior) * (1 + min(loss_share, 1.0))))
+
+        min_polls = 3600 / self.max_interval
+        max_polls = 3600 / self.min_interval
+
+        # Hours clamped to min or max polls are fixed,
+        # the rest of the budget is shared again by other hours
+        polls = [0.0] * 24
+        free = set(range(24))
+        budget = float(self.daily_budget)
+
+        while free:
+
+            total = sum(weights[hour] for hour in free)
+
+            for hour in free:
+                polls[hour] = budget * weights[hour] / total
+
+            clamped = {hour for hour in free if not min_polls <= polls[hour] <= max_polls}
+
+            if not clamped:
+                break
+
+            for hour in clamped:
+                polls[hour] = min(max_polls, max(min_polls, polls[hour]))
+                budget -= polls[hour]
+
+            free -= clamped
+
+        return [3600 / hour_polls for hour_polls in polls]
+
+    def needs_fit(self, now: Optional[datetime] = None, period: float = 3600) -> bool:
+
+        if not self.adaptive:
+            return False
+
+        now = now or self.clock()
+
+        return self.fitted_at is None or (now - self.fitted_at).total_seconds() > period
+
+    def interval(self, now: Optional[datetime] = None, delta: int = 0) -> float:
+        """
+        Seconds to sleep before the next poll.
+
+        Parameters
+        ----------
+        now : Optional[datetime]
+            Current time
+        delta : int
+            Number of new cards found at the last refresh
+
+        """
+
+        now = now or self.clock()
+
+        if self.intervals is None:
+
+            # Legacy behaviour: poll more often in the day time
+            if 6 < now.hour < 20:
+                interval = self.random.randint(25, 60)
+            else:
+                interval = self.random.randint(41, 80)
+
+        else:
+            interval = self.intervals[now.hour] * self.random.uniform(1 - self.jitter, 1 + self.jitter)
+
+        if delta and self.adaptive:
+            interval = max(self.min_interval, interval * self.burst_factor)
+
+        if self.intervals is not None:
+            interval = self._keep_allowance(now, interval)
+
+        return interval
+
+    def _keep_allowance(self, now: datetime, interval: float) -> float:
+        """
+        Count the poll against the hour's allowance and lengthen
+        the interval so the rest of allowance lasts until the end of hour.
+        """
+
+        hour_start = now.replace(minute=0, second=0, microsecond=0)
+
+        if hour_start != self.hour_start:
+            self.hour_start = hour_start
+            self.hour_polls = 0
+
+        self.hour_polls += 1
+
+        polls_left = 3600 / self.intervals[now.hour] - self.hour_polls
+        seconds_left = 3600 - (now - hour_start).total_seconds()
+
+        # Allowance is spent, wait for the next hour
+        if polls_left < 1:
+            return min(self.max_interval, max(interval, seconds_left))
+
+        return min(self.max_interval, max(interval, seconds_left / polls_left))
@@ -0,0 +1,73 @@
+# builtin imports
+import logging
+import time
+from typing import Dict, Optional
+
+# local imports
+from typehints import Cookies
+
+
+class SessionTracker(object):
+    """
+    Remember when login check passed last time
+    and which cookies the session had then.
+
+    Session is trusted without any page load while trust period
+    isn't over and none of those cookies is gone or about to expire.
+    """
+
+    # Cookie expiring sooner than that is considered gone
+    EXPIRY_MARGIN = 60
+
+    def __init__(self, trust_period: float) -> None:
+
+        self.trust_period = trust_period
+
+        self.last_ok: Optional[float] = None
+        self.cookies: Dict[str, Optional[float]] = {}
+
+    def mark_valid(self, cookies: Cookies) -> None:
+
+        self.last_ok = time.time()
+        self.cookies = {cookie['name']: cookie.get('expiry') for cookie in cookies}
+
+    def invalidate(self) -> None:
+
+        self.last_ok = None
+        self.cookies = {}
+
+    def cookies_valid(self, cookies: Cookies) -> bool:
+        """
+        Check that every cookie session had on last check
+        is still present and not expiring.
+        """
+
+        deadline = time.time() + self.EXPIRY_MARGIN
+
+        current = {cookie['name']: cookie.get('expiry') for cookie in cookies}
+
+        for name in self.cookies:
+
+            if name not in current:
+                return False
+
+            expiry = current[name]
+
+            if expiry is not None and expiry < deadline:
+                return False
+
+        return True
+
+    def is_trusted(self, cookies: Cookies) -> bool:
+
+        if self.last_ok is None:
+            return False
+
+        if time.time() - self.last_ok > self.trust_period:
+            return False
+
+        if not self.cookies_valid(cookies):
+            logging.info("Session cookies changed. Login check is required.")
+            return False
+
+        return True
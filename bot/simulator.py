@@ -0,0 +1,366 @@
+"""
+Offline simulator replaying lead arrival history against polling policies.
+
+Real BotWorker loop is run with a virtual clock, fake CianBot
+and fake DatabaseBridge, so days of history replay in seconds
+without a browser and without spending money.
+
+Usage:
+
+    python -m bot.simulator --history leads.csv
+    python -m bot.simulator --days 14
+
+History csv columns: lead_id, arrived_at, taken_at.
+taken_at is the time lead was purchased by a competitor, may be empty.
+"""
+
+# builtin imports
+import argparse
+import csv
+import logging
+import random
+import statistics
+from datetime import datetime, time as dt_time, timedelta
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Generator, Iterable, List, NamedTuple, Optional, Tuple
+
+# local imports
+from .clock import SystemClock
+from .leads import LeadCard
+from .scheduler import LOST, PURCHASED, SEEN, PollScheduler
+from .waits import WaitStats
+from .worker import BotWorker, StopBotException
+
+from settings import LEAD_PRICE, LEADS_PAGE, POLL_BURST_FACTOR, POLL_DAILY_BUDGET, POLL_MAX_INTERVAL, POLL_MIN_INTERVAL
+
+
+class RecordedLead(NamedTuple):
+
+    lead_id: int
+    arrived_at: datetime
+    taken_at: Optional[datetime] = None
+
+
+class VirtualClock(SystemClock):
+    """
+    Clock advanced by sleep() calls only.
+    Stops the worker with StopBotException at the end of history.
+    """
+
+    def __init__(self, start: datetime, end: datetime) -> None:
+        self.current = start
+        self.end = end
+
+    def now(self) -> datetime:
+        return self.current
+
+    def time(self) -> float:
+        return self.current.timestamp()
+
+    def monotonic(self) -> float:
+        return self.current.timestamp()
+
+    def sleep(self, seconds: float) -> None:
+
+        self.current += timedelta(seconds=seconds)
+
+        if self.current >= self.end:
+            raise StopBotException()
+
+
+class SimulatedBot(object):
+    """
+    CianBot stand-in showing recorded leads which arrived
+    and weren't taken by competitors at the moment of poll.
+    """
+
+    current_url = ''
+
+    def __init__(self, leads: List[RecordedLead], clock: VirtualClock) -> None:
+
+        self.leads = sorted(leads, key=lambda lead: lead.arrived_at)
+        self.clock = clock
+
+        self.wait_stats = WaitStats()
+        self.reconnector = SimpleNamespace(metrics=lambda: {})
+
+        self.purchased: Dict[int, datetime] = {}
+        self.lead_prices: Dict[str, int] = {}
+        self.events: List[Tuple[str, str]] = []
+
+        self.polls = 0
+
+        self.page_cards: set = set()
+        self.card_delta = 0
+
+    def iter_leads(self, approve: Optional[Callable[[LeadCard], bool]] = None) -> Generator[str, bool, None]:
+
+        self.polls += 1
+
+        now = self.clock.now()
+
+        available = [
+            lead for lead in self.leads
+            if lead.arrived_at <= now
+            and (lead.taken_at is None or lead.taken_at > now)
+            and lead.lead_id not in self.purchased
+        ]
+
+        page_cards = {lead.lead_id for lead in available}
+
+        self.card_delta = len(page_cards - self.page_cards)
+        self.page_cards = page_cards
+
+        if not available:
+            yield 'no-new-leads'
+            return
+
+        for lead in available:
+
+            card = LeadCard(index=0, created='', lead_id=lead.lead_id, price=str(LEAD_PRICE))
+
+            if approve is not None and not approve(card):
+                continue
+
+            self.purchased[lead.lead_id] = now
+            self.events.append((PURCHASED, card.fingerprint))
+
+            yield LEADS_PAGE + f'/{lead.lead_id}/'
+
+    def pop_events(self) -> List[Tuple[str, str]]:
+        events, self.events = self.events, []
+        return events
+
+    def wait_for_push(self, timeout: float) -> None:
+        # Replayed history has no page to observe
+        return None
+
+    def set_driver(self, driver) -> None:
+        pass
+
+    def set_filters(self) -> None:
+        pass
+
+    def save_cookies(self) -> None:
+        pass
+
+    def quit(self) -> None:
+        pass
+
+
+class SimulatedBridge(object):
+    """
+    DatabaseBridge stand-in keeping settings in memory.
+    History before the current virtual moment is available to scheduler.
+    """
+
+    worker = None
+
+    def __init__(self, leads: List[RecordedLead], clock: VirtualClock, day_money_limit: int) -> None:
+
+        self.clock = clock
+        self.history = sorted(
+            [(lead.arrived_at, SEEN) for lead in leads]
+            + [(lead.taken_at, LOST) for lead in leads if lead.taken_at is not None]
+        )
+
+        self.settings = SimpleNamespace(
+            day_money_limit=day_money_limit,
+            money_left=day_money_limit,
+            next_update_date=clock.now().date() + timedelta(days=1),
+        )
+
+        self.spent = 0
+
+    def get_settings(self) -> SimpleNamespace:
+        return self.settings
+
+    def get_filter_rules(self) -> None:
+        return None
+
+    def update_settings(self, settings: SimpleNamespace) -> SimpleNamespace:
+
+        if settings.next_update_date <= self.clock.now().date():
+            settings.money_left = settings.day_money_limit
+            settings.next_update_date = self.clock.now().date() + timedelta(days=1)
+
+        settings.money_left = max(settings.money_left, 0)
+
+        return settings
+
+    def save_lead(self, lead_url: str) -> bool:
+        self.spent += LEAD_PRICE
+        return True
+
+    def save_events(self, events: Iterable[Tuple[str, str]]) -> None:
+        pass
+
+    def get_events(self, days: int) -> List[Tuple[datetime, str]]:
+
+        now = self.clock.now()
+        since = now - timedelta(days=days)
+
+        return [(created_on, kind) for created_on, kind in self.history if since <= created_on < now]
+
+
+# Policy name -> PollScheduler options
+Policies = Dict[str, Dict[str, Any]]
+
+
+def default_policies() -> Policies:
+    return {
+        # Never fitted and doesn't react to new cards,
+        # keeps random day and night intervals
+        'legacy': {'adaptive': False},
+        'adaptive': {'burst_factor': POLL_BURST_FACTOR},
+    }
+
+
+def simulate(leads: List[RecordedLead], policy: Dict[str, Any], start: datetime, end: datetime,
+             day_money_limit: int = 3000, seed: int = 0) -> Dict[str, float]:
+    """
+    Run BotWorker loop over recorded leads between start and end.
+    Worker is restarted next morning when it stops for lack of money,
+    like an operator would do. Random poll intervals are seeded,
+    so the same history gives the same result.
+    """
+
+    clock = VirtualClock(start, end)
+    bot = SimulatedBot(leads, clock)
+    bridge = SimulatedBridge(leads, clock, day_money_limit)
+
+    worker = BotWorker(bridge, clock=clock)
+
+    worker.scheduler = PollScheduler(POLL_DAILY_BUDGET, POLL_MIN_INTERVAL, POLL_MAX_INTERVAL,
+                                     clock=clock.now, rng=random.Random(seed), **policy)
+    worker.standby = SimpleNamespace(start=lambda: None, take=lambda: None, discard=lambda: None, ready=False)
+    worker.create_bot = lambda: bot
+    worker.create_driver = lambda: None
+    worker.setup_bot = lambda: None
+    worker.message = lambda message: logging.debug(message)
+
+    while clock.now() < end:
+
+        worker.signal_run.value = 1
+        worker.signal_quit.value = 0
+
+        try:
+            worker._run_bot()
+        except StopBotException:
+            # Either history is over or worker is stopped for lack of money
+            pass
+
+        if clock.now() >= end:
+            break
+
+        # Stopped for lack of money, run again next morning
+        next_morning = datetime.combine(clock.now().date() + timedelta(days=1), dt_time(6))
+
+        try:
+            clock.sleep((next_morning - clock.now()).total_seconds())
+        except StopBotException:
+            break
+
+    replayed = [lead for lead in leads if start <= lead.arrived_at < end]
+
+    latencies = [
+        (bot.purchased[lead.lead_id] - lead.arrived_at).total_seconds()
+        for lead in replayed if lead.lead_id in bot.purchased
+    ]
+
+    missed = len(replayed) - len(latencies)
+
+    days = max(1, (end.date() - start.date()).days)
+
+    return {
+        'leads': len(replayed),
+        'purchased': len(latencies),
+        'missed_rate': round(missed / len(replayed), 3) if replayed else 0.0,
+        'mean_latency': round(statistics.mean(latencies), 1) if latencies else None,
+        'median_latency': round(statistics.median(latencies), 1) if latencies else None,
+        'polls': bot.polls,
+        'budget_used': round(bridge.spent / (day_money_limit * days), 3),
+    }
+
+
+def compare(leads: List[RecordedLead], policies: Optional[Policies] = None,
+            start: Optional[datetime] = None, end: Optional[datetime] = None,
+            day_money_limit: int = 3000, seed: int = 0) -> Dict[str, Dict[str, float]]:
+    """
+    Simulate every policy over the same history.
+    """
+
+    policies = policies or default_policies()
+
+    start = start or min(lead.arrived_at for lead in leads)
+    end = end or max(lead.taken_at or lead.arrived_at for lead in leads) + timedelta(hours=1)
+
+    return {
+        name: simulate(leads, policy, start, end, day_money_limit, seed)
+        for name, policy in policies.items()
+    }
+
+
+def load_csv(path: str) -> List[RecordedLead]:
+
+    leads = []
+
+    with open(path, 'r', newline='') as f:
+        for row in csv.DictReader(f):
+            leads.append(RecordedLead(
+                lead_id=int(row['lead_id']),
+                arrived_at=datetime.fromisoformat(row['arrived_at']),
+                taken_at=datetime.fromisoformat(row['taken_at']) if row.get('taken_at') else None,
+            ))
+
+    return leads
+
+
+def leads_from_events(events: Iterable[Tuple[datetime, str, str]]) -> List[RecordedLead]:
+    """
+    Build recorded leads from lead_events history:
+    first seen event is arrival, lost event is competitor purchase.
+    """
+
+    arrivals: Dict[str, datetime] = {}
+    taken: Dict[str, datetime] = {}
+
+    for created_on, kind, fingerprint in sorted(events):
+
+        if kind == SEEN:
+            arrivals.setdefault(fingerprint, created_on)
+        elif kind == LOST:
+            taken.setdefault(fingerprint, created_on)
+
+    return [
+        RecordedLead(lead_id=lead_id, arrived_at=arrived_at, taken_at=taken.get(fingerprint))
+        for lead_id, (fingerprint, arrived_at) in enumerate(sorted(arrivals.items(), key=lambda item: item[1]))
+    ]
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description="Replay lead arrival history against polling policies.")
+
+    parser.add_argument('--history', dest='history', default=None, type=str,
+                        help='CSV file with lead_id, arrived_at, taken_at columns.')
+    parser.add_argument('--days', dest='days', default=14, type=int,
+                        help='Days of lead_events history from database if no CSV given.')
+    parser.add_argument('--limit', dest='limit', default=3000, type=int,
+                        help='Day money limit.')
+
+    cmd_args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.ERROR)
+
+    if cmd_args.history:
+        recorded = load_csv(cmd_args.history)
+    else:
+        from .bridge import DatabaseBridge
+        recorded = leads_from_events(DatabaseBridge().get_event_history(cmd_args.days))
+
+    if not recorded:
+        print("No leads in history")
+    else:
+        for policy, result in compare(recorded, day_money_limit=cmd_args.limit).items():
+            print(f"{policy}: {result}")
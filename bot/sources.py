@@ -0,0 +1,223 @@
+# builtin imports
+import json
+import logging
+import urllib.request
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional
+
+# third-party imports
+from selenium.common import exceptions
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.expected_conditions import presence_of_all_elements_located as elems_located
+
+# local imports
+from .leads import LEAD_CARDS_SCRIPT, LeadCard, parse_cards
+from .waits import any_of, network_idle
+
+from settings import LEADS_API_MODE, LEADS_API_URL, LEADS_PAGE, WAIT_TIMEOUTS
+
+
+# Call leads endpoint from inside the logged-in page,
+# so browser attaches session cookies itself
+API_FETCH_SCRIPT = """
+const [url, done] = [arguments[0], arguments[arguments.length - 1]];
+fetch(url, {credentials: 'include', headers: {'Accept': 'application/json'}})
+    .then(response => response.text().then(body => done({status: response.status, body: body})))
+    .catch(error => done({status: 0, body: String(error)}));
+"""
+
+
+class LeadSource(ABC):
+    """
+    Base class for sources of fresh lead cards.
+    fetch() returns an empty list if there are no leads.
+    """
+
+    name: str = None
+
+    def __init__(self, bot: Any) -> None:
+        self.bot = bot
+
+    @abstractmethod
+    def fetch(self) -> List[LeadCard]:
+        pass
+
+
+class DomLeadSource(LeadSource):
+    """
+    Refresh leads page and snapshot rendered lead cards.
+    Refresh is skipped if the page has just re-rendered the list itself.
+    """
+
+    name = 'dom'
+
+    def fetch(self) -> List[LeadCard]:
+
+        # List is already re-rendered by the page itself
+        if self.bot.pushed:
+            self.bot.pushed = False
+        else:
+            self.bot.refresh_leads()
+
+        # Wait until cards are rendered or page stops loading without them
+        try:
+            self.bot.wait_until('leads', any_of(
+                elems_located((By.XPATH, '//*[@data-name="LeadsCardsWrapper"]')),
+                network_idle(),
+            ))
+        except exceptions.TimeoutException:
+            return []
+
+        return parse_cards(self.bot.driver.execute_script(LEAD_CARDS_SCRIPT))
+
+
+class ApiLeadSource(LeadSource):
+    """
+    Request leads JSON endpoint directly, bypassing leads page DOM.
+
+    In 'browser' mode request is made with fetch() from the logged-in page.
+    In 'cookies' mode request is made from python with browser's session cookies.
+    """
+
+    name = 'api'
+
+    def __init__(self, bot: Any, url: Optional[str] = None, mode: Optional[str] = None) -> None:
+
+        super().__init__(bot)
+
+        self.url = url or LEADS_API_URL
+        self.mode = mode or LEADS_API_MODE
+
+        if not self.url:
+            raise ValueError("LEADS_API_URL is not set")
+
+        self.user_agent: Optional[str] = None
+
+    def fetch(self) -> List[LeadCard]:
+
+        if self.mode == 'browser':
+            body = self._fetch_in_browser()
+        else:
+            body = self._fetch_with_cookies()
+
+        return parse_api_leads(json.loads(body))
+
+    def _fetch_in_browser(self) -> str:
+
+        self.bot.driver.set_script_timeout(WAIT_TIMEOUTS['leads'])
+
+        response = self.bot.driver.execute_async_script(API_FETCH_SCRIPT, self.url)
+
+        if response['status'] != 200:
+            raise IOError(f"Leads API responded with {response['status']}: {response['body'][:200]}")
+
+        return response['body']
+
+    def _fetch_with_cookies(self) -> str:
+
+        if self.user_agent is None:
+            self.user_agent = self.bot.driver.execute_script("return navigator.userAgent")
+
+        cookies = "; ".join(f"{cookie['name']}={cookie['value']}" for cookie in self.bot.driver.get_cookies())
+
+        request = urllib.request.Request(self.url, headers={
+            'Accept': 'application/json',
+            'Cookie': cookies,
+            'Referer': LEADS_PAGE,
+            'User-Agent': self.user_agent,
+        })
+
+        with urllib.request.urlopen(request, timeout=WAIT_TIMEOUTS['leads']) as response:
+            return response.read().decode('utf-8')
+
+
+def _find_items(payload: Any) -> List[Dict[str, Any]]:
+    """
+    Find list of leads in response. It's either response itself
+    or nested under one of the common keys.
+    """
+
+    if isinstance(payload, list):
+        return payload
+
+    if isinstance(payload, dict):
+        for key in ('leads', 'items', 'data', 'result'):
+            if key in payload:
+                return _find_items(payload[key])
+
+    return []
+
+
+def _as_text(value: Any) -> str:
+
+    if value is None:
+        return ''
+
+    if isinstance(value, dict):
+        for key in ('fullAddress', 'address', 'name', 'title', 'text', 'value'):
+            if key in value:
+                return _as_text(value[key])
+        return ''
+
+    if isinstance(value, list):
+        return ' '.join(filter(None, (_as_text(item) for item in value)))
+
+    return str(value)
+
+
+def _first(item: Dict[str, Any], *keys: str) -> Any:
+
+    for key in keys:
+        if item.get(key) is not None:
+            return item[key]
+
+    return None
+
+
+def parse_api_leads(payload: Any) -> List[LeadCard]:
+    """
+    Convert leads endpoint response into LeadCard list.
+    Leads without id are skipped.
+    """
+
+    cards = []
+
+    for index, item in enumerate(_find_items(payload)):
+
+        if not isinstance(item, dict):
+            continue
+
+        lead_id = _first(item, 'id', 'leadId')
+
+        try:
+            lead_id = int(lead_id)
+        except (TypeError, ValueError):
+            # Lead can't be opened without id
+            continue
+
+        cards.append(LeadCard(
+            index=index,
+            created=_as_text(_first(item, 'createdAt', 'created', 'publishedAt', 'date')),
+            lead_id=lead_id,
+            location=_as_text(_first(item, 'location', 'address', 'geo')),
+            type=_as_text(_first(item, 'title', 'type', 'demandType')),
+            price=_as_text(_first(item, 'price', 'cost')),
+        ))
+
+    return cards
+
+
+def make_lead_source(bot: Any, name: str) -> LeadSource:
+    """
+    Create lead source by name from settings.
+    Fallback to DOM source if API source can't be created.
+    """
+
+    if name == ApiLeadSource.name:
+
+        try:
+            return ApiLeadSource(bot)
+        except ValueError as e:
+            logging.error(f"Can't use leads API: {e}. Fallback to leads page.")
+
+    return DomLeadSource(bot)
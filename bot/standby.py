@@ -0,0 +1,113 @@
+# builtin imports
+import logging
+import threading
+from typing import Any, Callable, Optional
+
+# third-party imports
+from selenium.common import exceptions
+
+# local imports
+from .cianbot import SeleniumOperator
+
+
+class StandbyBrowser(object):
+    """
+    Browser launched and authenticated with saved cookies in background,
+    kept next to the active one to replace it at once after a failure.
+    """
+
+    def __init__(self, factory: Callable[[], Any]) -> None:
+
+        self.factory = factory
+
+        self._driver: Any = None
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def building(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def ready(self) -> bool:
+        return self._driver is not None
+
+    def start(self) -> None:
+        """
+        Build new standby browser in background thread
+        if there is no one ready or building.
+        """
+
+        if self.ready or self.building:
+            return
+
+        self._thread = threading.Thread(target=self._build, daemon=True)
+        self._thread.start()
+
+    def _build(self) -> None:
+
+        driver = None
+
+        try:
+
+            logging.info("Building standby browser ...")
+
+            driver = self.factory()
+
+            operator = SeleniumOperator()
+            operator.set_driver(driver)
+            operator.load_cookies()
+
+            # load_cookies leaves login page opened
+            if driver.find_elements_by_id('login-btn'):
+                raise RuntimeError("Standby browser isn't logged in with saved cookies")
+
+            with self._lock:
+                self._driver = driver
+
+            logging.info("Standby browser is ready")
+
+        except Exception as e:
+
+            logging.exception(e, exc_info=True)
+
+            self._quit(driver)
+
+    def take(self) -> Optional[Any]:
+        """
+        Return standby driver if it's ready and alive. Doesn't block.
+        """
+
+        with self._lock:
+            driver, self._driver = self._driver, None
+
+        if driver is None:
+            return None
+
+        try:
+            # Health check
+            driver.window_handles
+        except exceptions.WebDriverException as e:
+            logging.warning(f"Standby browser is dead: {e}")
+            self._quit(driver)
+            return None
+
+        return driver
+
+    def discard(self) -> None:
+
+        if self._thread is not None:
+            self._thread.join()
+
+        self._quit(self.take())
+
+    @staticmethod
+    def _quit(driver: Any) -> None:
+
+        if driver is None:
+            return
+
+        try:
+            driver.quit()
+        except Exception as e:
+            logging.exception(e, exc_info=True)
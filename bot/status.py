@@ -0,0 +1,214 @@
+# builtin imports
+import ctypes
+import struct
+from datetime import datetime
+from multiprocessing import Lock, RawArray
+from typing import Any, Dict, List, Tuple, Union
+
+
+# Fixed layout of the status record:
+# sequence number, integer flags and counters, info and error texts.
+# Texts are stored with their length in bytes.
+INT_FIELDS: Tuple[str, ...] = ('run', 'quit', 'launch', 'phone_code', 'money_left', 'money_limit')
+TEXT_FIELDS: Tuple[str, ...] = ('info', 'error')
+
+TEXT_SIZE = 1024
+
+LAYOUT = struct.Struct('<Q' + 'i' * len(INT_FIELDS) + f'H{TEXT_SIZE}s' * len(TEXT_FIELDS))
+
+SEQ = struct.Struct('<Q')
+
+# Offsets of every field in the record
+OFFSETS: Dict[str, int] = {}
+
+_offset = SEQ.size
+
+for _name in INT_FIELDS:
+    OFFSETS[_name] = _offset
+    _offset += 4
+
+for _name in TEXT_FIELDS:
+    OFFSETS[_name] = _offset
+    _offset += 2 + TEXT_SIZE
+
+INT = struct.Struct('<i')
+TEXT = struct.Struct(f'<H{TEXT_SIZE}s')
+
+
+class StatusBlock(object):
+    """
+    Bot status record in shared memory guarded by a seqlock.
+
+    Writers (worker and web process) take a lock and make sequence number
+    odd while the record is being changed. Readers don't lock:
+    they copy the whole record at once and retry if sequence number
+    was odd or changed during the copy.
+    """
+
+    def __init__(self, **values: Union[int, str]) -> None:
+
+        self._buffer = RawArray('B', LAYOUT.size)
+        self._lock = Lock()
+
+        for name, value in values.items():
+            self.write(name, value)
+
+    def _sequence(self) -> int:
+        return SEQ.unpack_from(self._buffer, 0)[0]
+
+    @property
+    def version(self) -> int:
+        """
+        Sequence number of the record, changes on every write.
+        """
+
+        return self._sequence()
+
+    def write(self, name: str, value: Union[int, str]) -> None:
+
+        offset = OFFSETS[name]
+
+        if name in TEXT_FIELDS:
+            data = str(value).encode('utf-8')[:TEXT_SIZE]
+
+        with self._lock:
+
+            sequence = self._sequence()
+
+            SEQ.pack_into(self._buffer, 0, sequence + 1)
+
+            if name in TEXT_FIELDS:
+                TEXT.pack_into(self._buffer, offset, len(data), data)
+            else:
+                INT.pack_into(self._buffer, offset, int(value))
+
+            SEQ.pack_into(self._buffer, 0, sequence + 2)
+
+    def read(self) -> Dict[str, Any]:
+        """
+        Consistent snapshot of every field.
+        """
+
+        while True:
+
+            before = self._sequence()
+
+            if before % 2:
+                continue
+
+            data = bytes(self._buffer)
+
+            if self._sequence() == before:
+                break
+
+        fields = LAYOUT.unpack(data)
+
+        status = dict(zip(INT_FIELDS, fields[1:1 + len(INT_FIELDS)]))
+
+        texts = fields[1 + len(INT_FIELDS):]
+
+        for position, name in enumerate(TEXT_FIELDS):
+            length, text = texts[2 * position], texts[2 * position + 1]
+            # Text may be cut in the middle of a character
+            status[name] = text[:length].decode('utf-8', 'ignore')
+
+        return status
+
+    def field(self, name: str) -> 'StatusField':
+        return StatusField(self, name)
+
+
+class StatusField(object):
+    """
+    Single field of status block with multiprocessing.Value-like interface.
+    """
+
+    def __init__(self, block: StatusBlock, name: str) -> None:
+        self.block = block
+        self.name = name
+
+    @property
+    def value(self) -> Union[int, str]:
+        return self.block.read()[self.name]
+
+    @value.setter
+    def value(self, value: Union[int, str]) -> None:
+        self.block.write(self.name, value)
+
+
+# Purchase event slot: sequence number, purchase timestamp, lead url
+SLOT = struct.Struct('<Qd H256s')
+
+
+class PurchaseRing(object):
+    """
+    Bounded ring of purchase events in shared memory.
+
+    Every event gets a monotonically increasing sequence number.
+    Clients poll events after the last sequence number they've seen,
+    so any number of clients get every event which is still in the ring.
+
+    Slot sequence number is written last, readers check it
+    before and after copying the slot.
+    """
+
+    def __init__(self, capacity: int = 256) -> None:
+
+        self.capacity = capacity
+
+        self._buffer = RawArray('B', SEQ.size + SLOT.size * capacity)
+        self._lock = Lock()
+
+    @property
+    def last(self) -> int:
+        """
+        Sequence number of the last event, 0 if there are none.
+        """
+
+        return SEQ.unpack_from(self._buffer, 0)[0]
+
+    def _offset(self, sequence: int) -> int:
+        return SEQ.size + SLOT.size * (sequence % self.capacity)
+
+    def append(self, url: str, created: datetime) -> int:
+
+        data = url.encode('utf-8')[:256]
+
+        with self._lock:
+
+            sequence = self.last + 1
+            offset = self._offset(sequence)
+
+            # Invalidate slot while it's written
+            SEQ.pack_into(self._buffer, offset, 0)
+            SLOT.pack_into(self._buffer, offset, 0, created.timestamp(), len(data), data)
+            SEQ.pack_into(self._buffer, offset, sequence)
+
+            SEQ.pack_into(self._buffer, 0, sequence)
+
+        return sequence
+
+    def since(self, sequence: int) -> Tuple[List[Tuple[str, datetime]], int]:
+        """
+        Events after given sequence number and the last sequence number.
+        Events overwritten since then are skipped.
+        """
+
+        last = self.last
+
+        events = []
+
+        for current in range(max(sequence, last - self.capacity) + 1, last + 1):
+
+            offset = self._offset(current)
+
+            data = ctypes.string_at(ctypes.addressof(self._buffer) + offset, SLOT.size)
+
+            slot_sequence, created, length, url = SLOT.unpack(data)
+
+            if slot_sequence != current or SEQ.unpack_from(self._buffer, offset)[0] != current:
+                continue
+
+            events.append((url[:length].decode('utf-8', 'ignore'), datetime.fromtimestamp(created)))
+
+        return events, last
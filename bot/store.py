@@ -0,0 +1,196 @@
+# builtin imports
+import logging
+import os
+import threading
+import time
+from typing import Dict, Iterator, Optional, TextIO
+
+
+class IgnoredLeadsStore(object):
+    """
+    Set of ignored leads' keys with expiration time.
+
+    Every added key is appended to a journal file right away,
+    so nothing is lost if the process crashes.
+    Journal line format: "<expires_at>\\t<key>\\n".
+    When journal has much more lines than live entries,
+    it's rewritten with live entries only in a background thread.
+    """
+
+    # Don't compact small journals at all
+    COMPACT_MIN_LINES = 1000
+
+    def __init__(self, path: str, ttl: float) -> None:
+
+        self.path = path
+        self.ttl = ttl
+
+        self._entries: Dict[str, float] = {}
+        self._journal: Optional[TextIO] = None
+        self._journal_lines = 0
+        self._lock = threading.RLock()
+        self._compaction: Optional[threading.Thread] = None
+
+    def __contains__(self, key: str) -> bool:
+
+        expires_at = self._entries.get(key)
+
+        if expires_at is None:
+            return False
+
+        if expires_at < time.time():
+
+            with self._lock:
+                self._entries.pop(key, None)
+
+            return False
+
+        return True
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._entries))
+
+    @staticmethod
+    def _clean_key(key: str) -> str:
+        return str(key).replace('\t', ' ').replace('\n', ' ')
+
+    def load(self) -> None:
+        """
+        Read journal line by line skipping expired and malformed entries.
+        """
+
+        logging.info("Loading ignored leads ...")
+
+        now = time.time()
+
+        with self._lock:
+
+            self._entries.clear()
+            self._journal_lines = 0
+
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+
+                    for line in f:
+
+                        self._journal_lines += 1
+
+                        expires_at, _, key = line.rstrip('\n').partition('\t')
+
+                        try:
+                            expires_at = float(expires_at)
+                        except ValueError:
+                            continue
+
+                        if key and expires_at > now:
+                            self._entries[key] = expires_at
+
+            except FileNotFoundError:
+                pass
+
+            # Store may be reloaded while journal is open
+            self._close_journal()
+            self._open_journal()
+
+        logging.info(f"Loaded {len(self._entries)} ignored leads")
+
+    def add(self, key: str) -> None:
+
+        key = self._clean_key(key)
+        expires_at = time.time() + self.ttl
+
+        with self._lock:
+
+            self._entries[key] = expires_at
+
+            if self._journal is None:
+                self._open_journal()
+
+            self._journal.write(f"{expires_at:.0f}\t{key}\n")
+            self._journal.flush()
+
+            self._journal_lines += 1
+
+        self._maybe_compact()
+
+    def evict_expired(self) -> int:
+        """
+        Drop expired entries from memory. Returns number of evicted entries.
+        """
+
+        now = time.time()
+
+        with self._lock:
+
+            expired = [key for key, expires_at in self._entries.items() if expires_at < now]
+
+            for key in expired:
+                del self._entries[key]
+
+        return len(expired)
+
+    def compact(self) -> None:
+        """
+        Rewrite journal with live entries only.
+        """
+
+        with self._lock:
+
+            self.evict_expired()
+
+            tmp_path = self.path + '.tmp'
+
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for key, expires_at in self._entries.items():
+                    f.write(f"{expires_at:.0f}\t{key}\n")
+
+            self._close_journal()
+
+            os.replace(tmp_path, self.path)
+
+            self._journal_lines = len(self._entries)
+
+            self._open_journal()
+
+        logging.info(f"Ignored leads journal compacted to {len(self._entries)} entries")
+
+    def _maybe_compact(self) -> None:
+
+        if self._journal_lines < max(self.COMPACT_MIN_LINES, 2 * len(self._entries)):
+            return
+
+        if self._compaction is not None and self._compaction.is_alive():
+            return
+
+        self._compaction = threading.Thread(target=self._compact_safe, daemon=True)
+        self._compaction.start()
+
+    def _compact_safe(self) -> None:
+
+        try:
+            self.compact()
+        except Exception as e:
+            logging.exception(e, exc_info=True)
+
+    def _open_journal(self) -> None:
+        self._journal = open(self.path, 'a', encoding='utf-8')
+
+    def _close_journal(self) -> None:
+
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+    def close(self) -> None:
+        """
+        Wait for running compaction and close journal.
+        """
+
+        if self._compaction is not None:
+            self._compaction.join()
+
+        with self._lock:
+            self._close_journal()
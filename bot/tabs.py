@@ -0,0 +1,164 @@
+# builtin imports
+import logging
+from typing import Any, Dict, List, Optional
+
+# third-party imports
+from selenium.common import exceptions
+
+
+class TabPool(object):
+    """
+    Pool of pre-opened browser tabs reused to show lead pages.
+
+    The first tab is the leads list and stays pinned as main tab.
+    Current window handle is tracked locally, so switching to a tab
+    that is already active costs no WebDriver call.
+    Tabs are recycled after max_uses and when health check fails.
+    """
+
+    BLANK_PAGE = 'about:blank'
+
+    def __init__(self, driver: Any, size: int, max_uses: int) -> None:
+
+        self.driver = driver
+        self.size = size
+        self.max_uses = max_uses
+
+        self.main_handle: str = driver.window_handles[0]
+        self.current_handle: Optional[str] = None
+
+        self.uses: Dict[str, int] = {}
+        self.free: List[str] = []
+
+        # Window opened outside the pool, i.e. by OpenLead button
+        self.adopted: Optional[str] = None
+
+    def switch_to(self, handle: str) -> None:
+
+        if handle != self.current_handle:
+            self.driver.switch_to.window(handle)
+            self.current_handle = handle
+
+    def switch_main(self) -> None:
+        self.switch_to(self.main_handle)
+
+    def _open_tab(self) -> str:
+
+        before = set(self.driver.window_handles)
+
+        self.driver.execute_script("window.open(arguments[0]);", self.BLANK_PAGE)
+
+        handle = (set(self.driver.window_handles) - before).pop()
+
+        self.uses[handle] = 0
+
+        return handle
+
+    def _close_tab(self, handle: str) -> None:
+
+        self.uses.pop(handle, None)
+
+        try:
+            self.switch_to(handle)
+            self.driver.close()
+        except exceptions.WebDriverException as e:
+            logging.warning(f"Can't close tab: {e}")
+        finally:
+            self.current_handle = None
+
+    def fill(self) -> None:
+        """
+        Open tabs until pool has `size` tabs.
+        """
+
+        while len(self.uses) < self.size:
+            self.free.append(self._open_tab())
+
+    def is_healthy(self, handle: str) -> bool:
+
+        if handle not in self.driver.window_handles:
+            return False
+
+        try:
+            self.switch_to(handle)
+            self.driver.execute_script("return document.readyState")
+            return True
+
+        except exceptions.WebDriverException:
+            self.current_handle = None
+            return False
+
+    def acquire(self) -> str:
+        """
+        Switch to a healthy free tab and return its handle.
+        """
+
+        if not self.free:
+            self.fill()
+
+        if not self.free:
+            # Every tab is busy
+            self.free.append(self._open_tab())
+
+        handle = self.free.pop(0)
+
+        if self.uses.get(handle, 0) >= self.max_uses or not self.is_healthy(handle):
+
+            logging.info("Recycle lead tab")
+
+            if handle in self.driver.window_handles:
+                self._close_tab(handle)
+            else:
+                self.uses.pop(handle, None)
+
+            handle = self._open_tab()
+
+        self.uses[handle] += 1
+
+        self.switch_to(handle)
+
+        return handle
+
+    def prefetch(self, url: str) -> str:
+        """
+        Start loading url in a free tab without waiting for it.
+        Page loads in background while other tabs are used.
+        """
+
+        handle = self.acquire()
+
+        self.driver.execute_script("window.location.replace(arguments[0]);", url)
+
+        return handle
+
+    def adopt(self) -> str:
+        """
+        Switch to a window opened outside the pool.
+        It will be closed on release.
+        """
+
+        known = set(self.uses) | {self.main_handle}
+
+        handle = next(handle for handle in reversed(self.driver.window_handles) if handle not in known)
+
+        self.adopted = handle
+        self.switch_to(handle)
+
+        return handle
+
+    def release(self, handle: Optional[str] = None) -> None:
+        """
+        Give tab back to the pool and switch to main tab.
+        Current tab is released if handle isn't given.
+        """
+
+        handle = handle or self.current_handle
+
+        if handle is not None and handle == self.adopted:
+            self._close_tab(handle)
+            self.adopted = None
+
+        elif handle in self.uses and handle not in self.free:
+            self.free.append(handle)
+
+        self.switch_main()
@@ -0,0 +1,209 @@
+# builtin imports
+import logging
+import time
+from typing import Any, Callable, Dict, Optional
+
+# third-party imports
+from selenium.common import exceptions
+
+
+# Fixed sleeps the purchase path used before condition-based waits.
+# Kept to report how much wall-clock every stage saves now.
+LEGACY_SLEEPS: Dict[str, float] = {
+    'refresh': 1.0,
+    'leads': 2.0,
+    'region': 0.3,
+    'purchase': 1.0,
+}
+
+
+def normalize_text(text: str) -> str:
+    """
+    Lower-case text and fold 'ё' into 'е' so site rendering
+    differences don't break text comparisons.
+    """
+
+    return text.lower().replace('ё', 'е')
+
+
+# Count requests made by the page with fetch() and XMLHttpRequest
+# which haven't finished yet. Installed once per page load.
+TRACK_REQUESTS_SCRIPT = """
+if (!window.__cianBotRequests) {
+
+    const requests = window.__cianBotRequests = {pending: 0, changes: 0};
+
+    const start = () => {
+        requests.pending += 1;
+        requests.changes += 1;
+    };
+
+    const finish = () => {
+        requests.pending = Math.max(0, requests.pending - 1);
+        requests.changes += 1;
+    };
+
+    const send = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.send = function () {
+        start();
+        this.addEventListener('loadend', finish);
+        return send.apply(this, arguments);
+    };
+
+    const fetch = window.fetch;
+    window.fetch = function () {
+        start();
+        const result = fetch.apply(this, arguments);
+        result.then(finish, finish);
+        return result;
+    };
+}
+"""
+
+
+def track_requests(driver: Any) -> None:
+    """
+    Start counting pending requests of the current page.
+    Call before an action, so requests it starts are counted.
+    """
+
+    driver.execute_script(TRACK_REQUESTS_SCRIPT)
+
+
+class network_idle(object):
+    """
+    Expected condition: page has no pending fetch/XHR requests,
+    none was started or finished for `idle_time` seconds
+    and the document finished loading.
+
+    Requests are counted since track_requests() call.
+    State is kept between calls, so create a new instance for every wait.
+    """
+
+    SCRIPT = TRACK_REQUESTS_SCRIPT + """
+return [document.readyState, window.__cianBotRequests.pending, window.__cianBotRequests.changes];
+"""
+
+    def __init__(self, idle_time: float = 0.5) -> None:
+
+        self.idle_time = idle_time
+        self.changes = -1
+        self.changed_at = time.monotonic()
+
+    def __call__(self, driver: Any) -> bool:
+
+        ready_state, pending, changes = driver.execute_script(self.SCRIPT)
+
+        now = time.monotonic()
+
+        if changes != self.changes:
+            self.changes = changes
+            self.changed_at = now
+            return False
+
+        return ready_state == 'complete' and not pending and now - self.changed_at >= self.idle_time
+
+
+class any_of(object):
+    """
+    Expected condition: first truthy result of given conditions.
+    """
+
+    def __init__(self, *conditions: Callable[[Any], Any]) -> None:
+        self.conditions = conditions
+
+    def __call__(self, driver: Any) -> Any:
+
+        for condition in self.conditions:
+
+            try:
+                result = condition(driver)
+            except exceptions.WebDriverException:
+                continue
+
+            if result:
+                return result
+
+        return False
+
+
+class elements_count_above(object):
+    """
+    Expected condition: more than `count` elements match xpath.
+    """
+
+    def __init__(self, xpath: str, count: int) -> None:
+        self.xpath = xpath
+        self.count = count
+
+    def __call__(self, driver: Any) -> bool:
+        return len(driver.find_elements_by_xpath(self.xpath)) > self.count
+
+
+class text_in_element(object):
+    """
+    Expected condition: element located by xpath is displayed
+    and contains given text. Returns the element.
+    """
+
+    def __init__(self, xpath: str, text: str) -> None:
+        self.xpath = xpath
+        self.text = normalize_text(text)
+
+    def __call__(self, driver: Any) -> Any:
+
+        try:
+            elem = driver.find_element_by_xpath(self.xpath)
+
+            if elem.is_displayed() and self.text in normalize_text(elem.text):
+                return elem
+
+        except (exceptions.NoSuchElementException, exceptions.StaleElementReferenceException):
+            pass
+
+        return False
+
+
+class WaitStats(object):
+    """
+    Collect per-stage wait timings and compare them
+    with fixed sleeps used before.
+    """
+
+    def __init__(self) -> None:
+        self.stages: Dict[str, Dict[str, float]] = {}
+
+    def record(self, stage: str, elapsed: float, timed_out: bool = False) -> None:
+
+        stats = self.stages.setdefault(stage, {'calls': 0, 'elapsed': 0.0, 'saved': 0.0, 'timeouts': 0})
+
+        stats['calls'] += 1
+        stats['elapsed'] += elapsed
+        if stage in LEGACY_SLEEPS:
+            stats['saved'] += LEGACY_SLEEPS[stage] - elapsed
+
+        stats['timeouts'] += int(timed_out)
+
+    def saved(self, stage: Optional[str] = None) -> float:
+        """
+        Total seconds saved against fixed sleeps by stage or by all stages.
+        """
+
+        if stage is not None:
+            return self.stages.get(stage, {}).get('saved', 0.0)
+
+        return sum(stats['saved'] for stats in self.stages.values())
+
+    def report(self) -> str:
+
+        return "; ".join(
+            f"{stage}: {stats['calls']:.0f} waits, {stats['elapsed']:.2f}s spent, "
+            f"{stats['saved']:+.2f}s saved, {stats['timeouts']:.0f} timeouts"
+            for stage, stats in self.stages.items()
+        ) or "no waits recorded"
+
+    def log(self) -> None:
+        logging.info(f"Wait stats: {self.report()}")
+
+    def reset(self) -> None:
+        self.stages.clear()
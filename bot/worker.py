@@ -4,10 +4,7 @@ from typing import Optional
 from datetime import datetime
 import logging
 import platform  # chromedriver path
-import random
-import time
-from ctypes import c_char_p  # share string between processes
-from multiprocessing import Array, Manager, Process, Value
+from multiprocessing import Process
 
 # third-party imports
 import selenium
@@ -16,7 +13,15 @@ from fake_useragent import UserAgent
 # local imports
 from .cianbot import CianBot
 from .bridge import DatabaseBridge
-from settings import DRIVER_UNIX_PATH, DRIVER_WIN_PATH
+from .clock import SystemClock
+from .driver import apply_profile, configure_options, log_driver_stats
+from .pacing import BudgetPacer, parse_price
+from .scheduler import PollScheduler
+from .standby import StandbyBrowser
+from .status import PurchaseRing, StatusBlock, StatusField
+from settings import (DRIVER_PROFILE, DRIVER_UNIX_PATH, DRIVER_WIN_PATH, WARM_STANDBY, LEAD_PRICE, PACING_SLACK,
+                      PURCHASES_RING_SIZE,
+                      POLL_BURST_FACTOR, POLL_DAILY_BUDGET, POLL_HISTORY_DAYS, POLL_MAX_INTERVAL, POLL_MIN_INTERVAL)
 
 
 class StopBotException(Exception):
@@ -31,6 +36,9 @@ class BotWorker(object):
     Low-level operator interacting with CianBot in multiprocessing.
     It has a bunch of shared variables that Manager will return to a client.
 
+    After the bot is logged in, a warm standby browser is built in background.
+    When bot is restarted after an error, it switches to standby at once.
+
     Function calls sequence:
 
         start():        create new Process
@@ -39,16 +47,22 @@ class BotWorker(object):
                     setup_bot():    load cookies, login on website, wait for phone code
                              ..:    infinitely iterate through new leads
 
+    Signals, money, info and error are fields of a single status record
+    in shared memory, so a client reads the whole status in one copy.
+
     Attributes
     ----------
-    signal_run: Value
-    signal_quit: Value
-    signal_launch: Value
-    signal_phone_code: Value
-    money_limit: Value
-    money_left: Value
-    purchased_leads: Array
-        Array -> List[Tuple[str, datetime]] List of tuples with lead link and purchase timestamp
+    status: StatusBlock
+    signal_run: StatusField
+    signal_quit: StatusField
+    signal_launch: StatusField
+    signal_phone_code: StatusField
+    money_limit: StatusField
+    money_left: StatusField
+    signal_info: StatusField
+    exc_on_exit: StatusField
+    purchased_leads: PurchaseRing
+        Last purchases with lead link and purchase timestamp
     """
 
     bridge: DatabaseBridge = None
@@ -59,35 +73,62 @@ class BotWorker(object):
 
     driver: selenium.webdriver.chrome.webdriver.WebDriver = None
 
-    signal_run: Value = None
-    signal_quit: Value = None
-    signal_launch: Value = None
-    signal_phone_code: Value = None
-    money_limit: Value = None
-    money_left: Value = None
-    purchased_leads: Array = None
+    status: StatusBlock = None
+
+    signal_run: StatusField = None
+    signal_quit: StatusField = None
+    signal_launch: StatusField = None
+    signal_phone_code: StatusField = None
+    money_limit: StatusField = None
+    money_left: StatusField = None
+    signal_info: StatusField = None
+    purchased_leads: PurchaseRing = None
+
+    exc_on_exit: StatusField = None
+
+    standby: StandbyBrowser = None
+
+    scheduler: PollScheduler = None
+
+    pacer: BudgetPacer = None
+
+    clock: SystemClock = None
 
-    exc_on_exit: Exception = None
+    # Whether current driver was taken from standby
+    warm_driver: bool = False
 
-    def __init__(self, bridge: DatabaseBridge):
+    # updated_on of filter rules the bot is running with
+    rules_updated_on: Optional[datetime] = None
 
-        manager = Manager()
+    def __init__(self, bridge: DatabaseBridge, clock: Optional[SystemClock] = None):
 
-        self.signal_run = Value("i", 0)
-        self.signal_quit = Value("i", 1)
-        self.signal_launch = Value("i", 0)
-        self.signal_phone_code = Value("i", 0)
-        self.money_left = Value("i", -1)
-        self.money_limit = Value("i", 3000)
+        self.clock = clock or SystemClock()
 
-        self.purchased_leads = manager.list()
-        self.signal_info = manager.Value(c_char_p, "Бот готов к работе.")
-        self.exc_on_exit = manager.Value(c_char_p, "")
+        self.status = StatusBlock(run=0, quit=1, launch=0, phone_code=0, money_left=-1, money_limit=3000,
+                                  info="Бот готов к работе.", error="")
+
+        self.signal_run = self.status.field('run')
+        self.signal_quit = self.status.field('quit')
+        self.signal_launch = self.status.field('launch')
+        self.signal_phone_code = self.status.field('phone_code')
+        self.money_left = self.status.field('money_left')
+        self.money_limit = self.status.field('money_limit')
+        self.signal_info = self.status.field('info')
+        self.exc_on_exit = self.status.field('error')
+
+        self.purchased_leads = PurchaseRing(PURCHASES_RING_SIZE)
 
         self.bridge = bridge
 
         self.bridge.worker = self
 
+        self.standby = StandbyBrowser(self.launch_driver)
+
+        self.scheduler = PollScheduler(POLL_DAILY_BUDGET, POLL_MIN_INTERVAL, POLL_MAX_INTERVAL,
+                                       burst_factor=POLL_BURST_FACTOR, clock=self.clock.now)
+
+        self.pacer = BudgetPacer(PACING_SLACK, clock=self.clock.now)
+
     def message(self, message: str) -> None:
         """
         Store message to shared variable and log it on screen.
@@ -96,6 +137,28 @@ class BotWorker(object):
         logging.info(message)
         self.signal_info.value = message
 
+    def wait_next_poll(self, interval: float, polled_at: float) -> None:
+        """
+        Sleep until the next poll or wake up as soon as the page shows new leads.
+        Pushed polls are still made no more often than POLL_MIN_INTERVAL,
+        so a busy page doesn't spend the daily poll budget.
+        """
+
+        if self.bot.wait_for_push(interval) is None:
+            self.clock.sleep(interval)
+            return
+
+        left = POLL_MIN_INTERVAL - (self.clock.monotonic() - polled_at)
+
+        if left > 0:
+            self.clock.sleep(left)
+
+    def stop_requested(self) -> bool:
+        """
+        Whether signal to stop or quit received.
+        """
+        return bool(self.signal_quit.value or not self.signal_run.value)
+
     def check_status(self) -> Optional[StopBotException]:
         """
         Raise StopBotException if signal to stop received.
@@ -116,7 +179,7 @@ class BotWorker(object):
         self.message("Требуется ввести каптчу. Бот остановлен.")
 
         while 'captcha' in self.bot.current_url:
-            time.sleep(60)
+            self.clock.sleep(60)
 
 
     def start(self):
@@ -155,10 +218,16 @@ class BotWorker(object):
         finally:
 
             if self.exc_on_exit.value != "":
-                # let send exception to a client
-                time.sleep(10)
+
+                if not self.standby.ready:
+                    # let send exception to a client
+                    self.clock.sleep(10)
+
                 self.run_bot()
 
+            else:
+                self.standby.discard()
+
             self.signal_run.value = 0
             self.signal_quit.value = 1
 
@@ -175,14 +244,28 @@ class BotWorker(object):
 
             self.create_driver()
 
-            self.bot = CianBot()
+            self.bot = self.create_bot()
 
             self.bot.set_driver(self.driver)
 
+            # Long waits inside the bot are interrupted by stop signal
+            # and take time from worker's clock
+            self.bot.stop_requested = self.stop_requested
+            self.bot.reconnector.clock = self.clock
+
+            # Filter rules are applied to a new bot
+            self.rules_updated_on = None
+
             self.signal_launch.value = 0
 
             self.setup_bot()
 
+            # Standby browser is authenticated with saved cookies
+            self.bot.save_cookies()
+
+            if WARM_STANDBY:
+                self.standby.start()
+
             while True:
 
                 if self.signal_quit.value:
@@ -200,13 +283,15 @@ class BotWorker(object):
                 # It did update
                 self.bridge.update_settings(settings)
 
-                if settings.money_left < 300:
+                if settings.money_left < LEAD_PRICE:
 
                     self.not_enough_money()
                     continue
 
                 self.check_status()
 
+                self.reload_rules()
+
                 self.message("Успешно авторизован, устанавливаю фильтры ... ")
 
                 self.bot.set_filters()
@@ -215,6 +300,8 @@ class BotWorker(object):
 
                 self.message(" Изучаю новые заявки ... ")
 
+                polled_at = self.clock.monotonic()
+
                 try:
 
                     self.iter_leads(settings)
@@ -225,19 +312,27 @@ class BotWorker(object):
 
                     self.message(str(e))
 
-                hour = datetime.now().hour
+                self.bot.wait_stats.log()
+
+                logging.info(f"Connection metrics: {self.bot.reconnector.metrics()}")
+
+                log_driver_stats(self.driver, DRIVER_PROFILE)
+
+                self.bridge.save_events(self.bot.pop_events())
 
-                if hour > 6 and hour < 20:
+                if self.scheduler.needs_fit():
 
-                    self.message("Sleep less in the morning")
+                    events = self.bridge.get_events(POLL_HISTORY_DAYS)
 
-                    time_sleep = random.randint(25, 60)
-                else:
-                    time_sleep = random.randint(41, 80)
+                    self.scheduler.fit(events)
+                    self.pacer.fit(events)
+
+                # New cards on the page make the next poll sooner
+                time_sleep = self.scheduler.interval(delta=self.bot.card_delta)
 
                 self.check_status()
 
-                time.sleep(time_sleep)
+                self.wait_next_poll(time_sleep, polled_at)
 
         except KeyboardInterrupt:
             pass
@@ -265,8 +360,18 @@ class BotWorker(object):
                 self.message("Работа завершена корректно.")
 
     def iter_leads(self, settings) -> None:
+        """
+        Save leads purchased by bot and track money left.
+        Bot asks for approval before every purchase,
+        so leads are never bought over the budget
+        and day limit is spent along the day by pacer.
+        """
+
+        def approve(card) -> bool:
+            price = parse_price(card.price) or LEAD_PRICE
+            return self.pacer.approve(price, settings.money_left, settings.day_money_limit)
 
-        for purchased_lead_url in self.bot.iter_leads():
+        for purchased_lead_url in self.bot.iter_leads(approve=approve):
 
             print(purchased_lead_url)
 
@@ -282,16 +387,29 @@ class BotWorker(object):
 
                 self.message(f"Приобретена новая заявка: {purchased_lead_url}")
 
-                settings.money_left -= 300
+                settings.money_left -= self.bot.lead_prices.pop(purchased_lead_url, LEAD_PRICE)
 
             settings = self.bridge.update_settings(settings)
 
-            if settings.money_left < 300:
+            if settings.money_left < LEAD_PRICE:
 
                 self.not_enough_money()
                 break
 
-            time.sleep(random.randint(1, 3))
+    def reload_rules(self) -> None:
+        """
+        Rebuild bot's filter if rules were changed on settings page.
+        Browser isn't restarted.
+        """
+
+        rules = self.bridge.get_filter_rules()
+
+        if rules is None or rules.updated_on == self.rules_updated_on:
+            return
+
+        self.bot.set_rules(rules.config())
+
+        self.rules_updated_on = rules.updated_on
 
     def setup_bot(self) -> None:
         """
@@ -304,9 +422,11 @@ class BotWorker(object):
 
         self.check_status()
 
-        self.message("Загружаю cookie-файлы")
+        if not self.warm_driver:
+
+            self.message("Загружаю cookie-файлы")
 
-        self.bot.load_cookies()
+            self.bot.load_cookies()
 
         self.check_status()
 
@@ -345,7 +465,14 @@ class BotWorker(object):
         self.message("Недостаточно средств для покупки новых заявок, бот остановлен")
         self.signal_run.value = 0
 
+    def create_bot(self) -> CianBot:
+        return CianBot()
+
     def create_driver(self) -> None:
+        """
+        Take warm standby browser if it's ready
+        or launch a new one.
+        """
 
         if self.driver is not None:
             # Delete existing driver
@@ -355,19 +482,40 @@ class BotWorker(object):
 
             self.driver = None
 
+        self.driver = self.standby.take()
+
+        if self.driver is not None:
+
+            self.warm_driver = True
+            self.message("Переключаюсь на резервное окно браузера ...")
+
+            return
+
+        self.warm_driver = False
+        self.driver = self.launch_driver()
+
+    def launch_driver(self) -> selenium.webdriver.chrome.webdriver.WebDriver:
+        """
+        Cold launch of chromedriver and browser.
+        """
+
         executable_path = DRIVER_UNIX_PATH if platform.system() == 'Linux' else DRIVER_WIN_PATH
 
         chrome_options = selenium.webdriver.ChromeOptions()
 
         userAgent = UserAgent().random
 
-        chrome_options.add_argument("start-maximized")
         chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
         chrome_options.add_experimental_option('useAutomationExtension', False)
         chrome_options.add_argument(f'user-agent={userAgent}')
-        # chrome_options.headless = True
 
-        self.driver = selenium.webdriver.Chrome(executable_path=executable_path, options=chrome_options)
+        configure_options(chrome_options, DRIVER_PROFILE)
+
+        driver = selenium.webdriver.Chrome(executable_path=executable_path, options=chrome_options)
+
+        apply_profile(driver, DRIVER_PROFILE)
+
+        return driver
 
     def wait_for_code(self) -> str:
 
@@ -397,4 +545,4 @@ class BotWorker(object):
             except Exception as e:
                 logging.exception(e, exc_info=True)
 
-            time.sleep(10)
+            self.clock.sleep(10)
@@ -1,7 +1,7 @@
 import os
 from dotenv import load_dotenv
 from pathlib import Path
-from typing import List
+from typing import Dict, List
 
 # Directories
 
@@ -29,18 +29,128 @@ DRIVER_WIN_PATH = SRC_DIR / 'chromedriver.exe'
 
 os.environ['LOG_FILE_PATH'] = str(BASE_DIR / 'flask_logs.log')
 os.environ['COOKIES_PATH'] = str(SRC_DIR / 'cookies.pkl')
-os.environ['IGN_LEADS_PATH'] = str(SRC_DIR / 'ignored_leads.json')
+os.environ['IGN_LEADS_PATH'] = str(SRC_DIR / 'ignored_leads.journal')
 os.environ['PHONE_CODE_PATH'] = str(SRC_DIR / 'phone_code.txt')
+os.environ['FILTERS_STATE_PATH'] = str(SRC_DIR / 'filters_state.json')
+os.environ['GAZETTEER_INDEX_PATH'] = str(SRC_DIR / 'gazetteer.pkl')
+
+# Bundled places file: name, parent, aliases, lat, lon
+GAZETTEER_PATH = BASE_DIR / 'bot' / 'data' / 'places.tsv'
 
 # URL Settings
 
 LOGIN_PAGE = "http://cian.ru/"
 LEADS_PAGE = "https://my.cian.ru/leads"
 
+# Where bot gets fresh leads from:
+# 'dom' - rendered leads page, 'api' - leads JSON endpoint the leads page uses.
+# Endpoint is requested with fetch() from the logged-in page ('browser' mode)
+# or with session cookies from python ('cookies' mode).
+LEAD_SOURCE = os.getenv('LEAD_SOURCE', 'dom')
+LEADS_API_URL = os.getenv('LEADS_API_URL', '')
+LEADS_API_MODE = os.getenv('LEADS_API_MODE', 'browser')
+
+# Wait for new lead cards rendered by leads page itself
+# instead of sleeping between polls. Responses of LEADS_API_URL
+# requested by the page are reported too if it's set.
+PUSH_CHANNEL = os.getenv('PUSH_CHANNEL', '1') == '1'
+
 REGIONS: List[str] = ['Королев', 'Мытищи', 'Пушкино', 'Ивантеевка',
                       'Щёлково', 'Фрязино', 'Дмитров', 'Лобня',
                       'Долгопрудный', 'Химки', 'Москва']
 
+# Default lead filter rules. Rules are edited on settings page
+# and stored in database, these values are used for the first run.
+# Lead type must contain every word of one of the object types.
+
+OBJECT_TYPES: List[str] = ['продать квартиру']
+
+# Wait deadlines in seconds for every stage of the purchase path
+
+WAIT_TIMEOUTS: Dict[str, float] = {
+    'refresh': float(os.getenv('WAIT_REFRESH_TIMEOUT', 10)),
+    'leads': float(os.getenv('WAIT_LEADS_TIMEOUT', 5)),
+    'region': float(os.getenv('WAIT_REGION_TIMEOUT', 5)),
+    'lead': float(os.getenv('WAIT_LEAD_TIMEOUT', 10)),
+    'purchase': float(os.getenv('WAIT_PURCHASE_TIMEOUT', 5)),
+}
+
+# Seconds an ignored lead is kept. Leads older than that
+# can no longer appear on the leads board.
+
+IGNORED_LEADS_TTL = float(os.getenv('IGNORED_LEADS_TTL', 3 * 24 * 60 * 60))
+
+# Seconds to trust a passed login check without checking again
+
+SESSION_TRUST_PERIOD = float(os.getenv('SESSION_TRUST_PERIOD', 10 * 60))
+
+# Pre-opened tabs reused to show lead pages
+# and number of leads shown in a tab before it's reopened
+
+DETAIL_TABS = int(os.getenv('DETAIL_TABS', 2))
+DETAIL_TAB_MAX_USES = int(os.getenv('DETAIL_TAB_MAX_USES', 50))
+
+# Browser profile of the worker:
+# 'full' - maximized browser window loading everything,
+# 'lean' - headless browser blocking heavy and third-party resources.
+
+DRIVER_PROFILE = os.getenv('DRIVER_PROFILE', 'full')
+
+BLOCKED_URL_PATTERNS: List[str] = [
+    '*.png', '*.jpg', '*.jpeg', '*.gif', '*.webp', '*.svg', '*.ico',
+    '*.woff', '*.woff2', '*.ttf', '*.otf',
+    '*google-analytics.com*', '*googletagmanager.com*', '*doubleclick.net*',
+    '*mc.yandex.ru*', '*an.yandex.ru*', '*api-maps.yandex.ru*', '*tiles.api-maps.yandex.ru*',
+    '*top-fwz1.mail.ru*', '*facebook.net*', '*vk.com/rtrg*', '*criteo*', '*hotjar*',
+]
+
+# Keep second browser authenticated with saved cookies
+# to replace the active one at once after a failure
+
+WARM_STANDBY = os.getenv('WARM_STANDBY', '1') == '1'
+
+# Reconnect backoff in seconds after connection loss.
+# Give up and report an error if outage is longer than max outage.
+
+RECONNECT_BASE_DELAY = float(os.getenv('RECONNECT_BASE_DELAY', 1))
+RECONNECT_MAX_DELAY = float(os.getenv('RECONNECT_MAX_DELAY', 120))
+RECONNECT_MAX_OUTAGE = float(os.getenv('RECONNECT_MAX_OUTAGE', 15 * 60))
+
+# Leads page polls per day spread over hours by lead arrival rates
+# learned from the last days of history. Interval limits are in seconds.
+
+POLL_DAILY_BUDGET = int(os.getenv('POLL_DAILY_BUDGET', 1800))
+POLL_HISTORY_DAYS = int(os.getenv('POLL_HISTORY_DAYS', 28))
+POLL_MIN_INTERVAL = float(os.getenv('POLL_MIN_INTERVAL', 15))
+POLL_MAX_INTERVAL = float(os.getenv('POLL_MAX_INTERVAL', 300))
+# Interval multiplier after a refresh with new cards
+POLL_BURST_FACTOR = float(os.getenv('POLL_BURST_FACTOR', 0.5))
+
+# Default lead price, used when price can't be read from the lead page.
+# Day money limit is spent along the day by lead arrival rates,
+# pacing slack is a share of the limit allowed to be spent ahead.
+
+LEAD_PRICE = int(os.getenv('LEAD_PRICE', 300))
+PACING_SLACK = float(os.getenv('PACING_SLACK', 0.1))
+
+# Leads priced higher are rejected, 0 means no limit
+
+MAX_LEAD_PRICE = int(os.getenv('MAX_LEAD_PRICE', 0))
+
+# Last purchases kept for clients polling bot status
+
+PURCHASES_RING_SIZE = int(os.getenv('PURCHASES_RING_SIZE', 256))
+
+# Purchased leads shown on settings page at once and loaded on scroll
+
+LEADS_PAGE_SIZE = int(os.getenv('LEADS_PAGE_SIZE', 50))
+
+# Status stream of settings page: seconds between checks of bot status
+# and seconds between heartbeats keeping idle connection open
+
+STREAM_CHECK_INTERVAL = float(os.getenv('STREAM_CHECK_INTERVAL', 0.25))
+STREAM_HEARTBEAT = float(os.getenv('STREAM_HEARTBEAT', 15))
+
 # Bot Settings
 
 CIAN_ID = os.getenv("CIAN_ID")
@@ -57,5 +167,6 @@ def second_bot_set():
 
     os.environ['LOG_FILE_PATH'] = str(BASE_DIR / 'flask_logs_2.log')
     os.environ['COOKIES_PATH'] = str(SRC_DIR / 'cookies_2.pkl')
-    os.environ['IGN_LEADS_PATH'] = str(SRC_DIR / 'ignored_leads_2.json')
+    os.environ['IGN_LEADS_PATH'] = str(SRC_DIR / 'ignored_leads_2.journal')
     os.environ['PHONE_CODE_PATH'] = str(SRC_DIR / 'phone_code_2.txt')
+    os.environ['FILTERS_STATE_PATH'] = str(SRC_DIR / 'filters_state_2.json')
@@ -0,0 +1,122 @@
+"""
+Benchmark of bot status reads behind /api?action=check_status.
+
+Compares Manager proxies and multiprocessing.Value reads
+with a single read of shared memory status block,
+then measures /api latency through Flask test client.
+
+Usage:
+
+    python -m tests.bench_api [iterations]
+"""
+
+# builtin imports
+import os
+import statistics
+import sys
+import time
+from ctypes import c_char_p
+from multiprocessing import Manager, Value
+from typing import Callable, Dict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# local imports
+from bot.status import StatusBlock
+
+
+def measure(func: Callable[[], object], iterations: int) -> Dict[str, float]:
+
+    timings = []
+
+    for _ in range(iterations):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1e6)
+
+    timings.sort()
+
+    return {
+        'median_us': round(statistics.median(timings), 1),
+        'p95_us': round(timings[int(len(timings) * 0.95)], 1),
+    }
+
+
+def legacy_reader() -> Callable[[], dict]:
+    """
+    Reads check_status made before status block:
+    every Value read takes a lock, every proxy read is a round trip
+    to Manager server process.
+    """
+
+    manager = Manager()
+
+    signal_run = Value("i", 1)
+    signal_quit = Value("i", 0)
+    signal_launch = Value("i", 0)
+    signal_phone_code = Value("i", 0)
+    money_left = Value("i", 3000)
+
+    signal_info = manager.Value(c_char_p, "Новых заявок пока нет")
+    exc_on_exit = manager.Value(c_char_p, "")
+
+    def read() -> dict:
+
+        if signal_launch.value:
+            status = 'launching'
+        elif signal_run.value:
+            status = 'running'
+        elif exc_on_exit.value != "":
+            status = 'quited_with_error'
+        elif signal_quit.value:
+            status = 'quited'
+        else:
+            status = 'stopped'
+
+        return {
+            'status': status,
+            'info': signal_info.value,
+            'money_left': money_left.value if money_left.value != -1 else None,
+            'error': exc_on_exit.value,
+            'phone_code': signal_phone_code.value,
+        }
+
+    read.manager = manager
+
+    return read
+
+
+def main(iterations: int = 2000) -> None:
+
+    block = StatusBlock(run=1, quit=0, launch=0, phone_code=0, money_left=3000, money_limit=3000,
+                        info="Новых заявок пока нет", error="")
+
+    legacy = legacy_reader()
+
+    print(f"status read, Manager proxies: {measure(legacy, iterations)}")
+    print(f"status read, status block:    {measure(block.read, iterations)}")
+
+    from web.app import bot, create_app
+
+    app = create_app()
+    app.config['LOGIN_DISABLED'] = True
+
+    client = app.test_client()
+
+    def api() -> None:
+        client.get('/api?action=check_status')
+
+    print(f"/api check_status, status block:    {measure(api, iterations)}")
+
+    get_state = bot.get_state
+
+    # The same endpoint with status read as before
+    bot.get_state = legacy
+
+    print(f"/api check_status, Manager proxies: {measure(api, iterations)}")
+
+    bot.get_state = get_state
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -1,3 +1,4 @@
+from collections import Counter
 from unittest import mock
 from unittest.mock import MagicMock
 
@@ -5,8 +6,10 @@ import pytest
 
 from bot.bridge import DatabaseBridge
 from bot.cianbot import CianBot
+from bot.leads import LeadCard
+from bot.store import IgnoredLeadsStore
 from bot.worker import BotWorker
-from typehints import Mocker
+from typehints import LocalPath, Mocker
 
 mock.patch('sqlalchemy.create_engine')
 
@@ -20,7 +23,7 @@ def get_worker_and_bridge(mocker: Mocker):
     def _get_worker_and_bridge():
 
         mocker.patch('bot.worker.selenium', autospec=True)
-        mocker.patch('bot.worker.time.sleep', autospec=True)
+        mocker.patch('bot.worker.SystemClock.sleep')
 
         bridge = DatabaseBridge()
 
@@ -74,7 +77,7 @@ def test_reload_when_exception_raised(mocker: Mocker):
     """
 
     mocker.patch('bot.worker.BotWorker._run_bot', run_bot)
-    mocker.patch('bot.worker.time.sleep', autospec=True)
+    mocker.patch('bot.worker.SystemClock.sleep')
 
     worker = BotWorker(DatabaseBridge())
 
@@ -145,3 +148,302 @@ def test_no_new_leads(get_worker_and_bridge, mocker: Mocker):
     worker.iter_leads(settings)
 
     assert mock_save.call_count == 3
+
+
+def test_only_new_cards_are_examined(get_worker_and_bridge, mocker: Mocker, tmpdir: LocalPath):
+    """
+    Cards seen at the previous refresh aren't examined again,
+    leads deferred by budget are.
+    """
+
+    worker, bridge = get_worker_and_bridge()
+
+    bot = worker.bot
+
+    mocker.patch.object(bot, 'ignore_leads', IgnoredLeadsStore(str(tmpdir / 'ignored.journal'), 3600))
+    mocker.patch.object(bot, 'page_cards', Counter())
+    mocker.patch.object(bot, 'retry_leads', Counter())
+    mocker.patch.object(bot, 'events', [])
+    mocker.patch.object(bot, '_tabs', MagicMock())
+    mocker.patch.object(bot, 'watch_leads')
+
+    first = LeadCard(index=0, created='10:15', location='Москва', type='Хочу продать квартиру')
+    second = first._replace(index=1, created='10:20')
+
+    fetch = mocker.patch.object(bot.lead_source, 'fetch', return_value=[first])
+
+    def open_lead(card, handle=None, approve=None):
+        if approve is not None and not approve(card):
+            bot.deferred_leads.add(card.fingerprint)
+        return None
+
+    open_lead = mocker.patch.object(bot, 'open_lead', side_effect=open_lead)
+
+    list(bot.iter_leads())
+
+    assert open_lead.call_count == 1
+
+    # Nothing new on the page
+    assert list(bot.iter_leads()) == ['no-new-leads']
+    assert bot.card_delta == 0
+    assert open_lead.call_count == 1
+
+    fetch.return_value = [first, second]
+
+    # Lead budget doesn't allow isn't opened
+    list(bot.iter_leads(approve=lambda card: False))
+
+    assert bot.card_delta == 1
+    assert open_lead.call_count == 1
+    assert not bot.tabs.acquire.called
+
+    # Deferred lead is examined again, but it's not a new arrival
+    bot.events.clear()
+
+    list(bot.iter_leads())
+
+    assert open_lead.call_count == 2
+    assert open_lead.call_args[0][0].index == 1
+    assert bot.card_delta == 0
+    assert bot.events == []
+
+
+def test_lookalike_new_card_is_examined(get_worker_and_bridge, mocker: Mocker, tmpdir: LocalPath):
+    """
+    New card sharing fingerprint with a card still on the page
+    is examined and counted as one arrival.
+    """
+
+    worker, bridge = get_worker_and_bridge()
+
+    bot = worker.bot
+
+    mocker.patch.object(bot, 'ignore_leads', IgnoredLeadsStore(str(tmpdir / 'ignored.journal'), 3600))
+    mocker.patch.object(bot, 'page_cards', Counter())
+    mocker.patch.object(bot, 'retry_leads', Counter())
+    mocker.patch.object(bot, 'events', [])
+    mocker.patch.object(bot, '_tabs', MagicMock())
+    mocker.patch.object(bot, 'watch_leads')
+
+    old = LeadCard(index=0, created='5 минут назад')
+    new = LeadCard(index=0, created='только что')
+
+    assert old.fingerprint == new.fingerprint
+
+    fetch = mocker.patch.object(bot.lead_source, 'fetch', return_value=[old])
+    open_lead = mocker.patch.object(bot, 'open_lead', return_value=None)
+
+    list(bot.iter_leads())
+
+    bot.events.clear()
+
+    fetch.return_value = [new, old._replace(index=1)]
+
+    list(bot.iter_leads())
+
+    assert bot.card_delta == 1
+    assert open_lead.call_count == 2
+    assert open_lead.call_args[0][0].created == 'только что'
+    assert bot.events == [('seen', new.fingerprint)]
+
+
+def test_pushed_polls_interval(mocker: Mocker):
+    """
+    Pushed poll waits for the rest of minimal interval,
+    poll without push channel sleeps the whole interval.
+    """
+
+    from datetime import datetime, timedelta
+
+    from bot.simulator import VirtualClock
+    from settings import POLL_MIN_INTERVAL
+
+    start = datetime(2021, 4, 12, 10)
+
+    clock = VirtualClock(start, start + timedelta(days=1))
+
+    worker = BotWorker(DatabaseBridge(), clock=clock)
+    worker.bot = MagicMock()
+
+    # Page pushes new cards right after the poll
+    worker.bot.wait_for_push.return_value = [{'kind': 'cards', 'count': 1}]
+
+    worker.wait_next_poll(60, clock.monotonic())
+
+    assert clock.now() == start + timedelta(seconds=POLL_MIN_INTERVAL)
+
+    # Push came later than minimal interval
+    polled_at = clock.monotonic()
+
+    worker.bot.wait_for_push.side_effect = lambda timeout: clock.sleep(POLL_MIN_INTERVAL + 5) or []
+
+    worker.wait_next_poll(60, polled_at)
+
+    assert clock.now() == start + timedelta(seconds=2 * POLL_MIN_INTERVAL + 5)
+
+    worker.bot.wait_for_push.side_effect = None
+    worker.bot.wait_for_push.return_value = None
+
+    worker.wait_next_poll(60, clock.monotonic())
+
+    assert clock.now() == start + timedelta(seconds=2 * POLL_MIN_INTERVAL + 65)
+
+
+def test_submit_filters_with_reused_cards(mocker: Mocker):
+    """
+    Cards re-rendered in place never become stale,
+    submit wait is finished once network is idle.
+    """
+
+    from selenium.common import exceptions
+
+    bot = CianBot()
+
+    driver = MagicMock()
+    # Error panel isn't shown
+    driver.find_element.side_effect = exceptions.NoSuchElementException()
+    driver.execute_script.return_value = ['complete', 0, 10]
+
+    mocker.patch.object(bot, 'driver', driver)
+    mocker.patch.object(bot, '_tabs', MagicMock())
+    mocker.patch.object(bot, 'wait_stats', None)
+
+    warning = mocker.patch('bot.cianbot.logging.warning')
+
+    bot.submit_filters()
+
+    warning.assert_not_called()
+
+
+def test_rejected_leads_are_examined_with_new_rules(mocker: Mocker, tmpdir: LocalPath):
+    """
+    Leads rejected by rules aren't ignored for TTL,
+    they are examined again once rules change.
+    """
+
+    bot = CianBot()
+
+    mocker.patch.object(bot, 'ignore_leads', IgnoredLeadsStore(str(tmpdir / 'ignored.journal'), 3600))
+    mocker.patch.object(bot, 'rejected_leads', set())
+    mocker.patch.object(bot, 'page_cards', Counter())
+    mocker.patch.object(bot, 'retry_leads', Counter())
+    # Restored after the test, set_rules replaces them
+    mocker.patch.object(bot, 'lead_filter')
+    mocker.patch.object(bot, 'lead_scorer')
+    mocker.patch.object(bot, 'watch_leads')
+
+    card = LeadCard(index=0, created='10:15', location='Тверь', type='Хочу продать квартиру', target='card-1')
+
+    mocker.patch.object(bot.lead_source, 'fetch', return_value=[card])
+
+    bot.set_rules({'regions': ['Москва']})
+
+    assert list(bot.iter_leads()) == []
+    assert card.fingerprint in bot.rejected_leads
+    assert card.fingerprint not in bot.ignore_leads
+
+    bot.set_rules({'regions': ['Москва', 'Тверь']})
+
+    assert not bot.rejected_leads
+
+
+def test_lead_without_id_is_not_ignored(mocker: Mocker, tmpdir: LocalPath):
+    """
+    Card which can't be told from others isn't put to ignored leads,
+    otherwise every card like it is hidden for TTL.
+    """
+
+    bot = CianBot()
+
+    mocker.patch.object(bot, 'ignore_leads', IgnoredLeadsStore(str(tmpdir / 'ignored.journal'), 3600))
+    mocker.patch.object(bot, 'rejected_leads', set())
+
+    card = LeadCard(index=0, created='только что')
+
+    bot.reject_lead(card, 'price')
+    bot.reject_lead(card, 'region')
+
+    assert card.fingerprint not in bot.ignore_leads
+    assert not bot.rejected_leads
+
+    card = card._replace(lead_id=15)
+
+    bot.reject_lead(card, 'price')
+
+    assert card.fingerprint in bot.ignore_leads
+
+
+def test_page_object_types(mocker: Mocker):
+    """
+    Only known flat option is chosen on leads page,
+    any object is shown for other types.
+    """
+
+    from bot.filters import LeadFilter
+
+    bot = CianBot()
+
+    mocker.patch.object(bot, 'lead_filter', LeadFilter(object_types=['продать квартиру']))
+
+    assert bot.page_object_types() == ['flat']
+
+    mocker.patch.object(bot, 'lead_filter', LeadFilter(object_types=['продать комнату', 'продать квартиру']))
+
+    assert bot.page_object_types() == []
+
+
+def test_filtered_view_check_saves_nothing(mocker: Mocker):
+    """
+    Filtered view check isn't reported as time saved against leads sleep.
+    """
+
+    from bot.waits import WaitStats
+    from settings import LEADS_PAGE
+
+    bot = CianBot()
+
+    driver = MagicMock()
+    driver.current_url = LEADS_PAGE
+
+    mocker.patch.object(bot, 'driver', driver)
+    mocker.patch.object(bot, 'wait_stats', WaitStats())
+    mocker.patch.object(bot, 'wait')
+
+    assert bot.is_filtered_view()
+
+    assert bot.wait_stats.stages['filtered_view']['calls'] == 1
+    assert 'leads' not in bot.wait_stats.stages
+    assert bot.wait_stats.saved() == 0
+
+
+def test_prefetched_tab_shows_the_lead(mocker: Mocker):
+    """
+    Prefetched tab still showing another lead isn't taken for loaded.
+    """
+
+    from selenium.common import exceptions
+
+    bot = CianBot()
+
+    mocker.patch.object(bot, 'driver', MagicMock())
+    mocker.patch.object(bot, '_tabs', MagicMock())
+
+    conditions = []
+
+    def wait_until(stage, condition, timeout=None):
+        conditions.append(condition)
+        raise exceptions.TimeoutException()
+
+    mocker.patch.object(bot, 'wait_until', side_effect=wait_until)
+
+    with pytest.raises(exceptions.TimeoutException):
+        bot.open_lead(LeadCard(index=0, created='', lead_id=123), handle='tab')
+
+    driver = MagicMock()
+    driver.execute_script.return_value = 'complete'
+
+    driver.current_url = 'https://my.cian.ru/leads/1234/'
+    assert not conditions[0](driver)
+
+    driver.current_url = 'https://my.cian.ru/leads/123/'
+    assert conditions[0](driver)
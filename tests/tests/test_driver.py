@@ -0,0 +1,47 @@
+from unittest.mock import MagicMock
+
+from selenium import webdriver
+
+from bot.driver import FULL_PROFILE, LEAN_PROFILE, compare_profiles, configure_options
+
+
+def test_lean_profile():
+    """
+    Lean profile is headless and uses eager page load strategy.
+    """
+
+    capabilities = configure_options(webdriver.ChromeOptions(), LEAN_PROFILE).to_capabilities()
+
+    assert '--headless' in capabilities['goog:chromeOptions']['args']
+    assert capabilities['pageLoadStrategy'] == 'eager'
+
+
+def test_full_profile():
+
+    capabilities = configure_options(webdriver.ChromeOptions(), FULL_PROFILE).to_capabilities()
+
+    assert capabilities['goog:chromeOptions']['args'] == ['start-maximized']
+    assert 'pageLoadStrategy' not in capabilities
+
+
+def test_compare_profiles():
+    """
+    Page is loaded in a fresh browser of every profile, browsers are quit.
+    """
+
+    drivers = {}
+
+    def launch(profile):
+        driver = drivers[profile] = MagicMock()
+        driver.execute_script.return_value = {'dom_ready': 900 if profile == FULL_PROFILE else 400}
+        return driver
+
+    results = compare_profiles('https://my.cian.ru/leads', launch)
+
+    assert results[FULL_PROFILE]['dom_ready'] == 900
+    assert results[LEAN_PROFILE]['dom_ready'] == 400
+    assert 'rss' in results[LEAN_PROFILE]
+
+    for driver in drivers.values():
+        driver.get.assert_called_once_with('https://my.cian.ru/leads')
+        driver.quit.assert_called_once()
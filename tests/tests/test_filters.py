@@ -0,0 +1,94 @@
+from datetime import datetime
+
+from bot.filters import ACCEPT, REJECT, UNKNOWN, FilterStateCache, LeadFilter
+from bot.leads import LeadCard
+from typehints import LocalPath
+
+
+def test_check_card():
+    """
+    Card is rejected by any failed check
+    and ambiguous when some fields are missing.
+    """
+
+    lead_filter = LeadFilter(regions=['Щёлково', 'Химки'])
+
+    card = LeadCard(index=0, created='10:15', location='МО, Щелково', type='Хочу продать квартиру', price='300 ₽')
+
+    assert lead_filter.check_card(card) == (ACCEPT, None)
+    assert lead_filter.check_card(card._replace(location='Тверь')) == (REJECT, 'region')
+    assert lead_filter.check_card(card._replace(type='Хочу купить квартиру')) == (REJECT, 'type')
+    assert lead_filter.check_card(card._replace(location='')) == (UNKNOWN, None)
+
+
+def test_check_price():
+    """
+    Card price is checked against price limit only,
+    '100' prefix marks sold leads on lead page header.
+    """
+
+    lead_filter = LeadFilter(max_price=1500)
+
+    assert lead_filter.check_price('1 000 ₽') == ACCEPT
+    assert lead_filter.check_price('2 000 ₽') == REJECT
+    assert lead_filter.check_price('Цена не указана') == UNKNOWN
+    assert LeadFilter(max_price=None).check_price('1 000 000 ₽') == ACCEPT
+
+    assert lead_filter.check_sold('100% заявки уже куплено') == REJECT
+    assert lead_filter.check_sold('Заявка на продажу квартиры') == ACCEPT
+
+
+def test_filter_state_cache(tmpdir: LocalPath):
+    """
+    Cached url is used only with the same filters config.
+    """
+
+    path = str(tmpdir / 'filters.json')
+    url = 'https://my.cian.ru/leads?region=1'
+
+    FilterStateCache(path, {'regions': ['Химки']}).save(url)
+
+    assert FilterStateCache(path, {'regions': ['Химки']}).url == url
+    assert FilterStateCache(path, {'regions': ['Химки', 'Мытищи']}).url is None
+
+    FilterStateCache(path, {'regions': ['Химки']}).invalidate()
+
+    assert FilterStateCache(path, {'regions': ['Химки']}).url is None
+
+
+def test_filter_rules():
+    """
+    Rules are compiled with ё/е folding, exclusions win over inclusions.
+    """
+
+    lead_filter = LeadFilter.from_config({
+        'regions': ['Москва', 'Королёв'],
+        'exclude_regions': ['Новая Москва'],
+        'object_types': ['продать квартиру', 'продать комнату'],
+        'max_age': 600,
+    })
+
+    assert lead_filter.check_region('МО, Королев') == ACCEPT
+    assert lead_filter.check_region('Москва, Арбат') == ACCEPT
+    assert lead_filter.check_region('Новая Москва, Коммунарка') == REJECT
+
+    assert lead_filter.check_type('Хочу продать комнату') == ACCEPT
+    assert lead_filter.check_type('Квартиру хочу продать') == ACCEPT
+    assert lead_filter.check_type('Хочу сдать квартиру') == REJECT
+
+    now = datetime(2021, 4, 15, 10, 30)
+
+    assert lead_filter.check_age('10:25', now) == ACCEPT
+    assert lead_filter.check_age('10:00', now) == REJECT
+    assert lead_filter.check_age('', now) == UNKNOWN
+
+
+def test_site_object_types():
+    """
+    Object type rules are mapped to leads page filter
+    only if every rule has a site object type.
+    """
+
+    assert LeadFilter(object_types=['продать квартиру']).site_object_types == ['flat']
+    assert LeadFilter(object_types=['продать комнату', 'Продать квартиру']).site_object_types == ['flat', 'room']
+    assert LeadFilter(object_types=['продать квартиру', 'продать гараж']).site_object_types == []
@@ -0,0 +1,79 @@
+from bot.filters import ACCEPT, REJECT, LeadFilter
+from bot.gazetteer import Gazetteer
+from settings import GAZETTEER_PATH
+from typehints import LocalPath, Mocker
+
+
+def names(gazetteer: Gazetteer, location: str):
+
+    place = gazetteer.resolve(location)
+
+    return None if place is None else [gazetteer.places[parent].name for parent in gazetteer.lineage(place)]
+
+
+def test_resolve(tmpdir: LocalPath):
+    """
+    Streets named after towns don't match, districts resolve to their city.
+    """
+
+    index_path = str(tmpdir / 'gazetteer.pkl')
+
+    Gazetteer.load(str(GAZETTEER_PATH), index_path)
+
+    # Loaded from stored index
+    gazetteer = Gazetteer.load(str(GAZETTEER_PATH), index_path)
+
+    assert names(gazetteer, 'МО, г. Щёлково') == ['Щелково', 'Московская область']
+    assert names(gazetteer, 'Москва, Дмитровское шоссе, 5') == ['Москва']
+    assert names(gazetteer, 'Москва, ул. Королёва, 5')[0] == 'Москва'
+    assert names(gazetteer, 'Москва, р-н Тверской, ул. Тверская')[-1] == 'Москва'
+    assert names(gazetteer, 'МО, г.о. Дмитровский, Икша')[:2] == ['Икша', 'Дмитров']
+    assert names(gazetteer, 'Тверь, ул. Советская') is None
+
+
+def test_filter_with_gazetteer():
+
+    gazetteer = Gazetteer.build(str(GAZETTEER_PATH))
+
+    lead_filter = LeadFilter(regions=['Королев', 'Москва'], exclude_regions=['Новая Москва'], gazetteer=gazetteer)
+
+    assert lead_filter.check_region('Московская область, Юбилейный') == ACCEPT
+    assert lead_filter.check_region('Москва, пос. Коммунарка') == REJECT
+    assert lead_filter.check_region('Московская область, Химки, ул. Королева') == REJECT
+
+    # Pushkino is about 10 km from Korolev
+    lead_filter = LeadFilter(regions=['Москва'], center='Королев', radius=15, gazetteer=gazetteer)
+
+    assert lead_filter.check_region('МО, Пушкино') == ACCEPT
+    assert lead_filter.check_region('МО, Дмитров') == REJECT
+
+
+def test_regions_missing_in_gazetteer():
+    """
+    Regions gazetteer doesn't know are matched by text in known places.
+    """
+
+    gazetteer = Gazetteer.build(str(GAZETTEER_PATH))
+
+    location = 'Московская область, Щёлково, Звёздный городок'
+
+    assert gazetteer.resolve(location) is not None
+
+    assert LeadFilter(regions=['Звездный городок'], gazetteer=gazetteer).check_region(location) == ACCEPT
+    assert LeadFilter(regions=['Щелково'], exclude_regions=['Звёздный городок'],
+                      gazetteer=gazetteer).check_region(location) == REJECT
+
+
+def test_resolve_cache_is_bounded(mocker: Mocker):
+    """
+    Least recently resolved locations are dropped from cache.
+    """
+
+    mocker.patch('bot.gazetteer.RESOLVE_CACHE_SIZE', 2)
+
+    gazetteer = Gazetteer.build(str(GAZETTEER_PATH))
+
+    for location in ('Москва', 'Химки', 'Москва', 'Королев'):
+        gazetteer.resolve(location)
+
+    assert list(gazetteer._cache) == ['Москва', 'Королев']
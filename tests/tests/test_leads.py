@@ -0,0 +1,72 @@
+from bot.leads import LeadCard, lead_id_from_url, parse_cards
+
+
+def test_lead_id_from_url():
+
+    assert lead_id_from_url('https://my.cian.ru/leads/1504220/') == 1504220
+    assert lead_id_from_url('https://my.cian.ru/leads') is None
+    assert lead_id_from_url(1) is None
+
+
+def test_fingerprint():
+    """
+    Lead id is preferred. Cards posted in the same minute
+    without id still get different fingerprints.
+    """
+
+    card = LeadCard(index=0, created='10:15', lead_id=15, location='Химки')
+
+    assert card.fingerprint == 'id:15'
+
+    first = LeadCard(index=0, created='10:15', location='Химки')
+    second = LeadCard(index=1, created='10:15', location='Мытищи')
+
+    assert first.fingerprint != second.fingerprint
+    assert first.fingerprint == first._replace(index=5, price='300').fingerprint
+
+
+def test_fingerprint_with_relative_time():
+    """
+    Card without id keeps its fingerprint while its relative time changes.
+    """
+
+    card = LeadCard(index=0, created='5 минут назад', location='Химки', type='Хочу продать квартиру')
+
+    assert card.fingerprint == card._replace(created='7 минут назад').fingerprint
+    assert card.fingerprint == card._replace(created='только что').fingerprint
+
+    card = card._replace(created='сегодня, 10:15')
+
+    assert card.fingerprint == card._replace(created='вчера, 10:15').fingerprint
+    assert card.fingerprint != card._replace(created='10:16').fingerprint
+
+
+def test_identifiable():
+    """
+    Cards without id and target may share fingerprint,
+    OpenLead target tells them apart.
+    """
+
+    cards = [LeadCard(index=0, created=created) for created in ('5 минут назад', 'только что', '')]
+
+    assert len({card.fingerprint for card in cards}) == 1
+    assert not any(card.identifiable for card in cards)
+
+    first = cards[0]._replace(target='/leads/open?hash=a1')
+    second = cards[0]._replace(target='/leads/open?hash=b2')
+
+    assert first.identifiable
+    assert first.fingerprint != second.fingerprint != cards[0].fingerprint
+
+    assert LeadCard(index=0, created='', lead_id=15).identifiable
+
+
+def test_parse_cards():
+    """
+    Malformed script results are skipped.
+    """
+
+    cards = parse_cards([{'index': 0, 'created': '10:15', 'lead_id': 1}, {'created': '10:16'}, None])
+
+    assert len(cards) == 1
+    assert cards[0].lead_id == 1
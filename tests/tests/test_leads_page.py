@@ -0,0 +1,78 @@
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from typehints import Mocker
+from web import utils
+from web.models import Lead
+from web.utils import count_leads, get_leads_page
+
+
+def make_session():
+
+    engine = create_engine('sqlite://')
+    Lead.__table__.create(engine)
+
+    return sessionmaker(bind=engine)()
+
+
+def test_get_leads_page():
+    """
+    Pages go newest first without gaps and duplicates,
+    leads purchased at the same time are ordered by id.
+    """
+
+    session = make_session()
+
+    created = datetime(2021, 4, 15, 10, 0)
+
+    for lead_id in range(1, 8):
+        # Two leads for every minute
+        session.add(Lead(id=lead_id, created_on=created + timedelta(minutes=lead_id // 2)))
+
+    session.commit()
+
+    pages = []
+    before = None
+
+    while True:
+
+        leads, before = get_leads_page(before=before, limit=3, session=session)
+        pages.append([lead.id for lead in leads])
+
+        if before is None:
+            break
+
+    assert pages == [[7, 6, 5], [4, 3, 2], [1]]
+
+
+def test_count_leads(mocker: Mocker):
+    """
+    Leads are counted once a day, new leads are added to the count.
+    """
+
+    session = make_session()
+
+    mocker.patch.dict(utils._leads_count, {'day': None, 'count': 0, 'last': None})
+
+    assert count_leads(session=session) == 0
+
+    session.add_all([Lead(id=1, created_on=datetime(2021, 4, 14)), Lead(id=2, created_on=datetime(2021, 4, 15))])
+    session.commit()
+
+    # Leads purchased after the daily count are added to it
+    assert count_leads(session=session) == 2
+    assert utils._leads_count['count'] == 0
+
+    # The next day all leads are counted again
+    utils._leads_count['day'] = date.today() - timedelta(days=1)
+
+    assert count_leads(session=session) == 2
+    assert utils._leads_count['count'] == 2
+    assert utils._leads_count['last'] == (datetime(2021, 4, 15), 2)
+
+    session.add(Lead(id=3, created_on=datetime(2021, 4, 15)))
+    session.commit()
+
+    assert count_leads(session=session) == 3
@@ -0,0 +1,46 @@
+from datetime import datetime, timedelta
+
+from bot.pacing import BudgetPacer, parse_price
+from bot.scheduler import SEEN
+
+
+def test_parse_price():
+
+    assert parse_price('Оплатить 300 ₽') == 300
+    assert parse_price('Оплатить 1 200 ₽') == 1200
+    assert parse_price('300') == 300
+    assert parse_price('Оплатить') is None
+    assert parse_price('') is None
+
+
+def test_budget_is_spread_along_the_day():
+    """
+    Half of leads arrive in the morning, half in the evening.
+    Morning purchases can't spend evening money.
+    """
+
+    now = datetime(2021, 4, 15, 9)
+
+    events = []
+
+    for day in range(1, 8):
+        date = now - timedelta(days=day)
+        events += [(date.replace(hour=9), SEEN)] * 5
+        events += [(date.replace(hour=19), SEEN)] * 5
+
+    pacer = BudgetPacer(slack=0.1)
+
+    # Without history only money left is checked
+    assert pacer.approve(300, money_left=3000, day_limit=3000, now=now)
+    assert not pacer.approve(300, money_left=200, day_limit=3000, now=now)
+
+    pacer.fit(events)
+
+    assert pacer.allowance(3000, now=now.replace(hour=3)) == 300
+    assert pacer.allowance(3000, now=now) == 1800
+
+    assert pacer.approve(300, money_left=1500, day_limit=3000, now=now)
+    assert not pacer.approve(300, money_left=1400, day_limit=3000, now=now)
+
+    # Evening money is available in the evening
+    assert pacer.approve(300, money_left=1400, day_limit=3000, now=now.replace(hour=19))
@@ -0,0 +1,53 @@
+from datetime import datetime
+
+from bot.leads import LeadCard
+from bot.priority import LeadScorer, card_age
+
+
+def test_card_age():
+
+    now = datetime(2021, 4, 15, 10, 30)
+
+    assert card_age('только что', now) == 0
+    assert card_age('5 минут назад', now) == 300
+    assert card_age('10:15', now) == 900
+    assert card_age('Вчера, 10:30', now) == 86400
+    # Time later than now is yesterday's
+    assert card_age('23:30', now) == 11 * 3600
+    assert card_age('', now) is None
+
+
+def test_rank_cards():
+    """
+    Fresh lead goes first, then the one in the region with higher priority.
+    """
+
+    now = datetime(2021, 4, 15, 10, 30)
+
+    scorer = LeadScorer(regions=['Королёв', 'Москва'])
+
+    old_moscow = LeadCard(index=0, created='09:00', location='Москва', type='Хочу продать квартиру', price='300 ₽')
+    old_korolev = LeadCard(index=1, created='09:00', location='МО, Королев', type='Хочу продать квартиру', price='300 ₽')
+    fresh_moscow = LeadCard(index=2, created='10:29', location='Москва', type='Хочу продать квартиру', price='300 ₽')
+
+    ranked = scorer.rank([old_moscow, old_korolev, fresh_moscow], now=now)
+
+    assert [card.index for card in ranked] == [2, 1, 0]
+
+    # Cheaper lead goes first among equal ones
+    cheap = old_moscow._replace(index=3, price='200 ₽')
+
+    assert scorer.rank([old_moscow, cheap], now=now)[0].index == 3
+
+
+def test_type_score():
+    """
+    Type is scored by configured object types.
+    """
+
+    scorer = LeadScorer(object_types=['продать квартиру', 'сдать комнату'])
+
+    assert scorer.type(LeadCard(index=0, created='', type='Хочу сдать комнату')) == 1.0
+    assert scorer.type(LeadCard(index=0, created='', type='Хочу продать дом')) == 0.5
+    assert scorer.type(LeadCard(index=0, created='', type='Хочу купить дом')) == 0.0
+    assert scorer.type(LeadCard(index=0, created='')) == 0.5
@@ -0,0 +1,79 @@
+from unittest.mock import MagicMock
+
+from selenium.common import exceptions
+
+from bot.push import PushChannel
+from bot.sources import DomLeadSource
+
+
+def test_wait():
+    """
+    Wait returns queued events, an empty list on timeout
+    and None if observer is gone with page reload.
+    """
+
+    driver = MagicMock()
+
+    channel = PushChannel(driver)
+
+    driver.execute_async_script.return_value = [{'kind': 'cards', 'count': 1}]
+    assert channel.wait(30) == [{'kind': 'cards', 'count': 1}]
+
+    # Timeout is passed to the page in milliseconds
+    assert driver.execute_async_script.call_args[0][1] == 30000
+
+    driver.execute_async_script.side_effect = exceptions.TimeoutException()
+    assert channel.wait(30) == []
+
+    driver.execute_async_script.side_effect = None
+    driver.execute_async_script.return_value = None
+    assert channel.wait(30) is None
+
+
+def test_pushed_list_is_not_refreshed():
+    """
+    List re-rendered by the page is snapshotted without own refresh.
+    """
+
+    bot = MagicMock()
+    bot.driver.execute_script.return_value = [{'index': 0, 'created': '10:15', 'lead_id': 1}]
+
+    source = DomLeadSource(bot)
+
+    bot.pushed = True
+
+    assert [card.lead_id for card in source.fetch()] == [1]
+    assert not bot.refresh_leads.called
+    assert bot.pushed is False
+
+    source.fetch()
+
+    assert bot.refresh_leads.called
+
+
+def test_wait_for_push_in_main_tab(mocker):
+    """
+    Page url is checked after switching to the main tab,
+    not in a detail tab left active by the last purchase.
+    """
+
+    from bot.cianbot import CianBot
+    from settings import LEADS_PAGE
+
+    bot = CianBot()
+
+    driver = MagicMock()
+    driver.current_url = 'https://www.cian.ru/lead/1/'
+    driver.execute_async_script.return_value = [{'kind': 'cards', 'count': 1}]
+
+    tabs = MagicMock()
+    tabs.switch_main.side_effect = lambda: setattr(driver, 'current_url', LEADS_PAGE)
+
+    mocker.patch.object(bot, 'driver', driver)
+    mocker.patch.object(bot, '_tabs', tabs)
+    mocker.patch('bot.cianbot.PUSH_CHANNEL', True)
+
+    assert bot.wait_for_push(30) == [{'kind': 'cards', 'count': 1}]
+    assert bot.pushed is True
+
+    bot.pushed = False
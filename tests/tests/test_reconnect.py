@@ -0,0 +1,94 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from bot.reconnect import Reconnector
+from bot.simulator import VirtualClock
+from typehints import Mocker
+
+
+def make_clock() -> VirtualClock:
+    start = datetime(2021, 4, 15, 10)
+    return VirtualClock(start, start + timedelta(days=1))
+
+
+def test_backoff_delay(mocker: Mocker):
+    """
+    Delay grows exponentially from base delay up to max delay.
+    """
+
+    mocker.patch('bot.reconnect.random.uniform', return_value=1.0)
+
+    reconnector = Reconnector(base_delay=1, max_delay=10)
+
+    assert [reconnector.delay(attempt) for attempt in range(6)] == [1, 2, 4, 8, 10, 10]
+
+
+def test_recover(mocker: Mocker):
+    """
+    Page is restored only after probe passed.
+    Failed restore continues backoff.
+    """
+
+    sleep = mocker.patch('bot.reconnect.Reconnector.sleep')
+
+    probes = iter([False, True, True])
+    restores = iter([False, True])
+
+    restore_calls = []
+
+    def restore():
+        restore_calls.append(1)
+        return next(restores)
+
+    reconnector = Reconnector(base_delay=1, clock=make_clock())
+    reconnector.recover(probe=lambda: next(probes), restore=restore)
+
+    assert sleep.call_count == 3
+    assert len(restore_calls) == 2
+    assert reconnector.state == Reconnector.ONLINE
+    assert reconnector.metrics()['outages'] == 1
+    assert reconnector.metrics()['failed_attempts'] == 2
+
+
+def test_max_outage():
+    """
+    ConnectionError is raised when outage is too long,
+    outage isn't reported as ongoing after that.
+    """
+
+    clock = make_clock()
+
+    reconnector = Reconnector(max_outage=150, clock=clock)
+
+    with pytest.raises(ConnectionError):
+        reconnector.recover(probe=lambda: False, restore=lambda: True)
+
+    assert reconnector.state == Reconnector.ONLINE
+    assert reconnector.metrics()['last_outage'] > 150
+    assert reconnector.metrics()['last_recovered_at'] is None
+
+
+def test_stop_during_backoff(mocker: Mocker):
+    """
+    Backoff delay is slept in steps and recovery is stopped
+    as soon as stop is requested.
+    """
+
+    clock = make_clock()
+    sleep = mocker.spy(clock, 'sleep')
+
+    stops = iter([False, False, True])
+
+    probe = mocker.Mock(return_value=True)
+
+    reconnector = Reconnector(base_delay=60, max_outage=600, step=1.0, clock=clock)
+
+    with pytest.raises(ConnectionAbortedError):
+        reconnector.recover(probe=probe, restore=lambda: True, stopped=lambda: next(stops))
+
+    assert sleep.call_args_list == [mocker.call(1.0), mocker.call(1.0)]
+    probe.assert_not_called()
+    assert reconnector.state == Reconnector.ONLINE
+    assert reconnector.metrics()['outages'] == 1
+    assert reconnector.metrics()['last_outage'] == 2.0
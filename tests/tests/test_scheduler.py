@@ -0,0 +1,149 @@
+from datetime import datetime, timedelta
+
+from bot.scheduler import LOST, SEEN, PollScheduler
+from typehints import Mocker
+
+
+def make_history(now: datetime):
+    """
+    Two weeks of history: many leads at 10:00, some at 15:00
+    which are often lost, nothing at night.
+    """
+
+    events = []
+
+    for day in range(1, 15):
+
+        date = (now - timedelta(days=day)).replace(minute=30)
+
+        events += [(date.replace(hour=10), SEEN)] * 6
+        events += [(date.replace(hour=15), SEEN)] * 2
+        events += [(date.replace(hour=15), LOST)] * 2
+
+    return events
+
+
+def test_intervals_follow_arrivals(mocker: Mocker):
+
+    now = datetime(2021, 4, 15, 12)
+
+    scheduler = PollScheduler(daily_budget=1000, min_interval=10, max_interval=600)
+
+    mocker.patch.object(scheduler.random, 'uniform', return_value=1.0)
+    scheduler.fit(make_history(now), now=now)
+
+    busy = scheduler.interval(now.replace(hour=10))
+    lossy = scheduler.interval(now.replace(hour=15))
+    night = scheduler.interval(now.replace(hour=3))
+
+    assert busy < night
+    assert lossy < night
+    assert night <= 600
+
+
+def test_budget_is_kept(mocker: Mocker):
+    """
+    Polls per day don't exceed the budget when intervals aren't clamped.
+    """
+
+    now = datetime(2021, 4, 15, 12)
+
+    scheduler = PollScheduler(daily_budget=1000, min_interval=1, max_interval=86400)
+    scheduler.fit(make_history(now), now=now)
+
+    polls = sum(3600 / interval for interval in scheduler.intervals)
+
+    assert abs(polls - 1000) < 1
+
+
+def test_budget_is_kept_after_clamp():
+    """
+    Polls removed by clamping busy hours are redistributed to other hours.
+    """
+
+    now = datetime(2021, 4, 15, 12)
+
+    scheduler = PollScheduler(daily_budget=1800, min_interval=15, max_interval=600)
+    scheduler.fit(make_history(now), now=now)
+
+    polls = sum(3600 / interval for interval in scheduler.intervals)
+
+    assert abs(polls - 1800) < 1
+    assert min(scheduler.intervals) >= 15
+    assert max(scheduler.intervals) <= 600
+
+
+def test_burst_polls_are_counted(mocker: Mocker):
+    """
+    Polls shortened by new cards are counted against hour's allowance.
+    """
+
+    now = datetime(2021, 4, 15, 10)
+
+    scheduler = PollScheduler(daily_budget=1800, min_interval=15, max_interval=600, burst_factor=0.25)
+    scheduler.fit(make_history(now), now=now)
+
+    mocker.patch.object(scheduler.random, 'uniform', return_value=1.0)
+
+    allowance = 3600 / scheduler.intervals[12]
+
+    # Bursts alone would poll quiet hour several times more often
+    assert 3600 / max(15, scheduler.intervals[12] * 0.25) > 2 * allowance
+
+    polls = 0
+    moment = now.replace(hour=12)
+
+    while moment.hour == 12:
+        polls += 1
+        moment += timedelta(seconds=scheduler.interval(moment, delta=1))
+
+    assert polls <= allowance + 1
+
+
+def test_no_history():
+    """
+    Legacy random intervals are used without history.
+    """
+
+    scheduler = PollScheduler(daily_budget=1000, min_interval=10, max_interval=600)
+    scheduler.fit([])
+
+    assert 25 <= scheduler.interval(datetime(2021, 4, 15, 12)) <= 60
+
+
+def test_new_cards_shorten_interval(mocker: Mocker):
+    """
+    Next poll is sooner after a refresh with new cards.
+    """
+
+    scheduler = PollScheduler(daily_budget=1000, min_interval=15, max_interval=600, burst_factor=0.25)
+
+    mocker.patch.object(scheduler.random, 'randint', return_value=40)
+
+    now = datetime(2021, 4, 15, 12)
+
+    assert scheduler.interval(now) == 40
+    assert scheduler.interval(now, delta=2) == 15
+
+    # Legacy scheduler keeps its intervals and is never fitted
+    scheduler.adaptive = False
+
+    assert scheduler.interval(now, delta=2) == 40
+    assert not scheduler.needs_fit(now)
+
+
+def test_clock():
+    """
+    Time is taken from injected clock.
+    """
+
+    now = datetime(2021, 4, 15, 3)
+
+    scheduler = PollScheduler(daily_budget=1000, min_interval=15, max_interval=600, clock=lambda: now)
+
+    # Night interval
+    assert 41 <= scheduler.interval() <= 80
+
+    scheduler.fit([])
+
+    assert scheduler.fitted_at == now
@@ -0,0 +1,81 @@
+from bot.session import SessionTracker
+from typehints import Mocker
+
+
+def test_session_trust(mocker: Mocker):
+    """
+    Session is trusted within trust period while its cookies are alive.
+    """
+
+    clock = mocker.patch('bot.session.time.time', return_value=1000.0)
+
+    cookies = [{'name': 'session', 'value': '1', 'expiry': 5000}, {'name': 'tracking', 'value': '2'}]
+
+    tracker = SessionTracker(trust_period=300)
+
+    assert not tracker.is_trusted(cookies)
+
+    tracker.mark_valid(cookies)
+
+    assert tracker.is_trusted(cookies)
+
+    # Session cookie is gone
+    assert not tracker.is_trusted(cookies[1:])
+
+    # Session cookie is about to expire
+    clock.return_value = 4990.0
+    tracker.last_ok = 4900.0
+    assert not tracker.is_trusted(cookies)
+
+    # Trust period is over
+    clock.return_value = 1400.0
+    tracker.last_ok = 1000.0
+    assert not tracker.is_trusted(cookies)
+
+
+def test_is_logged_in(mocker: Mocker):
+    """
+    Missing login button proves login only on the checked page,
+    leads page proves it by its controls.
+    """
+
+    from unittest.mock import MagicMock
+
+    from selenium.common import exceptions
+
+    from bot.cianbot import CianBot
+
+    bot = CianBot()
+
+    driver = MagicMock()
+    driver.get_cookies.return_value = []
+    driver.find_element_by_id.side_effect = exceptions.NoSuchElementException()
+
+    mocker.patch.object(bot, 'driver', driver)
+    mocker.patch.object(bot, '_tabs', MagicMock())
+    mocker.patch.object(bot, 'session', SessionTracker(trust_period=300))
+
+    # Page opened instead of the login page, i.e. captcha
+    driver.current_url = 'https://www.cian.ru/captcha/'
+
+    assert not bot.is_logged_in()
+    assert bot.session.last_ok is None
+    driver.get.assert_called_once_with('http://cian.ru/')
+
+    # Lead tab without login button proves nothing, leads page markup does
+    driver.current_url = 'https://my.cian.ru/leads/1504220/'
+    driver.find_elements_by_xpath.return_value = [MagicMock()]
+
+    assert not bot.is_logged_in('https://my.cian.ru/leads')
+
+    driver.current_url = 'https://my.cian.ru/leads'
+
+    assert bot.is_logged_in('https://my.cian.ru/leads')
+    assert bot.session.last_ok is not None
+
+    # Login page is checked for login button
+    bot.session.invalidate()
+    driver.current_url = 'https://www.cian.ru/'
+    driver.find_elements_by_xpath.return_value = []
+
+    assert bot.is_logged_in()
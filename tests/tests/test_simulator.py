@@ -0,0 +1,76 @@
+from datetime import datetime, timedelta
+
+from bot.simulator import RecordedLead, compare, leads_from_events
+from bot.scheduler import LOST, SEEN
+
+
+def make_leads(start: datetime):
+    """
+    Three days of leads arriving in the morning,
+    half of them are taken by competitors in 20 seconds.
+    """
+
+    leads = []
+
+    for day in range(3):
+        for n in range(6):
+
+            arrived_at = start + timedelta(days=day, hours=10, minutes=10 * n)
+            taken_at = arrived_at + timedelta(seconds=20) if n % 2 else None
+
+            leads.append(RecordedLead(lead_id=day * 10 + n, arrived_at=arrived_at, taken_at=taken_at))
+
+    return leads
+
+
+def test_compare_policies():
+    """
+    Both policies replay the same history through the worker loop
+    with the same seed, so outcomes are exact.
+    """
+
+    start = datetime(2021, 4, 12)
+
+    leads = make_leads(start)
+
+    results = compare(leads, start=start, end=start + timedelta(days=3), day_money_limit=1500, seed=0)
+
+    assert set(results) == {'legacy', 'adaptive'}
+    assert results == compare(leads, start=start, end=start + timedelta(days=3), day_money_limit=1500, seed=0)
+
+    legacy, adaptive = results['legacy'], results['adaptive']
+
+    assert legacy['leads'] == adaptive['leads'] == 18
+
+    # Legacy intervals of 25-60 seconds miss fast competitors
+    assert legacy['purchased'] == 11
+    assert legacy['missed_rate'] == 0.389
+    assert legacy['budget_used'] == 0.733
+
+    # Adaptive policy polls right after new cards and spends
+    # the whole limit of 5 leads a day
+    assert adaptive['purchased'] == 15
+    assert adaptive['missed_rate'] == 0.167
+    assert adaptive['budget_used'] == 1.0
+
+    # It polls less often, burst polls are counted against the budget
+    assert adaptive['polls'] == 1667
+    assert legacy['polls'] == 3890
+
+
+def test_leads_from_events():
+
+    now = datetime(2021, 4, 12, 10)
+
+    events = [
+        (now, SEEN, 'id:1'),
+        (now + timedelta(minutes=1), SEEN, 'id:1'),
+        (now + timedelta(minutes=2), SEEN, 'id:2'),
+        (now + timedelta(minutes=3), LOST, 'id:2'),
+    ]
+
+    leads = leads_from_events(events)
+
+    assert [lead.arrived_at for lead in leads] == [now, now + timedelta(minutes=2)]
+    assert leads[0].taken_at is None
+    assert leads[1].taken_at == now + timedelta(minutes=3)
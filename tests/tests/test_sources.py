@@ -0,0 +1,117 @@
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import pytest
+
+from bot.sources import ApiLeadSource, DomLeadSource, LeadSource, make_lead_source
+
+
+RECORDED_RESPONSE = Path(__file__).parent / 'data' / 'leads_api_response.json'
+
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    """
+    Stand-in for leads endpoint replaying recorded response
+    to requests with session cookie.
+    """
+
+    def do_GET(self):
+
+        if 'session=secret' not in self.headers.get('Cookie', ''):
+            self.send_response(401)
+            self.end_headers()
+            return
+
+        body = RECORDED_RESPONSE.read_bytes()
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def leads_api_url():
+
+    server = HTTPServer(('127.0.0.1', 0), ReplayHandler)
+
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    yield f"http://127.0.0.1:{server.server_port}/leads"
+
+    server.shutdown()
+    server.server_close()
+
+
+def test_api_source_with_cookies(leads_api_url):
+    """
+    Leads are requested with browser's cookies and parsed into cards.
+    """
+
+    bot = MagicMock()
+    bot.driver.get_cookies.return_value = [{'name': 'session', 'value': 'secret'}]
+    bot.driver.execute_script.return_value = 'Mozilla/5.0'
+
+    cards = ApiLeadSource(bot, url=leads_api_url, mode='cookies').fetch()
+
+    assert [card.lead_id for card in cards] == [1504220, 1504221]
+    assert cards[0].location == 'Московская область, Мытищи, улица Мира'
+    assert cards[0].type == 'Хочу продать квартиру'
+    assert cards[0].price == '300'
+    assert cards[0].button is None
+
+
+def test_api_source_in_browser():
+    """
+    Leads are requested with fetch() from the logged-in page.
+    """
+
+    bot = MagicMock()
+    bot.driver.execute_async_script.return_value = {'status': 200, 'body': RECORDED_RESPONSE.read_text('utf-8')}
+
+    cards = ApiLeadSource(bot, url='https://my.cian.ru/api/leads', mode='browser').fetch()
+
+    assert [card.lead_id for card in cards] == [1504220, 1504221]
+    assert cards[0].location == 'Московская область, Мытищи, улица Мира'
+
+    script, url = bot.driver.execute_async_script.call_args.args
+
+    assert 'fetch(url' in script
+    assert url == 'https://my.cian.ru/api/leads'
+
+    bot.driver.get_cookies.assert_not_called()
+
+
+def test_api_source_in_browser_error():
+    """
+    Non 200 response of in-page request is raised.
+    """
+
+    bot = MagicMock()
+    bot.driver.execute_async_script.return_value = {'status': 401, 'body': 'Unauthorized'}
+
+    with pytest.raises(IOError):
+        ApiLeadSource(bot, url='https://my.cian.ru/api/leads', mode='browser').fetch()
+
+
+def test_lead_source_is_abstract():
+
+    with pytest.raises(TypeError):
+        LeadSource(MagicMock())
+
+
+def test_api_source_fallback(mocker):
+    """
+    DOM source is used when leads API url isn't configured.
+    """
+
+    mocker.patch('bot.sources.LEADS_API_URL', '')
+
+    assert isinstance(make_lead_source(MagicMock(), 'api'), DomLeadSource)
@@ -0,0 +1,73 @@
+from datetime import datetime
+from multiprocessing import Process
+
+from bot.status import TEXT_SIZE, PurchaseRing, StatusBlock
+
+
+def write_texts(block: StatusBlock, count: int) -> None:
+
+    for i in range(count):
+        block.write('info', str(i % 10) * (TEXT_SIZE - i % 7))
+
+
+def test_fields():
+
+    block = StatusBlock(run=1, money_left=-1, info="Бот готов к работе.")
+
+    assert block.read()['run'] == 1
+    assert block.field('money_left').value == -1
+    assert block.field('info').value == "Бот готов к работе."
+
+    block.field('error').value = "Ошибка"
+
+    assert block.read()['error'] == "Ошибка"
+
+    # Too long text is cut
+    block.field('info').value = "я" * TEXT_SIZE
+
+    assert block.field('info').value == "я" * (TEXT_SIZE // 2)
+
+
+def test_reads_are_consistent():
+    """
+    Reader never sees a text half written by another process.
+    """
+
+    block = StatusBlock(info='0' * TEXT_SIZE)
+
+    writer = Process(target=write_texts, args=(block, 20000))
+    writer.start()
+
+    while writer.is_alive():
+
+        info = block.read()['info']
+
+        assert len(set(info)) == 1
+
+    writer.join()
+
+
+def test_purchase_ring():
+    """
+    Every client gets purchases after its cursor,
+    overwritten purchases are skipped.
+    """
+
+    ring = PurchaseRing(capacity=3)
+
+    created = datetime(2021, 4, 15, 10, 30)
+
+    assert ring.since(0) == ([], 0)
+
+    for lead_id in range(1, 5):
+        ring.append(f'https://my.cian.ru/leads/{lead_id}/', created)
+
+    leads, last = ring.since(0)
+
+    assert last == 4
+    assert [url for url, _ in leads] == [f'https://my.cian.ru/leads/{lead_id}/' for lead_id in (2, 3, 4)]
+    assert leads[0][1] == created
+
+    # Another client is not affected by previous reads
+    assert [url for url, _ in ring.since(3)[0]] == ['https://my.cian.ru/leads/4/']
+    assert ring.since(4) == ([], 4)
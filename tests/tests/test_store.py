@@ -0,0 +1,89 @@
+from bot.store import IgnoredLeadsStore
+from typehints import LocalPath, Mocker
+
+
+def test_journal_survives_restart(tmpdir: LocalPath):
+    """
+    Added leads are journaled immediately and loaded by a new store.
+    """
+
+    path = str(tmpdir / 'ignored.journal')
+
+    store = IgnoredLeadsStore(path, ttl=60)
+    store.load()
+    store.add('lead-1')
+    store.add('lead-2')
+
+    # No close() call, like after a crash
+    restored = IgnoredLeadsStore(path, ttl=60)
+    restored.load()
+
+    assert 'lead-1' in restored
+    assert 'lead-2' in restored
+    assert 'lead-3' not in restored
+
+
+def test_expired_leads(tmpdir: LocalPath, mocker: Mocker):
+    """
+    Leads are forgotten after ttl and are not loaded again.
+    """
+
+    clock = mocker.patch('bot.store.time.time', return_value=1000.0)
+
+    path = str(tmpdir / 'ignored.journal')
+
+    store = IgnoredLeadsStore(path, ttl=60)
+    store.load()
+    store.add('lead-1')
+
+    clock.return_value = 1100.0
+
+    assert 'lead-1' not in store
+
+    store.load()
+
+    assert len(store) == 0
+
+
+def test_compact(tmpdir: LocalPath):
+    """
+    Compaction keeps one journal line per live lead.
+    """
+
+    path = str(tmpdir / 'ignored.journal')
+
+    store = IgnoredLeadsStore(path, ttl=60)
+    store.load()
+
+    for _ in range(3):
+        store.add('lead-1')
+
+    store.compact()
+    store.close()
+
+    with open(path) as f:
+        assert len(f.readlines()) == 1
+
+    store.load()
+
+    assert 'lead-1' in store
+
+
+def test_reload_closes_journal(tmpdir: LocalPath):
+    """
+    Reloading store doesn't leave previous journal handle open.
+    """
+
+    path = str(tmpdir / 'ignored.journal')
+
+    store = IgnoredLeadsStore(path, ttl=60)
+    store.load()
+
+    journal = store._journal
+
+    store.load()
+
+    assert journal.closed
+    assert not store._journal.closed
+
+    store.close()
@@ -0,0 +1,54 @@
+from datetime import datetime
+
+from bot.status import PurchaseRing, StatusBlock
+from typehints import Mocker
+from web.utils import status_events
+
+
+class StubManager(object):
+
+    def __init__(self) -> None:
+        self.status = StatusBlock(run=0, quit=0, launch=0, phone_code=0, money_left=-1, money_limit=0,
+                                  info="Новых заявок пока нет", error="")
+        self.purchased_leads = PurchaseRing(capacity=4)
+
+    def get_state_version(self) -> int:
+        return self.status.version
+
+    def get_state(self) -> dict:
+        status = self.status.read()
+        return {'money_left': status['money_left'], 'info': status['info']}
+
+    def get_new_leads(self, since: int):
+        return self.purchased_leads.since(since)
+
+
+def test_status_events(mocker: Mocker):
+    """
+    Status is sent only when it changes, leads are sent after the cursor,
+    heartbeat is sent when nothing happens.
+    """
+
+    mocker.patch('web.utils.time.sleep')
+    monotonic = mocker.patch('web.utils.time.monotonic', return_value=0)
+
+    bot = StubManager()
+    bot.purchased_leads.append('https://my.cian.ru/leads/1/', datetime(2021, 4, 15, 10, 0))
+
+    events = status_events(bot, since=1, check_interval=0.25, heartbeat=15)
+
+    assert next(events).startswith('retry:')
+    assert next(events) == 'event: status\ndata: {"money_left": null, "info": "Новых заявок пока нет"}\n\n'
+
+    bot.status.write('money_left', 2700)
+    bot.purchased_leads.append('https://my.cian.ru/leads/2/', datetime(2021, 4, 15, 10, 30))
+
+    assert next(events) == ('event: status\ndata: {"money_left": 2700, "info": "Новых заявок пока нет"}\n\n'
+                            'event: leads\nid: 2\n'
+                            'data: [["https://my.cian.ru/leads/2/", "2021-04-15 10:30:00"]]\n\n')
+
+    # The same value written again isn't sent
+    bot.status.write('money_left', 2700)
+    monotonic.return_value = 20
+
+    assert next(events) == ': heartbeat\n\n'
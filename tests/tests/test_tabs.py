@@ -0,0 +1,64 @@
+from unittest.mock import MagicMock
+
+from bot.tabs import TabPool
+
+
+def make_driver() -> MagicMock:
+    """
+    Driver mock which opens a new window handle on window.open().
+    """
+
+    driver = MagicMock()
+    driver.window_handles = ['main']
+
+    opened = []
+
+    def execute_script(script, *args):
+        if script.startswith('window.open'):
+            opened.append(f'tab-{len(opened)}')
+            driver.window_handles.append(opened[-1])
+        return 'complete'
+
+    def close():
+        driver.window_handles.remove(pool.current_handle)
+
+    driver.execute_script.side_effect = execute_script
+    driver.close.side_effect = close
+
+    pool = TabPool(driver, size=1, max_uses=2)
+
+    return driver, pool
+
+
+def test_tabs_are_reused():
+    """
+    Same tab is reused until max_uses, then it's recycled.
+    """
+
+    driver, pool = make_driver()
+
+    first = pool.acquire()
+    pool.release()
+
+    assert pool.acquire() == first
+    pool.release()
+
+    recycled = pool.acquire()
+    pool.release()
+
+    assert recycled != first
+    assert first not in driver.window_handles
+    assert pool.current_handle == 'main'
+
+
+def test_switch_main_is_cached():
+    """
+    Switching to already active main tab makes no WebDriver call.
+    """
+
+    driver, pool = make_driver()
+
+    pool.switch_main()
+    pool.switch_main()
+
+    assert driver.switch_to.window.call_count == 1
@@ -0,0 +1,66 @@
+from unittest.mock import MagicMock
+
+from bot.waits import WaitStats, any_of, network_idle
+from typehints import Mocker
+
+
+def test_network_idle(mocker: Mocker):
+    """
+    Network is idle only when no request is pending,
+    none started or finished for idle_time seconds and document is loaded.
+    """
+
+    clock = mocker.patch('bot.waits.time.monotonic', return_value=0.0)
+
+    driver = MagicMock()
+    driver.execute_script.return_value = ['complete', 0, 10]
+
+    condition = network_idle(idle_time=0.5)
+
+    assert not condition(driver)
+
+    clock.return_value = 0.3
+    assert not condition(driver)
+
+    clock.return_value = 0.6
+    assert condition(driver)
+
+    # Request started - wait again
+    driver.execute_script.return_value = ['complete', 1, 11]
+    assert not condition(driver)
+
+    # Slow request is still pending
+    clock.return_value = 5.0
+    assert not condition(driver)
+
+    driver.execute_script.return_value = ['complete', 0, 12]
+    assert not condition(driver)
+
+    clock.return_value = 5.6
+    assert condition(driver)
+
+
+def test_any_of():
+    """
+    any_of returns first truthy condition result.
+    """
+
+    condition = any_of(lambda driver: False, lambda driver: 'found')
+
+    assert condition(None) == 'found'
+
+
+def test_wait_stats():
+    """
+    Saved time is counted against fixed sleeps only for known stages.
+    """
+
+    stats = WaitStats()
+
+    stats.record('leads', 0.5)
+    stats.record('leads', 1.0)
+    stats.record('lead', 3.0)
+
+    assert stats.saved('leads') == 2.5
+    assert stats.saved('lead') == 0.0
+    assert stats.saved() == 2.5
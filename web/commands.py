@@ -1,5 +1,6 @@
 import click
 from flask import Blueprint
+from sqlalchemy import inspect
 from sqlalchemy.exc import IntegrityError
 from werkzeug.security import generate_password_hash
 
@@ -32,4 +33,21 @@ def migrate() -> None:
 
     from .app import create_app
 
-    db.create_all(app=create_app())
+    app = create_app()
+
+    db.create_all(app=app)
+
+    # create_all doesn't add indexes to tables which already exist
+    with app.app_context():
+
+        inspector = inspect(db.engine)
+
+        for table in db.metadata.sorted_tables:
+
+            existing = {index['name'] for index in inspector.get_indexes(table.name)}
+
+            for index in table.indexes:
+
+                if index.name not in existing:
+                    index.create(bind=db.engine)
+                    print(f"Create index: {index.name}")
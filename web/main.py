@@ -1,13 +1,13 @@
+from datetime import datetime
 from typing import Optional, Union
 
 from flask import (Blueprint, Response, jsonify, render_template, request,
-                   send_from_directory)
+                   send_from_directory, session, stream_with_context)
 from flask_login import current_user, login_required
 
 from .common import db
 from .app import bot
-from .models import Lead
-from .utils import get_bot_settings
+from .utils import count_leads, get_bot_settings, get_filter_rules, get_leads_page, status_events
 
 main = Blueprint('main', __name__)
 
@@ -30,22 +30,47 @@ def bot_api() -> Optional[str]:
     """
 
     def check_status() -> str:
+        """
+        Bot status and leads purchased after 'since' sequence number.
+        Clients which don't pass it get new leads after
+        the cursor stored in their session.
+        """
 
-        if bot.get_money_left() == -1:
+        state = bot.get_state()
+
+        if state['money_left'] == -1:
             # Bot do not initialized
             # No need to update money_left
-            money_left = None
-        else:
-            money_left = bot.get_money_left()
-
-        return jsonify(
-                status=bot.get_status(),
-                info=bot.get_info(),
-                leads=bot.get_new_leads(),
-                money_left=money_left,
-                error=bot.get_bot_error(),
-                **bot.get_additional_dict()
-            )
+            state['money_left'] = None
+
+        since = request.args.get('since', default=None, type=int)
+
+        if since is None:
+            # Leads purchased before the page was opened are already rendered
+            since = session.get('leads_seq', bot.get_last_purchase())
+
+        leads, seq = bot.get_new_leads(since)
+
+        session['leads_seq'] = seq
+
+        return jsonify(leads=leads, seq=seq, **state)
+
+    def send_leads() -> str:
+        """
+        Page of purchased leads for infinite scroll of leads table.
+        Page goes after 'before' time and 'before_id' of the last lead client has.
+        """
+
+        before = request.args.get('before', default=None, type=datetime.fromisoformat)
+        before_id = request.args.get('before_id', default=None, type=int)
+
+        if before is None or before_id is None:
+            return NoArgumentsError()
+
+        leads, next_page = get_leads_page(before=(before, before_id))
+
+        return jsonify(leads=[[lead.url, str(lead.created_on)] for lead in leads],
+                       next=next_page and {'before': next_page[0].isoformat(), 'before_id': next_page[1]})
 
     def set_money_limit() -> Union[NoArgumentsError, None]:
 
@@ -78,12 +103,60 @@ def bot_api() -> Optional[str]:
 
         return jsonify(bot_settings.serialize())
 
+    def send_filter_rules() -> str:
+
+        rules = get_filter_rules(app=main)
+
+        if rules is None:
+            return jsonify(error='Не удалось загрузить фильтры')
+
+        return jsonify(rules.serialize())
+
+    def set_filter_rules() -> Union[NoArgumentsError, None]:
+        """
+        Bot picks up new rules on the next leads page refresh.
+        """
+
+        max_age = request.args.get('max_age', default=0, type=int)
+        radius = request.args.get('radius', default=0, type=int)
+
+        if max_age < 0:
+            return jsonify(error='Возраст заявки не может быть отрицательным')
+
+        if radius < 0:
+            return jsonify(error='Радиус не может быть отрицательным')
+
+        rules = get_filter_rules(app=main)
+
+        if rules is None:
+            return jsonify(error='Не удалось загрузить фильтры')
+
+        for field in ('include_regions', 'exclude_regions', 'object_types'):
+
+            value = request.args.get(field, default=None, type=str)
+
+            if value is not None:
+                setattr(rules, field, ', '.join(rules.split(value)))
+
+        if not rules.split(rules.include_regions):
+            db.session.rollback()
+            return jsonify(error='Укажите хотя бы один регион')
+
+        rules.max_age = max_age
+        rules.radius = radius
+        rules.center = request.args.get('center', default='', type=str).strip()
+
+        db.session.commit()
+
     action = request.args.get('action', default=None, type=str)
 
     action_table = {
         'check': lambda: None,
         'check_status': check_status,
         'get_bot_settings': send_bot_settings,
+        'get_filter_rules': send_filter_rules,
+        'get_leads': send_leads,
+        'set_filter_rules': set_filter_rules,
         'set_money_limit': set_money_limit,
         'set_phone_code': set_phone_code,
         'run': bot.run,
@@ -106,11 +179,42 @@ def bot_api() -> Optional[str]:
         return Response(str(e), status=500, mimetype='application/json')
 
 
+@main.route('/api/stream')
+@login_required
+def bot_stream() -> Response:
+    """
+    Server-Sent Events stream of bot status and purchased leads for settings.html.
+    Replaces polling of check_status: login is checked once per connection.
+    """
+
+    since = request.headers.get('Last-Event-ID', default=None, type=int)
+
+    if since is None:
+        since = request.args.get('since', default=None, type=int)
+
+    if since is None:
+        since = session.get('leads_seq', bot.get_last_purchase())
+
+    response = Response(stream_with_context(status_events(bot, since)), mimetype='text/event-stream')
+
+    response.headers['Cache-Control'] = 'no-cache'
+    # Don't let reverse proxy buffer the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+
+    return response
+
+
 @main.route('/settings')
 @login_required
 def settings():
-    purchased_leads = Lead.query.order_by(Lead.created_on.desc()).all()
-    return render_template('settings.html', username=current_user.username, purchased_leads=purchased_leads)
+    # Only the first page is rendered, the rest is loaded on scroll
+    purchased_leads, next_page = get_leads_page()
+
+    # Leads purchased after rendering are polled from this sequence number
+    leads_seq = session['leads_seq'] = bot.get_last_purchase()
+
+    return render_template('settings.html', username=current_user.username, purchased_leads=purchased_leads,
+                           leads_count=count_leads(), leads_next=next_page, leads_seq=leads_seq)
 
 
 @main.route('/static/<path:path>')
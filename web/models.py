@@ -1,7 +1,8 @@
 from datetime import date, timedelta
-from typing import Tuple
+from typing import Any, Dict, List, Tuple
 
 from flask_login import UserMixin
+from sqlalchemy.dialects import sqlite
 from sqlalchemy.inspection import inspect
 
 from .common import db
@@ -67,4 +68,72 @@ class Lead(BaseModel):
 
     __tablename__ = 'leads'
 
+    # SQLite stores now() without microseconds, compared positions
+    # of keyset pagination must be stored the same way
+    created_on = db.Column(db.DateTime().with_variant(sqlite.DATETIME(
+        storage_format='%(year)04d-%(month)02d-%(day)02d %(hour)02d:%(minute)02d:%(second)02d'), 'sqlite'),
+        default=db.func.now())
+
+    # Leads are listed newest first with keyset pagination on (created_on, id)
+    __table_args__ = (db.Index('ix_leads_created_on_id', 'created_on', 'id'),)
+
     include = ('id', 'created_on')
+
+    @property
+    def url(self) -> str:
+        return f"https://my.cian.ru/leads/{self.id}/"
+
+
+class LeadEvent(BaseModel):
+    """
+    Lead seen, purchased or lost to competitors.
+    History of events is used to schedule leads page polls.
+    """
+
+    __tablename__ = 'lead_events'
+
+    kind = db.Column(db.String(16), nullable=False)
+    fingerprint = db.Column(db.String(64))
+
+    __table_args__ = (db.Index('ix_lead_events_created_on', 'created_on'),)
+
+    include = ('id', 'kind', 'fingerprint', 'created_on')
+
+
+class FilterRules(BaseModel):
+    """
+    Lead filter rules edited on settings page.
+    Lists are stored as comma separated text.
+    Bot rebuilds its filter when updated_on changes.
+    """
+
+    __tablename__ = 'filter_rules'
+
+    include_regions = db.Column(db.Text(), default='')
+    exclude_regions = db.Column(db.Text(), default='')
+    object_types = db.Column(db.Text(), default='')
+    # Max lead age in minutes, 0 means any age
+    max_age = db.Column(db.Integer(), default=0)
+    # Places within radius in km from center are accepted too, 0 means no radius
+    center = db.Column(db.String(100), default='')
+    radius = db.Column(db.Integer(), default=0)
+
+    include = ('include_regions', 'exclude_regions', 'object_types', 'max_age', 'center', 'radius', 'updated_on')
+
+    @staticmethod
+    def split(value: str) -> List[str]:
+        return [item.strip() for item in (value or '').split(',') if item.strip()]
+
+    def config(self) -> Dict[str, Any]:
+        """
+        Rules in LeadFilter config format.
+        """
+
+        return {
+            'regions': self.split(self.include_regions),
+            'exclude_regions': self.split(self.exclude_regions),
+            'object_types': self.split(self.object_types),
+            'max_age': self.max_age * 60 if self.max_age else None,
+            'center': self.center or None,
+            'radius': self.radius or None,
+        }
@@ -1,11 +1,16 @@
+import json
 import logging
-from typing import Optional
+import time
+from datetime import date, datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 import flask as fl
+from sqlalchemy import and_, or_
 from sqlalchemy.orm import exc
 
 from .common import db
-from .models import BotSettings
+from .models import BotSettings, FilterRules, Lead
+from settings import LEADS_PAGE_SIZE, OBJECT_TYPES, REGIONS, STREAM_CHECK_INTERVAL, STREAM_HEARTBEAT
 
 
 def get_bot_settings(session: Optional[int] = None, app: Optional[fl.app.Flask] = None) -> Optional[BotSettings]:
@@ -37,3 +42,206 @@ def get_bot_settings(session: Optional[int] = None, app: Optional[fl.app.Flask]
                 logging.exception(e, exc_info=True)
 
             return None
+
+
+def get_filter_rules(session: Optional[int] = None, app: Optional[fl.app.Flask] = None) -> Optional[FilterRules]:
+    """
+    Select first entry from filter rules table or create new one with default rules.
+    """
+
+    session = session or db.session
+
+    try:
+
+        return session.query(FilterRules).one()
+
+    except exc.NoResultFound:
+
+        try:
+            new_rules = FilterRules(include_regions=', '.join(REGIONS), exclude_regions='',
+                                    object_types=', '.join(OBJECT_TYPES), max_age=0)
+            session.add(new_rules)
+            session.commit()
+
+            return new_rules
+
+        except Exception as e:
+
+            if app:
+                app.logger.error(e)
+            else:
+                logging.exception(e, exc_info=True)
+
+            return None
+
+
+def get_leads_page(before: Optional[Tuple[datetime, int]] = None, limit: int = LEADS_PAGE_SIZE,
+                   session: Optional[int] = None) -> Tuple[List[Lead], Optional[Tuple[datetime, int]]]:
+    """
+    Purchased leads newest first, a page after given position.
+
+    Pages are selected by (created_on, id) of the last lead of the previous page,
+    so every page is a range scan of the leads index
+    however many leads are stored.
+
+    Parameters
+    ----------
+    before : Optional[Tuple[datetime, int]]
+        Position of the last lead client has got, None for the first page
+    limit : int
+        Leads per page
+
+    Returns
+    -------
+    Tuple[List[Lead], Optional[Tuple[datetime, int]]]
+        Leads and position of the next page, None if there are no more leads
+
+    """
+
+    session = session or db.session
+
+    query = session.query(Lead)
+
+    if before is not None:
+
+        created_on, lead_id = before
+
+        query = query.filter(or_(Lead.created_on < created_on,
+                                 and_(Lead.created_on == created_on, Lead.id < lead_id)))
+
+    # One more lead tells whether there is a next page
+    leads = query.order_by(Lead.created_on.desc(), Lead.id.desc()).limit(limit + 1).all()
+
+    if len(leads) <= limit:
+        return leads, None
+
+    leads = leads[:limit]
+
+    return leads, (leads[-1].created_on, leads[-1].id)
+
+
+# Day of the count, number of leads counted and position of the newest of them
+_leads_count: Dict[str, Any] = {'day': None, 'count': 0, 'last': None}
+
+
+def count_leads(session: Optional[int] = None) -> int:
+    """
+    Number of purchased leads.
+
+    All leads are counted once a day, later only leads
+    after the newest counted one are added with an index range scan.
+    """
+
+    session = session or db.session
+
+    today = date.today()
+
+    if _leads_count['day'] != today:
+
+        newest = session.query(Lead.created_on, Lead.id).order_by(Lead.created_on.desc(), Lead.id.desc()).first()
+
+        if newest is None:
+            _leads_count.update(day=today, count=0, last=None)
+        else:
+            # Leads purchased meanwhile are counted with the next ones
+            count = session.query(Lead).filter(~_after(*newest)).count()
+            _leads_count.update(day=today, count=count, last=tuple(newest))
+
+    query = session.query(Lead)
+
+    if _leads_count['last'] is not None:
+        query = query.filter(_after(*_leads_count['last']))
+
+    return _leads_count['count'] + query.count()
+
+
+def _after(created_on: datetime, lead_id: int) -> Any:
+    """
+    Condition of leads after given position.
+    """
+
+    return or_(Lead.created_on > created_on, and_(Lead.created_on == created_on, Lead.id > lead_id))
+
+
+def server_event(event: str, data: Any, event_id: Optional[int] = None) -> str:
+    """
+    Message of Server-Sent Events stream.
+    """
+
+    lines = [f"event: {event}"]
+
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+
+    lines.append(f"data: {json.dumps(data, ensure_ascii=False)}")
+
+    return '\n'.join(lines) + '\n\n'
+
+
+def status_events(bot: Any, since: int, check_interval: float = STREAM_CHECK_INTERVAL,
+                  heartbeat: float = STREAM_HEARTBEAT) -> Iterator[str]:
+    """
+    Stream bot status and purchased leads to a client.
+
+    Only shared memory of the worker is read, so an open stream
+    costs neither database queries nor login checks. Status is sent
+    when it changes, leads are sent with their sequence number as event id,
+    so reconnected client continues from the last lead it has got.
+    Comment lines are sent when nothing happens to keep connection open.
+
+    Parameters
+    ----------
+    bot : CianBotManager
+        Manager of the worker
+    since : int
+        Sequence number of the last purchase client has seen
+    check_interval : float
+        Seconds between checks of shared memory
+    heartbeat : float
+        Seconds of silence before a heartbeat is sent
+
+    """
+
+    version = None
+    state = None
+
+    last_sent = time.monotonic()
+
+    # Tell browser how soon to reconnect
+    yield f"retry: {int(check_interval * 1000) + 1000}\n\n"
+
+    while True:
+
+        messages = []
+
+        current_version = bot.get_state_version()
+
+        if current_version != version:
+
+            version = current_version
+
+            new_state = bot.get_state()
+
+            if new_state['money_left'] == -1:
+                new_state['money_left'] = None
+
+            if new_state != state:
+                state = new_state
+                messages.append(server_event('status', state))
+
+        leads, last = bot.get_new_leads(since)
+
+        since = last
+
+        if leads:
+            messages.append(server_event('leads', [[url, str(created)] for url, created in leads], since))
+
+        if messages:
+            last_sent = time.monotonic()
+            yield ''.join(messages)
+
+        elif time.monotonic() - last_sent >= heartbeat:
+            last_sent = time.monotonic()
+            yield ": heartbeat\n\n"
+
+        time.sleep(check_interval)